@@ -0,0 +1,34 @@
+import glob
+import time
+from os import path
+
+STUBS = path.join(path.dirname(__file__), "../stubs")
+
+
+def stubs():
+    sources = []
+
+    for name in sorted(glob.glob(path.join(STUBS, "*.lox"))):
+        with open(name) as file:
+            sources.append(file.read())
+
+    return sources
+
+
+def generate_source(size):
+    """Concatenates the stubs until the result is at least `size` characters long"""
+    chunk = "\n".join(stubs())
+    return chunk * (size // len(chunk) + 1)
+
+
+def measure(fn, repeat=3):
+    """Returns the best wall-clock time of `repeat` runs of `fn`"""
+    best = None
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
@@ -0,0 +1,50 @@
+import os
+import sys
+import tempfile
+from bench import generate_source, measure
+from bench.parallel_parse import generate_functions
+from lib import cache
+from lib.parser import Parser
+from lib.regex_scanner import RegexScanner
+from lib.resolver import Resolver
+
+
+def compile(code):
+    program = Parser(RegexScanner(code).scan()).parse()
+    return program, Resolver(program).run()
+
+
+def main(size=1_000_000):
+    slower = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "program.loxc")
+
+        for title, code in [
+            ("stubs", generate_source(size)),
+            ("functions", generate_functions(size // 100)),
+        ]:
+            program = compile(code)[0]
+            cache.store(path, code, program)
+
+            compiled = measure(lambda: compile(code))
+            loaded = measure(lambda: cache.load(path, code))
+
+            print("%s: %d chars, cache %d KiB" % (title, len(code), os.path.getsize(path) // 1024))
+            print("  compile %.3fs store %.3fs load %.3fs (%.1fx faster)" % (
+                compiled,
+                measure(lambda: cache.store(path, code, program)),
+                loaded,
+                compiled / loaded,
+            ))
+
+            if loaded >= compiled:
+                slower.append(title)
+
+    # a cache which loads slower than compiling is worse than none
+    if slower:
+        sys.exit("loading the cache is slower than compiling: %s" % ", ".join(slower))
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
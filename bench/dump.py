@@ -0,0 +1,38 @@
+import io
+import sys
+from pprint import pprint
+from bench import generate_source, measure, stubs
+from lib import dump
+from lib.parser import Parser
+from lib.regex_scanner import RegexScanner
+from lib.token_buffer import BufferScanner
+
+
+def main(size=200_000):
+    source = generate_source(size)
+    tokens = RegexScanner(source).scan()
+    buffer = BufferScanner(source).scan()
+    program = Parser(tokens).parse()
+
+    print("%d tokens" % len(tokens))
+    print("  tokens pprint %.3fs jsonl %.3fs jsonl (buffer) %.3fs" % (
+        measure(lambda: pprint(tokens, io.StringIO())),
+        measure(lambda: dump.dump_tokens(tokens, io.StringIO())),
+        measure(lambda: dump.dump_tokens(buffer, io.StringIO())),
+    ))
+    print("  ast    text %.3fs json %.3fs" % (
+        measure(lambda: dump.dump_ast(program, io.StringIO())),
+        measure(lambda: dump.dump_ast_json(program, io.StringIO())),
+    ))
+
+    # black takes minutes on anything bigger than the stubs
+    small = Parser(RegexScanner("\n".join(stubs())).scan()).parse()
+    print("stubs: ast repr %.3fs text %.3fs json %.3fs" % (
+        measure(lambda: repr(small), repeat=1),
+        measure(lambda: dump.dump_ast(small, io.StringIO())),
+        measure(lambda: dump.dump_ast_json(small, io.StringIO())),
+    ))
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,71 @@
+import os
+import sys
+from os import path
+from bench import STUBS, measure
+from lib.parser import Parser
+from lib.scanner import Scanner
+from lib.resolver import Resolver
+from lib.interpreter import Interpreter
+from lib.closures import ClosureInterpreter
+from lib.vm import VM
+from lib.io import FakePrinter
+
+ENGINES = [("tree", Interpreter), ("closures", ClosureInterpreter), ("vm", VM)]
+
+# time.lox sleeps, which no engine can speed up
+SKIPPED = ["time.lox"]
+
+
+def load(name):
+    with open(path.join(STUBS, name)) as file:
+        code = file.read()
+
+    program = Parser(Scanner(code).scan()).parse()
+    Resolver(program).run()
+
+    return program
+
+
+def programs():
+    return [
+        name
+        for name in sorted(os.listdir(STUBS))
+        if name.endswith(".lox") and name not in SKIPPED
+    ]
+
+
+def main(*names):
+    Interpreter.printer = FakePrinter
+    totals = {title: 0 for title, _ in ENGINES}
+    speedups = {title: 1 for title, _ in ENGINES}
+    names = names or programs()
+
+    for name in names:
+        program = load(name)
+        times = {
+            title: measure(lambda: engine().interpret(program))
+            for title, engine in ENGINES
+        }
+
+        for title, elapsed in times.items():
+            totals[title] += elapsed
+            speedups[title] *= times["tree"] / elapsed
+
+        print("%-14s %s" % (name, "  ".join(
+            "%s %8.2f ms (%.2fx)" % (title, 1000 * elapsed, times["tree"] / elapsed)
+            for title, elapsed in times.items()
+        )))
+
+    print("%-14s %s" % ("total", "  ".join(
+        "%s %8.2f ms (%.2fx)" % (title, 1000 * total, totals["tree"] / total)
+        for title, total in totals.items()
+    )))
+    # the geometric mean keeps the longest program from deciding the speedup alone
+    print("%-14s %s" % ("geometric mean", "  ".join(
+        "%s %.2fx" % (title, speedup ** (1 / len(names)))
+        for title, speedup in speedups.items()
+    )))
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,51 @@
+import sys
+from bench import generate_source, measure
+from lib import ast
+from lib.flat_ast import FlatAST
+from lib.parser import Parser
+from lib.regex_scanner import RegexScanner
+from lib.token import Token
+
+
+def object_size(root):
+    """Bytes held by the nodes, lists, tokens and values of an object AST"""
+    seen, total, stack = set(), 0, [root]
+
+    while stack:
+        item = stack.pop()
+
+        if id(item) in seen or item is None or isinstance(item, bool):
+            continue
+
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+
+        if isinstance(item, ast.AST):
+            total += sys.getsizeof(vars(item))
+            stack.extend(vars(item).values())
+        elif isinstance(item, list):
+            stack.extend(item)
+        elif isinstance(item, Token):
+            stack.extend((item.lexeme, item.literal))
+
+    return total
+
+
+def main(size=1_000_000):
+    program = Parser(RegexScanner(generate_source(size)).scan()).parse()
+    tree = FlatAST.from_ast(program)
+    nodes = len(tree)
+
+    print("%d nodes" % nodes)
+    print("  bytes per node object %.1f flat %.1f" % (
+        object_size(program) / nodes,
+        tree.nbytes() / nodes,
+    ))
+    print("  flatten %.3fs unflatten %.3fs" % (
+        measure(lambda: FlatAST.from_ast(program)),
+        measure(lambda: tree.to_ast()),
+    ))
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
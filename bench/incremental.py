@@ -0,0 +1,43 @@
+import sys
+from bench import generate_source, measure
+from lib.parser import Parser
+from lib.resolver import Resolver
+from lib.regex_scanner import RegexScanner
+from lib.incremental import Document
+
+
+def full(code):
+    program = Parser(RegexScanner(code).scan()).parse()
+    return program, Resolver(program).run()
+
+
+def main(*sizes):
+    sizes = sizes or (10_000, 100_000, 1_000_000)
+
+    print("%10s %12s %12s %12s" % ("chars", "full (ms)", "start (ms)", "middle (ms)"))
+
+    for size in sizes:
+        code = generate_source(size)
+        document = Document(code)
+
+        def edit(at):
+            document.edit(at, at + 1, "b")
+            document.edit(at, at + 1, "a")
+
+        # edit latency should not depend on how much text follows the edit
+        start = code.index("a - b")
+        middle = code.index("a - b", len(code) // 2)
+
+        print(
+            "%10d %12.2f %12.2f %12.2f"
+            % (
+                len(code),
+                measure(lambda: full(code)) * 1000,
+                measure(lambda: edit(start)) * 500,
+                measure(lambda: edit(middle)) * 500,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,30 @@
+import sys
+from bench import measure
+from bench.parallel_parse import generate_functions
+from lib.parser import Parser
+from lib.lazy import LazyParser
+from lib.regex_scanner import RegexScanner
+from lib.resolver import Resolver
+from lib.interpreter import Interpreter
+from lib.io import FakePrinter
+
+
+def load(parser, tokens):
+    node = parser(tokens).parse()
+    return Interpreter().interpret(node, Resolver(node).run())
+
+
+def main(count=5000):
+    Interpreter.printer = FakePrinter
+    # only a handful of the functions is ever called
+    tokens = RegexScanner(generate_functions(count) + "print f0(5, 3) + f1(3, 4);").scan()
+
+    print("%d functions, %d tokens" % (count, len(tokens)))
+    print("eager %.3fs lazy %.3fs" % (
+        measure(lambda: load(Parser, tokens)),
+        measure(lambda: load(LazyParser, tokens)),
+    ))
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,26 @@
+import sys
+import time
+from bench import generate_source, measure
+from lib.parser import Parser
+from lib.regex_scanner import RegexScanner
+
+
+def main(size=1_000_000):
+    tokens = RegexScanner(generate_source(size)).scan()
+    a, b = Parser(tokens).parse(), Parser(tokens).parse()
+
+    start = time.perf_counter()
+    a.digest()
+    digest = time.perf_counter() - start
+    b.digest()
+
+    print("%d statements" % len(a.statements))
+    print("  digest %.3fs, equal subtrees %.6fs, equal trees %.3fs" % (
+        digest,
+        measure(lambda: a.statements[0].digest() == b.statements[0].digest()),
+        measure(lambda: a == b),
+    ))
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,35 @@
+import os
+import sys
+from bench import measure
+from lib.parser import Parser
+from lib.parallel_parser import ParallelParser
+from lib.regex_scanner import RegexScanner
+
+FUNCTION = """
+fun f%d(a, b) {
+    var c = a * b + %d;
+    if (c > 10) { return c - a; } else { return f%d(b, a); }
+}
+"""
+
+
+def generate_functions(count):
+    return "".join(FUNCTION % (i, i, i) for i in range(count))
+
+
+def main(count=5000, *workers):
+    tokens = RegexScanner(generate_functions(count)).scan()
+    workers = workers or sorted({1, 2, 4, 8, os.cpu_count()})
+
+    print("%d functions, %d tokens, %d cores available" % (count, len(tokens), os.cpu_count()))
+
+    baseline = measure(lambda: Parser(tokens).parse(), repeat=1)
+    print("%-12s %8.3fs" % ("sequential", baseline))
+
+    for count in workers:
+        elapsed = measure(lambda: ParallelParser(tokens, count).parse(), repeat=1)
+        print("%2d workers  %8.3fs (%.1fx)" % (count, elapsed, baseline / elapsed))
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,30 @@
+import os
+import sys
+from bench import generate_source, measure
+from lib.scanner import Scanner
+from lib.regex_scanner import RegexScanner
+from lib.parallel_scanner import ParallelScanner
+
+
+def main(size=10_000_000, *workers):
+    source = generate_source(size)
+    workers = workers or sorted({1, 2, 4, 8, os.cpu_count()})
+
+    print("source: %d chars, %d cores available" % (len(source), os.cpu_count()))
+
+    baseline = measure(lambda: Scanner(source).scan(), repeat=1)
+    print("%-18s %8.3fs" % ("char scanner", baseline))
+    print("%-18s %8.3fs" % ("regex scanner", measure(lambda: RegexScanner(source).scan(), repeat=1)))
+
+    for count in workers:
+        tokens = measure(lambda: ParallelScanner(source, count).scan(), repeat=1)
+        buffer = measure(lambda: ParallelScanner(source, count).scan_buffer(), repeat=1)
+
+        print(
+            "%2d workers  tokens %8.3fs (%.1fx)  buffer %8.3fs (%.1fx)"
+            % (count, tokens, baseline / tokens, buffer, baseline / buffer)
+        )
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
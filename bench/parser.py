@@ -0,0 +1,38 @@
+import sys
+from bench import generate_source, measure
+from lib.parser import Parser, BufferParser
+from lib.pratt_parser import PrattParser, BufferPrattParser
+from lib.stack_parser import StackParser, BufferStackParser
+from lib.regex_scanner import RegexScanner
+from lib.token_buffer import BufferScanner
+
+EXPRESSIONS = """
+var x = a + b * c - d / e < f == !g or h and i;
+print -a.b(c, d + 1) * (e - f) >= g ? h + i : j or k;
+total = total + count * (limit - offset) / step - -bias;
+"""
+
+
+def main(size=1_000_000):
+    for title, source in [
+        ("stubs", generate_source(size)),
+        ("expressions", EXPRESSIONS * (size // len(EXPRESSIONS) + 1)),
+    ]:
+        tokens = RegexScanner(source).scan()
+        buffer = BufferScanner(source).scan()
+
+        print("%s: %d tokens" % (title, len(tokens)))
+        print("  list   descent %.3fs pratt %.3fs stack %.3fs" % (
+            measure(lambda: Parser(tokens).parse()),
+            measure(lambda: PrattParser(tokens).parse()),
+            measure(lambda: StackParser(tokens).parse()),
+        ))
+        print("  buffer descent %.3fs pratt %.3fs stack %.3fs" % (
+            measure(lambda: BufferParser(buffer).parse()),
+            measure(lambda: BufferPrattParser(buffer).parse()),
+            measure(lambda: BufferStackParser(buffer).parse()),
+        ))
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
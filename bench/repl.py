@@ -0,0 +1,34 @@
+import sys
+import time
+from lib.repl import ReplSession
+from lib.interpreter import Interpreter
+from lib.io import FakePrinter
+
+
+def lines(count):
+    for i in range(count):
+        yield "var v%d = %d;" % (i, i)
+        yield "fun f%d(x) { return x + v%d; }" % (i, i)
+        yield "f%d(v%d) * 2" % (i, i)
+
+
+def main(count=10000, chunk=1000):
+    Interpreter.printer = FakePrinter
+    session = ReplSession()
+    entries = list(lines(count))
+    times = []
+
+    for start in range(0, len(entries), chunk):
+        begin = time.perf_counter()
+
+        for line in entries[start : start + chunk]:
+            session.run(line)
+
+        times.append((time.perf_counter() - begin) / chunk)
+
+    print("%d entries" % len(entries))
+    print("first %.1fus last %.1fus per line" % (times[0] * 1e6, times[-1] * 1e6))
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
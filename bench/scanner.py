@@ -0,0 +1,21 @@
+import sys
+from bench import generate_source, measure
+from lib.scanner import Scanner
+from lib.regex_scanner import RegexScanner
+
+SCANNERS = {"char": Scanner, "regex": RegexScanner}
+
+
+def main(size=1_000_000):
+    source = generate_source(size)
+    count = len(Scanner(source).scan())
+
+    print("source: %d chars, %d tokens" % (len(source), count))
+
+    for name, scanner in SCANNERS.items():
+        elapsed = measure(lambda: scanner(source).scan())
+        print("%-6s %8.3fs %12.0f tokens/s" % (name, elapsed, count / elapsed))
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
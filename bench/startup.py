@@ -0,0 +1,106 @@
+import os
+import sys
+import time
+import tempfile
+import subprocess
+from os import path
+
+ROOT = path.join(path.dirname(__file__), "..")
+PLOX = path.join(ROOT, "plox")
+
+# seconds plox may add on top of a bare interpreter before its first print
+BUDGET = 0.15
+
+# modules only some code paths need, which running a script must not import
+DEFERRED = [
+    "black",
+    "graphviz",
+    "imgcat",
+    "readline",
+    "pprint",
+    "concurrent.futures",
+    "lib.vm",
+    "lib.compiler",
+    "lib.disassembler",
+    "lib.closures",
+]
+
+
+def first_print(*command):
+    """Returns the seconds until `command` writes its first line to stdout"""
+    start = time.perf_counter()
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, cwd=ROOT)
+    process.stdout.readline()
+    elapsed = time.perf_counter() - start
+    process.communicate()
+
+    return elapsed
+
+
+def startup(repeat=5):
+    """Returns the best time to first print of a bare interpreter and of plox"""
+    with tempfile.TemporaryDirectory() as directory:
+        script = path.join(directory, "hello.lox")
+
+        with open(script, "w") as file:
+            file.write('print "hello";')
+
+        bare = min(
+            first_print(sys.executable, "-B", "-c", "print('hello')")
+            for _ in range(repeat)
+        )
+        plox = min(
+            first_print(sys.executable, "-B", PLOX, "--no-cache", script)
+            for _ in range(repeat)
+        )
+
+    return bare, plox
+
+
+def imported(*arguments):
+    """Returns which of the deferred modules running plox with `arguments` imports"""
+    code = (
+        "import sys, runpy; sys.argv = ['plox'] + sys.argv[1:]; "
+        "runpy.run_path(%r, run_name='__main__'); "
+        "print(' '.join(m for m in %r if m in sys.modules))" % (PLOX, DEFERRED)
+    )
+    output = subprocess.run(
+        [sys.executable, "-B", "-c", code, *arguments],
+        cwd=ROOT,
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+    ).stdout
+
+    return output.splitlines()[-1].split()
+
+
+def import_time(module):
+    code = "import time; s = time.perf_counter(); import %s; print(time.perf_counter() - s)"
+    output = subprocess.run(
+        [sys.executable, "-B", "-c", code % module],
+        cwd=ROOT,
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+    ).stdout
+
+    return float(output)
+
+
+def main():
+    for module in ["lib.ast", "lib.interpreter", "lib.dot_printer"]:
+        print("import %-16s %6.1f ms" % (module, 1000 * min(import_time(module) for _ in range(5))))
+
+    bare, plox = startup()
+    print("first print  python %6.1f ms  plox %6.1f ms  overhead %6.1f ms (budget %d ms)" % (
+        1000 * bare, 1000 * plox, 1000 * (plox - bare), 1000 * BUDGET,
+    ))
+    script = path.join("stubs", "math.lox")
+    print("deferred modules imported by a script run: %s" % (imported("--no-cache", script) or "none"))
+
+    # wall-clock time depends on the machine, so it is checked here rather than in the tests
+    if plox - bare > BUDGET:
+        sys.exit("plox takes %.1f ms over its budget to start" % (1000 * (plox - bare - BUDGET)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import io
+import sys
+import tracemalloc
+from bench import generate_source
+from lib.regex_scanner import RegexScanner
+from lib.stream_scanner import StreamScanner
+
+
+def peak(fn):
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def drain(tokens):
+    i = 0
+    try:
+        while True:
+            tokens[i]
+            i += 1
+    except IndexError:
+        return i
+
+
+def main(*sizes):
+    sizes = sizes or (100_000, 1_000_000, 4_000_000)
+
+    print("%12s %16s %16s" % ("chars", "whole (KiB)", "stream (KiB)"))
+
+    for size in sizes:
+        data = generate_source(size).encode()
+
+        whole = peak(lambda: RegexScanner(io.BytesIO(data).read().decode()).scan())
+        stream = peak(lambda: drain(StreamScanner(io.BytesIO(data)).scan()))
+
+        print("%12d %16d %16d" % (len(data), whole // 1024, stream // 1024))
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,38 @@
+import sys
+import tracemalloc
+from bench import generate_source, measure
+from lib.parser import Parser, BufferParser
+from lib.regex_scanner import RegexScanner
+from lib.token_buffer import BufferScanner
+
+
+def footprint(fn):
+    tracemalloc.start()
+    result = fn()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size
+
+
+def main(size=1_000_000):
+    source = generate_source(size)
+
+    tokens, list_size = footprint(lambda: RegexScanner(source).scan())
+    buffer, buffer_size = footprint(lambda: BufferScanner(source).scan())
+
+    print("tokens: %d" % len(tokens))
+    print("list   %8d KiB %6.1f B/token" % (list_size // 1024, list_size / len(tokens)))
+    print("buffer %8d KiB %6.1f B/token" % (buffer_size // 1024, buffer_size / len(buffer)))
+
+    print("scan   list %.3fs buffer %.3fs" % (
+        measure(lambda: RegexScanner(source).scan()),
+        measure(lambda: BufferScanner(source).scan()),
+    ))
+    print("parse  list %.3fs buffer %.3fs" % (
+        measure(lambda: Parser(tokens).parse()),
+        measure(lambda: BufferParser(buffer).parse()),
+    ))
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
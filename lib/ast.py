@@ -1,17 +1,157 @@
-import black
+from abc import ABC, abstractmethod
+from hashlib import blake2b
+from lib.token import Token
 
 
 class AST:
+    # the digest, what the resolver finds out, the depth and frame slot of
+    # a variable, whether closures capture it, the size of the frame a scope
+    # needs and the cells a function takes, and what the interpreter keeps
+    # on nodes, the global index and the free frames of a block, are slots
+    # so that they stay out of vars(), which equality, the printers and the
+    # cache all go by
+    __slots__ = (
+        "_digest",
+        "depth",
+        "slot",
+        "receiver",
+        "cell",
+        "size",
+        "cells",
+        "upvalues",
+        "cached",
+        "pool",
+        "__dict__",
+        "__weakref__",
+    )
+
     def __hash__(self):
         return id(self)
 
+    def digest(self):
+        """Structural hash of the subtree, the same wherever in a source it is"""
+        try:
+            return self._digest
+        except AttributeError:
+            return merkle(self)
+
     def __repr__(self):
-        ast = "%s(%s)" % (self.__class__.__name__, vars(self),)
+        # black takes longer to import than most scripts take to run
+        import black
+
+        ast = "%s(%s)" % (
+            self.__class__.__name__,
+            vars(self),
+        )
 
         return black.format_str(ast, mode=black.FileMode())
 
     def __eq__(self, other):
-        return isinstance(self, type(other)) and vars(self) == vars(other)
+        if not isinstance(self, type(other)):
+            return False
+
+        # trees of different shape differ in their digests, ones of the same
+        # shape may still differ in the positions of their tokens
+        return self.digest() == other.digest() and vars(self) == vars(other)
+
+
+def dispatch(table, cls):
+    """Entry of a table keyed by node class for `cls`, or None
+
+    Subclasses, such as the handles of a flat AST, get the entry of the
+    nearest base class which has one, which is then kept under the subclass
+    so that the next lookup is a single one like for any other class.
+    """
+    for base in cls.__mro__:
+        if base in table:
+            entry = table[cls] = table[base]
+            return entry
+
+    return None
+
+
+class Table(dict):
+    """Table keyed by node class, which looks up subclasses with dispatch()
+
+    A miss costs no frame of the caller's own, so that looking an entry up
+    inline is all visiting a node takes.
+    """
+
+    def __init__(self, entries, unsupported):
+        super().__init__(entries)
+        self.unsupported = unsupported
+
+    def __missing__(self, cls):
+        entry = dispatch(self, cls)
+
+        if entry is None:
+            raise ValueError(self.unsupported % cls.__name__)
+
+        return entry
+
+
+def children(value):
+    if isinstance(value, LazyBlock):
+        return [value.parse()]
+
+    if isinstance(value, AST):
+        return [value]
+
+    if isinstance(value, list):
+        return [item for item in value if isinstance(item, AST)]
+
+    return []
+
+
+def encode(value, parts, digests):
+    if isinstance(value, LazyBlock):
+        parts.append(digests[value.parse()])
+    elif isinstance(value, AST):
+        parts.append(digests[value])
+    elif isinstance(value, Token):
+        # tokens are told apart by what they say, not by where they are
+        parts.append(b"T%d:%r:%r;" % (value.type, value.lexeme, value.literal))
+    elif isinstance(value, list):
+        parts.append(b"[%d;" % len(value))
+
+        for item in value:
+            encode(item, parts, digests)
+    else:
+        parts.append(b"%s:%r;" % (type(value).__name__.encode(), value))
+
+
+def merkle(root):
+    """Digests every node below `root` bottom-up, without recursion"""
+    digests, stack = {}, [(root, False)]
+
+    while stack:
+        node, ready = stack.pop()
+
+        if node in digests:
+            continue
+
+        if not ready:
+            try:
+                digests[node] = node._digest
+            except AttributeError:
+                stack.append((node, True))
+                stack.extend(
+                    (child, False)
+                    for value in vars(node).values()
+                    for child in children(value)
+                )
+
+            continue
+
+        parts = [node.__class__.__name__.encode()]
+
+        for name, value in vars(node).items():
+            parts.append(b"|%s=" % name.encode())
+            encode(value, parts, digests)
+
+        node._digest = digests[node] = blake2b(b"".join(parts), digest_size=16).digest()
+
+    return digests[root]
 
 
 class Program(AST):
@@ -28,6 +168,30 @@ class Block(Statement):
         self.statements = statements
 
 
+class LazyBlock(Statement, ABC):
+    """Function body which is only built, by load(), the first time it is called"""
+
+    block = None
+    bindings = None
+
+    @abstractmethod
+    def load(self):
+        """Returns the block and the bindings of the nodes in it"""
+
+    def deferrable(self, parameters, initializer, in_class, in_subclass):
+        """Whether the resolver has nothing to report about the body in a
+        function with `parameters`, an initializer or not, in a class or
+        subclass or not, so that resolving it can wait"""
+        return True
+
+    def parse(self):
+        """Returns the block, which need not be resolved yet"""
+        if self.block is None:
+            self.block, self.bindings = self.load()
+
+        return self.block
+
+
 class ClassDeclaration(Statement):
     def __init__(self, name, super, methods):
         self.name = name
@@ -85,9 +249,9 @@ class Expression(AST):
 class TernaryExpression(Expression):
     def __init__(self, test, operator, then, neht):
         self.test = test
+        self.operator = operator
         self.then = then
         self.neht = neht
-        self.operator = operator
 
 
 class BinaryExpression(Expression):
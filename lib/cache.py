@@ -0,0 +1,248 @@
+import os
+import marshal
+import hashlib
+from array import array
+from lib import ast
+from lib.token import Token
+from lib.source import Source
+from lib.token_buffer import TYPES
+
+MAGIC = b"LOXC"
+# bump whenever the encoding or the AST classes change
+VERSION = 4
+
+# opcodes of the postorder encoding, node classes are numbered from NODE on
+CONSTANT, TOKEN, LIST, BIND, BODY, NODE = range(6)
+
+# BIND is followed by these resolver annotations of the node before it,
+# each of them -1 when it is not set. Tuples are kept as constants
+ANNOTATIONS = ("depth", "slot", "receiver", "cell", "size", "cells", "upvalues")
+TUPLES = {"cells", "upvalues"}
+
+FUNCTIONS = (ast.FunctionDeclaration, ast.FunctionExpression)
+
+
+def cache_path(path):
+    directory, name = os.path.split(path)
+    stem = os.path.splitext(name)[0]
+
+    return os.path.join(directory, "__pycache__", stem + ".loxc")
+
+
+def header(code):
+    digest = hashlib.sha256(code.encode()).digest()
+    return MAGIC + bytes([VERSION, marshal.version]) + digest
+
+
+def load(path, code):
+    """Returns the program and bindings cached for `code`, or None"""
+    try:
+        with open(path, "rb") as file:
+            data = file.read()
+    except OSError:
+        return None
+
+    expected = header(code)
+
+    if not data.startswith(expected):
+        return None
+
+    try:
+        names, program = marshal.loads(data[len(expected) :])
+        return Decoder(names, Source(code)).decode(program)
+    except (EOFError, ValueError, TypeError, IndexError, KeyError, AttributeError):
+        return None
+
+
+def store(path, code, program):
+    """Writes the cache of a resolved program atomically, quietly giving up when that is not possible"""
+    encoder = Encoder()
+    data = header(code) + marshal.dumps((encoder.names, encoder.encode(program)))
+    temporary = "%s.%d.tmp" % (path, os.getpid())
+
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        with open(temporary, "wb") as file:
+            file.write(data)
+
+        os.replace(temporary, path)
+    except OSError:
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
+
+
+class Encoder:
+    """Encodes a resolved AST as a flat postorder list of opcodes and a pool of constants
+
+    Function bodies are encoded separately and kept as opaque blobs, which
+    are only decoded when the function is first called.
+    """
+
+    def __init__(self):
+        self.names = []
+        self.codes = {}
+
+    def encode(self, root):
+        ops, constants, interned = [], [], {}
+
+        def constant(value):
+            key = (type(value), value)
+            index = interned.get(key)
+
+            if index is None:
+                index = interned[key] = len(constants)
+                constants.append(value)
+
+            return index
+
+        stack = [root]
+
+        while stack:
+            item = stack.pop()
+
+            if isinstance(item, ast.AST):
+                fields = vars(item)
+                stack.append((self.code(item, fields), annotations(item, constant)))
+
+                for name, value in reversed(fields.items()):
+                    if name == "body" and isinstance(item, FUNCTIONS):
+                        value = self.body(value)
+
+                    stack.append(value)
+            elif isinstance(item, Token):
+                ops.extend(
+                    (TOKEN, item.type, constant(item.lexeme), constant(item.literal), item.offset)
+                )
+            elif isinstance(item, list):
+                stack.append((LIST, len(item)))
+                stack.extend(reversed(item))
+            elif isinstance(item, tuple):
+                # emitted once every field or element before it is
+                ops.extend((item[0], item[1]) if item[0] == LIST else (item[0],))
+
+                if item[0] >= NODE and item[1] is not None:
+                    ops.append(BIND)
+                    ops.extend(item[1])
+            elif isinstance(item, Body):
+                ops.extend((BODY, constant(item.data)))
+            else:
+                ops.extend((CONSTANT, constant(item)))
+
+        try:
+            ops = array("i", ops)
+        except OverflowError:
+            # offsets into sources of more than 2 GiB
+            ops = array("q", ops)
+
+        return ops.typecode, ops.tobytes(), constants
+
+    def code(self, node, fields):
+        name = node.__class__.__name__
+        code = self.codes.get(name)
+
+        if code is None:
+            code = self.codes[name] = NODE + len(self.names)
+            self.names.append((name, tuple(fields)))
+
+        return code
+
+    def body(self, block):
+        if isinstance(block, ast.LazyBlock):
+            if block.block is None:
+                block.block, block.bindings = block.load()
+
+            block = block.block
+
+        return Body(marshal.dumps(self.encode(block)))
+
+
+def annotations(node, constant):
+    values = [getattr(node, name, None) for name in ANNOTATIONS]
+
+    if all(value is None for value in values):
+        return None
+
+    return [
+        -1 if value is None else constant(value) if name in TUPLES else value
+        for name, value in zip(ANNOTATIONS, values)
+    ]
+
+
+class Body:
+    def __init__(self, data):
+        self.data = data
+
+
+class Decoder:
+    def __init__(self, names, source):
+        self.classes = [
+            (getattr(ast, name), fields, len(fields)) for name, fields in names
+        ]
+        self.source = source
+
+    def decode(self, encoded):
+        """Returns the decoded node and the bindings of the nodes in it"""
+        typecode, data, constants = encoded
+        ops, source, classes = array(typecode), self.source, self.classes
+        ops.frombytes(data)
+        ops = ops.tolist()
+
+        stack, bindings, i, end = [], {}, 0, len(ops)
+        width = len(ANNOTATIONS)
+
+        while i < end:
+            op = ops[i]
+
+            if op >= NODE:
+                cls, fields, count = classes[op - NODE]
+                node = cls.__new__(cls)
+                start = len(stack) - count
+                node.__dict__.update(zip(fields, stack[start:]))
+                del stack[start:]
+                stack.append(node)
+                i += 1
+            elif op == TOKEN:
+                type, lexeme, literal, offset = ops[i + 1 : i + 5]
+                stack.append(
+                    Token(TYPES[type], constants[lexeme], constants[literal], None, offset, source)
+                )
+                i += 5
+            elif op == CONSTANT:
+                stack.append(constants[ops[i + 1]])
+                i += 2
+            elif op == LIST:
+                start = len(stack) - ops[i + 1]
+                items = stack[start:]
+                del stack[start:]
+                stack.append(items)
+                i += 2
+            elif op == BIND:
+                node = stack[-1]
+
+                for name, value in zip(ANNOTATIONS, ops[i + 1 : i + 1 + width]):
+                    if value != -1:
+                        setattr(node, name, constants[value] if name in TUPLES else value)
+
+                if ops[i + 1] != -1:
+                    bindings[node] = ops[i + 1]
+
+                i += 1 + width
+            else:
+                stack.append(CachedBlock(constants[ops[i + 1]], self))
+                i += 2
+
+        return stack.pop(), bindings
+
+
+class CachedBlock(ast.LazyBlock):
+    """Function body decoded from the cache the first time it is called"""
+
+    def __init__(self, data, decoder):
+        self.data = data
+        self.decoder = decoder
+
+    def load(self):
+        return self.decoder.decode(marshal.loads(self.data))
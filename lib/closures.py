@@ -0,0 +1,771 @@
+from lib import ast
+from lib.token import Type
+from lib.stringify import stringify
+from lib.error import RuntimeError, UninitializedVariableError
+from lib.resolver import UPVALUE
+from lib.environment import Frame, Cell, EMPTY, take_frame, release_frame
+from lib.klass import Klass, Instance
+from lib.function import Function, Callable
+from lib.interpreter import Interpreter, Return, Assert, BINARY, slot_of
+
+BOOL = [bool]
+NUMBERS = [int, float]
+
+
+class Routine:
+    """Body of a function, compiled the first time any closure of the function is called"""
+
+    def __init__(self, interpreter, declaration):
+        self.interpreter = interpreter
+        self.declaration = declaration
+        self.arity = len(declaration.parameters)
+        self.block = None
+        self.code = None
+
+    def compile(self):
+        block = self.declaration.body
+
+        if isinstance(block, ast.LazyBlock):
+            block = self.interpreter.force(block)
+
+        self.block = block
+        self.code = self.interpreter.compile_body(block.statements)
+
+        return self.code
+
+    def run(self, function, arguments):
+        code = self.code or self.compile()
+        block = self.block
+
+        # the parameters take the first slots of the frame
+        frame = take_frame(block, None, function.upvalues)
+        values = frame.values
+        values[: len(arguments)] = arguments
+
+        for slot in block.cells:
+            values[slot] = Cell(values[slot])
+
+        try:
+            result = code(frame)
+        finally:
+            release_frame(block, frame)
+
+        if result is not None:
+            return result[0]
+
+        if function.isInitializer:
+            return function.upvalues[0].value
+
+        return None
+
+
+class CompiledFunction(Function):
+    def __init__(self, declaration, upvalues, isInitializer, routine):
+        Function.__init__(self, declaration, upvalues, isInitializer)
+        self.routine = routine
+
+    def call(self, interpreter, arguments):
+        return self.routine.run(self, arguments)
+
+    def bind(self, this):
+        upvalues = list(self.upvalues)
+        upvalues[0] = Cell(this)
+
+        return CompiledFunction(
+            self.declaration, upvalues, self.isInitializer, self.routine
+        )
+
+
+class CompiledAnonymousFunction(CompiledFunction):
+    def name(self):
+        return "anonymous"
+
+
+# functions which the closures of calls run themselves
+FUNCTIONS = (CompiledFunction, CompiledAnonymousFunction)
+
+
+class ClosureInterpreter(Interpreter):
+    """Interpreter which compiles every node once into a Python closure, then runs the closures
+
+    A closure does what the tree-walker does for its node, with the branch
+    for the node's kind, operator and resolved depth taken when it is
+    compiled. Closures take the frame they run in, statements return None,
+    or a 1-tuple of the value a return statement returns.
+    """
+
+    def interpret(self, ast, bindings=None):
+        for node, depth in (bindings or {}).items():
+            node.depth = depth
+
+        self.compile_statement(ast)(self.env)
+
+        return self
+
+    def execute(self, node):
+        result = self.compile_statement(node)(self.env)
+
+        if result is not None:
+            raise Return(result[0])
+
+    def evaluate(self, expr):
+        return self.compile_expression(expr)(self.env)
+
+    def compile_statement(self, node):
+        if isinstance(node, ast.Program):
+            return self.compile_body(node.statements)
+
+        if isinstance(node, ast.ClassDeclaration):
+            return self.compile_class(node)
+
+        if isinstance(node, ast.ExpressionStatement):
+            expression = self.compile_expression(node.expression)
+
+            def run(frame):
+                expression(frame)
+
+            return run
+
+        if isinstance(node, ast.PrintStatement):
+            return self.compile_print(node)
+
+        if isinstance(node, ast.VariableDeclaration):
+            return self.compile_variable_declaration(node)
+
+        if isinstance(node, ast.Block):
+            return self.compile_block(node)
+
+        if isinstance(node, ast.IfStatement):
+            return self.compile_if(node)
+
+        if isinstance(node, ast.WhileStatement):
+            return self.compile_while(node)
+
+        if isinstance(node, ast.FunctionDeclaration):
+            return self.compile_function_declaration(node)
+
+        if isinstance(node, ast.ReturnStatement):
+            expression = self.compile_expression(node.expression)
+
+            def run(frame):
+                return (expression(frame),)
+
+            return run
+
+        raise ValueError(
+            "[interpreter] Unsupported node type [%s]" % node.__class__.__name__
+        )
+
+    def compile_body(self, statements):
+        codes = [self.compile_statement(statement) for statement in statements]
+
+        if len(codes) == 1:
+            return codes[0]
+
+        def run(frame):
+            for code in codes:
+                result = code(frame)
+
+                if result is not None:
+                    return result
+
+        return run
+
+    def compile_block(self, node):
+        body = self.compile_body(node.statements)
+
+        if not node.size:
+            return body
+
+        def run(frame):
+            inner = take_frame(node, frame, frame.upvalues)
+
+            try:
+                return body(inner)
+            finally:
+                release_frame(node, inner)
+
+        return run
+
+    def compile_print(self, node):
+        expressions = [self.compile_expression(e) for e in node.expressions]
+
+        def run(frame):
+            self.printer.print(*[stringify(e(frame)) for e in expressions])
+
+        return run
+
+    def compile_define(self, node, name):
+        """Closure which puts the value of a declaration where the tree-walker would"""
+        slot = slot_of(node)
+
+        if slot is None:
+
+            def define(frame, value):
+                frame.define(name, value)
+
+        elif node.cell:
+            # the cell was put in the slot before the value was computed
+            def define(frame, value):
+                frame.values[slot].value = value
+
+        else:
+
+            def define(frame, value):
+                frame.values[slot] = value
+
+        return define
+
+    def compile_cell(self, node):
+        """Closure which puts a cell in the slot of a local closures capture, or None"""
+        slot = slot_of(node)
+
+        if slot is None or not node.cell:
+            return None
+
+        def cell(frame):
+            frame.values[slot] = Cell(EMPTY)
+
+        return cell
+
+    def compile_variable_declaration(self, node):
+        cell = self.compile_cell(node)
+        define = self.compile_define(node, node.identifier)
+
+        if node.initializer is None:
+            initializer = lambda frame: EMPTY
+        else:
+            initializer = self.compile_expression(node.initializer)
+
+        if cell is None:
+
+            def run(frame):
+                define(frame, initializer(frame))
+
+        else:
+
+            def run(frame):
+                cell(frame)
+                define(frame, initializer(frame))
+
+        return run
+
+    def compile_if(self, node):
+        test = self.compile_expression(node.test)
+        then = self.compile_statement(node.then)
+        neht = None if node.neht is None else self.compile_statement(node.neht)
+
+        def run(frame):
+            value = test(frame)
+
+            if value is True:
+                return then(frame)
+
+            if value is not False:
+                Assert.operand_type(value, BOOL, None)
+
+            if neht is not None:
+                return neht(frame)
+
+        return run
+
+    def compile_while(self, node):
+        test = self.compile_expression(node.test)
+        body = self.compile_statement(node.body)
+        token = node.token
+
+        def run(frame):
+            value = test(frame)
+            Assert.operand_type(value, BOOL, token)
+
+            while value:
+                result = body(frame)
+
+                if result is not None:
+                    return result
+
+                value = test(frame)
+
+        return run
+
+    def compile_capture(self, node):
+        """Closure which collects the cells a closure of the function `node` keeps"""
+        upvalues = node.upvalues
+
+        def capture(frame):
+            cells = []
+
+            for upvalue in upvalues:
+                if upvalue is None:
+                    # the instance, once a method is bound to one
+                    cells.append(None)
+                elif upvalue[0] == UPVALUE:
+                    cells.append(frame.upvalues[upvalue[1]])
+                else:
+                    cells.append(frame.cell_at(*upvalue))
+
+            return cells
+
+        return capture
+
+    def compile_function_declaration(self, node):
+        # a recursive function captures the cell it is kept in
+        cell = self.compile_cell(node)
+        define = self.compile_define(node, node.name)
+        capture = self.compile_capture(node)
+        routine = Routine(self, node)
+
+        def run(frame):
+            if cell is not None:
+                cell(frame)
+
+            define(frame, CompiledFunction(node, capture(frame), False, routine))
+
+        return run
+
+    def compile_class(self, node):
+        cell = self.compile_cell(node)
+        slot = slot_of(node)
+        name = node.name
+        superclass = None if node.super is None else self.compile_expression(node.super)
+        methods = [
+            (
+                method,
+                self.compile_capture(method),
+                method.name.lexeme == "init",
+                Routine(self, method),
+            )
+            for method in node.methods
+        ]
+
+        def run(frame):
+            if cell is not None:
+                cell(frame)
+            elif slot is None:
+                frame.define(name, None)
+            else:
+                frame.values[slot] = None
+
+            env, parent = frame, None
+
+            if superclass is not None:
+                parent = superclass(frame)
+
+                if not isinstance(parent, Klass):
+                    raise RuntimeError(node.super, "Superclass must be a class")
+
+                # the scope of `super`, which every method captures
+                env = Frame(frame, [Cell(parent)], frame.upvalues)
+
+            klass = Klass(
+                name.lexeme,
+                parent,
+                {
+                    method.name.lexeme: CompiledFunction(
+                        method, capture(env), isInitializer, routine
+                    )
+                    for method, capture, isInitializer, routine in methods
+                },
+            )
+
+            if cell is not None:
+                frame.values[slot].value = klass
+            elif slot is None:
+                frame.assign(name, klass)
+            else:
+                frame.values[slot] = klass
+
+        return run
+
+    def compile_expression(self, expr):
+        if isinstance(expr, ast.LiteralExpression):
+            value = expr.value
+            return lambda frame: value
+
+        if isinstance(expr, ast.FunctionExpression):
+            capture = self.compile_capture(expr)
+            routine = Routine(self, expr)
+
+            return lambda frame: CompiledAnonymousFunction(
+                expr, capture(frame), False, routine
+            )
+
+        if isinstance(expr, ast.LambdaExpression):
+            body = ast.Block([ast.ReturnStatement(expr.expression, expr.arrow)])
+            body.size, body.cells = expr.size, expr.cells
+            declaration = ast.FunctionExpression(expr.parameters, body)
+            capture = self.compile_capture(expr)
+            routine = Routine(self, declaration)
+
+            return lambda frame: CompiledAnonymousFunction(
+                declaration, capture(frame), False, routine
+            )
+
+        if isinstance(expr, ast.GroupingExpression):
+            return self.compile_expression(expr.expression)
+
+        if isinstance(expr, ast.UnaryExpression):
+            return self.compile_unary(expr)
+
+        if isinstance(expr, ast.BinaryExpression):
+            return self.compile_binary(expr)
+
+        if isinstance(expr, ast.TernaryExpression):
+            return self.compile_ternary(expr)
+
+        if isinstance(expr, ast.VariableExpression):
+            return self.compile_variable(expr, expr.variable)
+
+        if isinstance(expr, ast.AssignmentExpression):
+            return self.compile_assignment(expr)
+
+        if isinstance(expr, ast.LogicalExpression):
+            return self.compile_logical(expr)
+
+        if isinstance(expr, ast.CallExpression):
+            return self.compile_call(expr)
+
+        if isinstance(expr, ast.GetExpression):
+            return self.compile_get(expr)
+
+        if isinstance(expr, ast.SetExpression):
+            return self.compile_set(expr)
+
+        if isinstance(expr, ast.SuperExpression):
+            return self.compile_super(expr)
+
+        if isinstance(expr, ast.ThisExpression):
+            return self.compile_variable(expr, expr.token)
+
+        raise ValueError(
+            "[interpreter] Unsupported expression type [%s]" % expr.__class__.__name__
+        )
+
+    def compile_unary(self, expr):
+        operator, right = expr.operator, self.compile_expression(expr.right)
+
+        if operator.type == Type.MINUS:
+
+            def run(frame):
+                value = right(frame)
+
+                if value.__class__ is not int and value.__class__ is not float:
+                    Assert.operand_type(value, NUMBERS, operator)
+
+                return -value
+
+        elif operator.type == Type.BANG:
+
+            def run(frame):
+                value = right(frame)
+
+                if value.__class__ is not bool:
+                    Assert.operand_type(value, BOOL, operator)
+
+                return not value
+
+        else:
+            raise ValueError(
+                "[interpreter] Unsupported operator [%s] in unary expression"
+                % operator.lexeme
+            )
+
+        return run
+
+    def compile_binary(self, expr):
+        operator = expr.operator
+        left, right = self.compile_expression(expr.left), self.compile_expression(expr.right)
+
+        if operator.type == Type.EQUAL_EQUAL:
+            return lambda frame: left(frame) == right(frame)
+
+        if operator.type == Type.BANG_EQUAL:
+            return lambda frame: left(frame) != right(frame)
+
+        if operator.type not in BINARY:
+            raise ValueError(
+                "[interpreter] Operator [%s] not supported in binary expressions"
+                % operator.lexeme
+            )
+
+        apply, types = BINARY[operator.type]
+
+        if operator.type == Type.PLUS:
+            # the most common ones are applied without a call
+            def run(frame):
+                a, b = left(frame), right(frame)
+
+                if a.__class__ is not b.__class__ or a.__class__ not in types:
+                    Assert.operand_types(a, b, types, operator)
+
+                return a + b
+
+        elif operator.type == Type.LESS:
+
+            def run(frame):
+                a, b = left(frame), right(frame)
+
+                if a.__class__ is not b.__class__ or a.__class__ not in types:
+                    Assert.operand_types(a, b, types, operator)
+
+                return a < b
+
+        else:
+
+            def run(frame):
+                a, b = left(frame), right(frame)
+
+                if a.__class__ is not b.__class__ or a.__class__ not in types:
+                    Assert.operand_types(a, b, types, operator)
+
+                return apply(a, b)
+
+        return run
+
+    def compile_ternary(self, expr):
+        test = self.compile_expression(expr.test)
+        then, neht = self.compile_expression(expr.then), self.compile_expression(expr.neht)
+        operator = expr.operator
+
+        def run(frame):
+            value = test(frame)
+
+            if value is True:
+                return then(frame)
+
+            if value is not False:
+                Assert.operand_type(value, BOOL, operator)
+
+            return neht(frame)
+
+        return run
+
+    def compile_variable(self, node, name):
+        try:
+            depth = node.depth
+        except AttributeError:
+            # nodes no resolver has seen are looked up as globals
+            depth = None
+
+        if depth is None:
+            table = self.globals
+            values = table.values
+            index = None
+
+            def run(frame):
+                nonlocal index
+
+                # indices of a table never move, once found it is kept
+                if index is None:
+                    index = table.index(name)
+
+                value = values[index]
+
+                if value is EMPTY:
+                    raise UninitializedVariableError(name)
+
+                return value
+
+            return run
+
+        slot = node.slot
+
+        if depth == UPVALUE:
+
+            def run(frame):
+                value = frame.upvalues[slot].value
+
+                if value is EMPTY:
+                    raise UninitializedVariableError(name)
+
+                return value
+
+        elif depth == 0:
+
+            def run(frame):
+                value = frame.values[slot]
+
+                if value.__class__ is Cell:
+                    value = value.value
+
+                if value is EMPTY:
+                    raise UninitializedVariableError(name)
+
+                return value
+
+        else:
+
+            def run(frame):
+                return frame.get_at(depth, slot, name)
+
+        return run
+
+    def compile_assignment(self, expr):
+        right, name = self.compile_expression(expr.right), expr.left
+
+        try:
+            depth = expr.depth
+        except AttributeError:
+            depth = None
+
+        if depth is None:
+            table = self.globals
+            values = table.values
+            index = None
+
+            def run(frame):
+                nonlocal index
+                value = right(frame)
+
+                if index is None:
+                    index = table.index(name)
+
+                values[index] = value
+
+                return value
+
+            return run
+
+        slot = expr.slot
+
+        if depth == UPVALUE:
+
+            def run(frame):
+                value = frame.upvalues[slot].value = right(frame)
+                return value
+
+        else:
+
+            def run(frame):
+                value = right(frame)
+                frame.assign_at(depth, slot, value)
+                return value
+
+        return run
+
+    def compile_logical(self, expr):
+        left, right, token = (
+            self.compile_expression(expr.left),
+            self.compile_expression(expr.right),
+            expr.token,
+        )
+
+        if token.type == Type.OR:
+            stop = True
+        elif token.type == Type.AND:
+            stop = False
+        else:
+            raise ValueError("unsupported logical operator (%s)" % token.lexeme)
+
+        def run(frame):
+            value = left(frame)
+            Assert.operand_type(value, BOOL, token)
+
+            if value is stop:
+                return stop
+
+            value = right(frame)
+            Assert.operand_type(value, BOOL, token)
+            return value
+
+        return run
+
+    def compile_call(self, expr):
+        callee, token = self.compile_expression(expr.callee), expr.token
+        arguments = [self.compile_expression(argument) for argument in expr.arguments]
+        count = len(arguments)
+
+        def run(frame):
+            function = callee(frame)
+
+            if function.__class__ in FUNCTIONS:
+                values = [argument(frame) for argument in arguments]
+                routine = function.routine
+
+                if count != routine.arity:
+                    raise RuntimeError(
+                        token,
+                        "Expected %s arguments but got %s" % (routine.arity, count),
+                    )
+
+                # what Routine.run does, without a call of its own
+                code = routine.code or routine.compile()
+                block = routine.block
+
+                inner = take_frame(block, None, function.upvalues)
+                inner.values[:count] = values
+
+                for slot in block.cells:
+                    inner.values[slot] = Cell(inner.values[slot])
+
+                try:
+                    result = code(inner)
+                finally:
+                    release_frame(block, inner)
+
+                if result is not None:
+                    return result[0]
+
+                if function.isInitializer:
+                    return function.upvalues[0].value
+
+                return None
+
+            if not isinstance(function, Callable):
+                raise RuntimeError(token, "Can only call functions or classes")
+
+            values = [argument(frame) for argument in arguments]
+
+            if count != function.arity():
+                raise RuntimeError(
+                    token,
+                    "Expected %s arguments but got %s" % (function.arity(), count),
+                )
+
+            return function.call(self, values)
+
+        return run
+
+    def compile_get(self, expr):
+        object, name = self.compile_expression(expr.object), expr.name
+
+        def run(frame):
+            instance = object(frame)
+
+            if not isinstance(instance, Instance):
+                raise RuntimeError(name, "Only instances have properties")
+
+            return instance.get(name)
+
+        return run
+
+    def compile_set(self, expr):
+        object, name = self.compile_expression(expr.object), expr.name
+        value = self.compile_expression(expr.value)
+
+        def run(frame):
+            instance = object(frame)
+
+            if not isinstance(instance, Instance):
+                raise RuntimeError(name, "Only instances have properties")
+
+            return instance.set(name, value(frame))
+
+        return run
+
+    def compile_super(self, expr):
+        slot, receiver, method = expr.slot, expr.receiver, expr.method
+
+        def run(frame):
+            upvalues = frame.upvalues
+            superclass = upvalues[slot].value
+            object = upvalues[receiver].value
+
+            found = superclass.find_method(method.lexeme)
+
+            if found == None:
+                raise RuntimeError(method, "Undefined method '%s'" % method.lexeme)
+
+            return found.bind(object)
+
+        return run
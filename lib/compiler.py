@@ -0,0 +1,615 @@
+from lib import ast
+from lib.token import Type
+from lib.resolver import UPVALUE
+from lib.environment import EMPTY
+from lib.interpreter import slot_of
+
+# opcodes, each followed by the number of operands in OPERANDS. The VM
+# tests for them in this order, so the ones most programs run the most
+# come first
+(
+    GET_LOCAL,
+    CONSTANT,
+    GET_GLOBAL,
+    GET_UPVALUE,
+    CALL,
+    ASSERT_CALLABLE,
+    RETURN,
+    TEST_JUMP,
+    ADD,
+    SUBTRACT,
+    LESS,
+    LESS_EQUAL,
+    GREATER,
+    GREATER_EQUAL,
+    EQUAL,
+    NOT_EQUAL,
+    MULTIPLY,
+    DIVIDE,
+    POP,
+    JUMP,
+    LOOP_IF_TRUE,
+    SET_LOCAL,
+    SET_GLOBAL,
+    SET_UPVALUE,
+    GET_LOCAL_AT,
+    SET_LOCAL_AT,
+    DEFINE_LOCAL,
+    DEFINE_CELL,
+    DEFINE_GLOBAL,
+    NEW_CELL,
+    OR_JUMP,
+    AND_JUMP,
+    ASSERT_BOOL,
+    NEGATE,
+    NOT,
+    GET_PROPERTY,
+    ASSERT_INSTANCE,
+    SET_PROPERTY,
+    GET_SUPER,
+    CLOSURE,
+    ENTER_BLOCK,
+    LEAVE_BLOCK,
+    PRINT,
+    INHERIT,
+    CLASS,
+) = range(45)
+
+NAMES = [
+    "GET_LOCAL",
+    "CONSTANT",
+    "GET_GLOBAL",
+    "GET_UPVALUE",
+    "CALL",
+    "ASSERT_CALLABLE",
+    "RETURN",
+    "TEST_JUMP",
+    "ADD",
+    "SUBTRACT",
+    "LESS",
+    "LESS_EQUAL",
+    "GREATER",
+    "GREATER_EQUAL",
+    "EQUAL",
+    "NOT_EQUAL",
+    "MULTIPLY",
+    "DIVIDE",
+    "POP",
+    "JUMP",
+    "LOOP_IF_TRUE",
+    "SET_LOCAL",
+    "SET_GLOBAL",
+    "SET_UPVALUE",
+    "GET_LOCAL_AT",
+    "SET_LOCAL_AT",
+    "DEFINE_LOCAL",
+    "DEFINE_CELL",
+    "DEFINE_GLOBAL",
+    "NEW_CELL",
+    "OR_JUMP",
+    "AND_JUMP",
+    "ASSERT_BOOL",
+    "NEGATE",
+    "NOT",
+    "GET_PROPERTY",
+    "ASSERT_INSTANCE",
+    "SET_PROPERTY",
+    "GET_SUPER",
+    "CLOSURE",
+    "ENTER_BLOCK",
+    "LEAVE_BLOCK",
+    "PRINT",
+    "INHERIT",
+    "CLASS",
+]
+
+OPERANDS = {
+    GET_LOCAL: 1,
+    CONSTANT: 1,
+    GET_GLOBAL: 1,
+    GET_UPVALUE: 1,
+    CALL: 1,
+    TEST_JUMP: 1,
+    LOOP_IF_TRUE: 1,
+    JUMP: 1,
+    SET_LOCAL: 1,
+    SET_GLOBAL: 1,
+    SET_UPVALUE: 1,
+    GET_LOCAL_AT: 2,
+    SET_LOCAL_AT: 2,
+    DEFINE_LOCAL: 1,
+    DEFINE_CELL: 1,
+    DEFINE_GLOBAL: 1,
+    NEW_CELL: 1,
+    OR_JUMP: 1,
+    AND_JUMP: 1,
+    GET_PROPERTY: 1,
+    SET_PROPERTY: 1,
+    GET_SUPER: 3,
+    CLOSURE: 1,
+    ENTER_BLOCK: 1,
+    LEAVE_BLOCK: 1,
+    PRINT: 1,
+    CLASS: 3,
+}
+
+# constants which are interned by value, any other one by identity
+LITERALS = (bool, int, float, str)
+
+JUMPS = {TEST_JUMP, LOOP_IF_TRUE, JUMP, OR_JUMP, AND_JUMP}
+
+BINARY = {
+    Type.PLUS: ADD,
+    Type.MINUS: SUBTRACT,
+    Type.STAR: MULTIPLY,
+    Type.SLASH: DIVIDE,
+    Type.GREATER: GREATER,
+    Type.GREATER_EQUAL: GREATER_EQUAL,
+    Type.LESS: LESS,
+    Type.LESS_EQUAL: LESS_EQUAL,
+    Type.EQUAL_EQUAL: EQUAL,
+    Type.BANG_EQUAL: NOT_EQUAL,
+}
+
+
+class Code:
+    """Bytecode of a program or of a function body
+
+    `ops` holds the opcodes and their operands, which index `constants` or
+    are slots, counts or jump targets. `tokens` maps the offset of every
+    instruction which can fail to the token its error is reported at.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.ops = []
+        self.constants = []
+        self.tokens = {}
+
+
+class Prototype:
+    """Function as the compiler found it, whose body is compiled the first time it is called"""
+
+    def __init__(self, compiler, declaration, upvalues, isInitializer, name=None):
+        self.compiler = compiler
+        self.declaration = declaration
+        self.arity = len(declaration.parameters)
+        # where the cells a closure of it keeps are, as the resolver listed them
+        self.upvalues = upvalues
+        self.isInitializer = isInitializer
+        # None for anonymous functions
+        self.name = name
+        self.block = None
+        self.code = None
+
+    def compile(self):
+        block = self.declaration.body
+
+        # resolving or decoding the block annotates its nodes
+        if isinstance(block, ast.LazyBlock):
+            if block.block is None:
+                block.block, block.bindings = block.load()
+
+            block = block.block
+
+        self.block = block
+        self.code = self.compiler.compile_function(self, block)
+
+        return self.code
+
+
+class Compiler:
+    """Lowers a resolved AST to bytecode, one Code for the program and one per function"""
+
+    def compile(self, program):
+        code = Code("<script>")
+        self.begin(code)
+        self.statement(program)
+        self.emit(CONSTANT, self.constant(None))
+        self.emit(RETURN)
+
+        return code
+
+    def compile_expression(self, expression):
+        """Code returning the value of an expression, run where the program runs"""
+        code = Code("<expression>")
+        self.begin(code)
+        self.expression(expression)
+        self.emit(RETURN)
+
+        return code
+
+    def compile_function(self, prototype, block):
+        code = Code(prototype.name or "anonymous")
+        self.begin(code)
+
+        for statement in block.statements:
+            self.statement(statement)
+
+        if prototype.isInitializer:
+            # what an initializer returns is the instance it is bound to
+            self.emit(GET_UPVALUE, 0)
+        else:
+            self.emit(CONSTANT, self.constant(None))
+
+        self.emit(RETURN)
+
+        return code
+
+    def begin(self, code):
+        self.code = code
+        self.interned = {}
+        # the blocks with frames of their own around what is being compiled
+        self.blocks = []
+
+    def emit(self, op, *operands, token=None):
+        ops = self.code.ops
+        offset = len(ops)
+
+        if token is not None:
+            self.code.tokens[offset] = token
+
+        ops.append(op)
+        ops.extend(operands)
+
+        return offset
+
+    def emit_jump(self, op, token=None):
+        """Emits a jump, whose target patch() sets once it is known"""
+        return self.emit(op, -1, token=token)
+
+    def patch(self, operand):
+        self.code.ops[operand] = len(self.code.ops)
+
+    def constant(self, value):
+        if value is None or value.__class__ in LITERALS:
+            # 1, 1.0 and true are equal in Python, but not the same constant
+            key = (value.__class__, value)
+        else:
+            # nodes are equal to any node of the same shape
+            key = id(value)
+
+        index = self.interned.get(key)
+
+        if index is None:
+            index = self.interned[key] = len(self.code.constants)
+            self.code.constants.append(value)
+
+        return index
+
+    def name(self, token):
+        return self.constant(token.lexeme)
+
+    def statement(self, node):
+        try:
+            compile = STATEMENTS[node.__class__]
+        except KeyError:
+            compile = ast.dispatch(STATEMENTS, node.__class__)
+
+            if compile is None:
+                raise ValueError(
+                    "[compiler] Unsupported node type [%s]" % node.__class__.__name__
+                )
+
+        compile(self, node)
+
+    def expression(self, node):
+        try:
+            compile = EXPRESSIONS[node.__class__]
+        except KeyError:
+            compile = ast.dispatch(EXPRESSIONS, node.__class__)
+
+            if compile is None:
+                raise ValueError(
+                    "[compiler] Unsupported expression type [%s]"
+                    % node.__class__.__name__
+                )
+
+        compile(self, node)
+
+    def program(self, node):
+        for statement in node.statements:
+            self.statement(statement)
+
+    def cell(self, node):
+        """Puts a cell in the slot of a local closures capture, before they can capture it"""
+        slot = slot_of(node)
+
+        if slot is not None and node.cell:
+            self.emit(NEW_CELL, slot)
+
+    def define(self, node, name):
+        """Moves the value on top of the stack to where the declaration keeps it"""
+        slot = slot_of(node)
+
+        if slot is None:
+            self.emit(DEFINE_GLOBAL, self.constant(name), token=name)
+        elif node.cell:
+            self.emit(DEFINE_CELL, slot)
+        else:
+            self.emit(DEFINE_LOCAL, slot)
+
+    def class_declaration(self, node):
+        self.cell(node)
+        slot = slot_of(node)
+
+        if slot is None:
+            self.emit(CONSTANT, self.constant(None))
+            self.emit(DEFINE_GLOBAL, self.constant(node.name), token=node.name)
+        elif not node.cell:
+            self.emit(CONSTANT, self.constant(None))
+            self.emit(DEFINE_LOCAL, slot)
+
+        if node.super:
+            self.expression(node.super)
+            # the scope of `super`, which every method captures
+            self.emit(INHERIT, token=node.super)
+
+        for method in node.methods:
+            prototype = Prototype(
+                self,
+                method,
+                method.upvalues,
+                method.name.lexeme == "init",
+                method.name.lexeme,
+            )
+            self.emit(CLOSURE, self.constant(prototype))
+
+        self.emit(
+            CLASS,
+            self.constant(node.name.lexeme),
+            len(node.methods),
+            1 if node.super else 0,
+        )
+
+        if slot is None:
+            self.emit(SET_GLOBAL, self.name(node.name), token=node.name)
+            self.emit(POP)
+        elif node.cell:
+            self.emit(DEFINE_CELL, slot)
+        else:
+            self.emit(DEFINE_LOCAL, slot)
+
+    def expression_statement(self, node):
+        self.expression(node.expression)
+        self.emit(POP)
+
+    def print_statement(self, node):
+        for expression in node.expressions:
+            self.expression(expression)
+
+        self.emit(PRINT, len(node.expressions))
+
+    def variable_declaration(self, node):
+        self.cell(node)
+
+        if node.initializer is None:
+            self.emit(CONSTANT, self.constant(EMPTY))
+        else:
+            self.expression(node.initializer)
+
+        self.define(node, node.identifier)
+
+    def block(self, node):
+        if not node.size:
+            for statement in node.statements:
+                self.statement(statement)
+
+            return
+
+        block = self.constant(node)
+        self.emit(ENTER_BLOCK, block)
+        self.blocks.append(block)
+
+        for statement in node.statements:
+            self.statement(statement)
+
+        self.blocks.pop()
+        self.emit(LEAVE_BLOCK, block)
+
+    def if_statement(self, node):
+        self.expression(node.test)
+        # the tree-walker checks the test without a token to report
+        otherwise = self.emit_jump(TEST_JUMP, token=None) + 1
+        self.statement(node.then)
+
+        if node.neht is None:
+            self.patch(otherwise)
+            return
+
+        end = self.emit_jump(JUMP) + 1
+        self.patch(otherwise)
+        self.statement(node.neht)
+        self.patch(end)
+
+    def while_statement(self, node):
+        # only the first test is checked to be a bool, as in the tree-walker
+        self.expression(node.test)
+        end = self.emit_jump(TEST_JUMP, token=node.token) + 1
+        loop = len(self.code.ops)
+        self.statement(node.body)
+        self.expression(node.test)
+        self.emit(LOOP_IF_TRUE, loop)
+        self.patch(end)
+
+    def function_declaration(self, node):
+        # a recursive function captures the cell it is kept in
+        self.cell(node)
+        prototype = Prototype(self, node, node.upvalues, False, node.name.lexeme)
+        self.emit(CLOSURE, self.constant(prototype))
+        self.define(node, node.name)
+
+    def return_statement(self, node):
+        self.expression(node.expression)
+
+        # the frames of the blocks returned out of go back to their pools
+        for block in reversed(self.blocks):
+            self.emit(LEAVE_BLOCK, block)
+
+        self.emit(RETURN)
+
+    def literal(self, node):
+        self.emit(CONSTANT, self.constant(node.value))
+
+    def function_expression(self, node):
+        prototype = Prototype(self, node, node.upvalues, False)
+        self.emit(CLOSURE, self.constant(prototype))
+
+    def lambda_expression(self, node):
+        body = ast.Block([ast.ReturnStatement(node.expression, node.arrow)])
+        body.size, body.cells = node.size, node.cells
+        declaration = ast.FunctionExpression(node.parameters, body)
+
+        prototype = Prototype(self, declaration, node.upvalues, False)
+        self.emit(CLOSURE, self.constant(prototype))
+
+    def grouping(self, node):
+        self.expression(node.expression)
+
+    def unary(self, node):
+        self.expression(node.right)
+
+        if node.operator.type == Type.MINUS:
+            self.emit(NEGATE, token=node.operator)
+        elif node.operator.type == Type.BANG:
+            self.emit(NOT, token=node.operator)
+        else:
+            raise ValueError(
+                "[compiler] Unsupported operator [%s] in unary expression"
+                % node.operator.lexeme
+            )
+
+    def binary(self, node):
+        if node.operator.type not in BINARY:
+            raise ValueError(
+                "[compiler] Operator [%s] not supported in binary expressions"
+                % node.operator.lexeme
+            )
+
+        self.expression(node.left)
+        self.expression(node.right)
+        self.emit(BINARY[node.operator.type], token=node.operator)
+
+    def ternary(self, node):
+        self.expression(node.test)
+        otherwise = self.emit_jump(TEST_JUMP, token=node.operator) + 1
+        self.expression(node.then)
+        end = self.emit_jump(JUMP) + 1
+        self.patch(otherwise)
+        self.expression(node.neht)
+        self.patch(end)
+
+    def variable(self, node, name):
+        try:
+            depth = node.depth
+        except AttributeError:
+            # nodes no resolver has seen are looked up as globals
+            depth = None
+
+        if depth is None:
+            self.emit(GET_GLOBAL, self.name(name), token=name)
+        elif depth == UPVALUE:
+            self.emit(GET_UPVALUE, node.slot, token=name)
+        elif depth == 0:
+            self.emit(GET_LOCAL, node.slot, token=name)
+        else:
+            self.emit(GET_LOCAL_AT, depth, node.slot, token=name)
+
+    def variable_expression(self, node):
+        self.variable(node, node.variable)
+
+    def this_expression(self, node):
+        self.variable(node, node.token)
+
+    def assignment(self, node):
+        self.expression(node.right)
+
+        try:
+            depth = node.depth
+        except AttributeError:
+            depth = None
+
+        if depth is None:
+            self.emit(SET_GLOBAL, self.name(node.left), token=node.left)
+        elif depth == UPVALUE:
+            self.emit(SET_UPVALUE, node.slot)
+        elif depth == 0:
+            self.emit(SET_LOCAL, node.slot)
+        else:
+            self.emit(SET_LOCAL_AT, depth, node.slot)
+
+    def logical(self, node):
+        if node.token.type == Type.OR:
+            op = OR_JUMP
+        elif node.token.type == Type.AND:
+            op = AND_JUMP
+        else:
+            raise ValueError("unsupported logical operator (%s)" % node.token.lexeme)
+
+        self.expression(node.left)
+        end = self.emit_jump(op, token=node.token) + 1
+        self.expression(node.right)
+        self.emit(ASSERT_BOOL, token=node.token)
+        self.patch(end)
+
+    def call(self, node):
+        self.expression(node.callee)
+        # the callee is checked before the arguments are evaluated
+        self.emit(ASSERT_CALLABLE, token=node.token)
+
+        for argument in node.arguments:
+            self.expression(argument)
+
+        self.emit(CALL, len(node.arguments), token=node.token)
+
+    def get(self, node):
+        self.expression(node.object)
+        self.emit(GET_PROPERTY, self.constant(node.name), token=node.name)
+
+    def set(self, node):
+        self.expression(node.object)
+        self.emit(ASSERT_INSTANCE, token=node.name)
+        self.expression(node.value)
+        self.emit(SET_PROPERTY, self.constant(node.name))
+
+    def super_expression(self, node):
+        self.emit(
+            GET_SUPER,
+            node.slot,
+            node.receiver,
+            self.constant(node.method),
+            token=node.method,
+        )
+
+
+# node classes, each with the method of the compiler which lowers it
+STATEMENTS = {
+    ast.Program: Compiler.program,
+    ast.ClassDeclaration: Compiler.class_declaration,
+    ast.ExpressionStatement: Compiler.expression_statement,
+    ast.PrintStatement: Compiler.print_statement,
+    ast.VariableDeclaration: Compiler.variable_declaration,
+    ast.Block: Compiler.block,
+    ast.IfStatement: Compiler.if_statement,
+    ast.WhileStatement: Compiler.while_statement,
+    ast.FunctionDeclaration: Compiler.function_declaration,
+    ast.ReturnStatement: Compiler.return_statement,
+}
+
+EXPRESSIONS = {
+    ast.LiteralExpression: Compiler.literal,
+    ast.FunctionExpression: Compiler.function_expression,
+    ast.LambdaExpression: Compiler.lambda_expression,
+    ast.GroupingExpression: Compiler.grouping,
+    ast.UnaryExpression: Compiler.unary,
+    ast.BinaryExpression: Compiler.binary,
+    ast.TernaryExpression: Compiler.ternary,
+    ast.VariableExpression: Compiler.variable_expression,
+    ast.AssignmentExpression: Compiler.assignment,
+    ast.LogicalExpression: Compiler.logical,
+    ast.CallExpression: Compiler.call,
+    ast.GetExpression: Compiler.get,
+    ast.SetExpression: Compiler.set,
+    ast.SuperExpression: Compiler.super_expression,
+    ast.ThisExpression: Compiler.this_expression,
+}
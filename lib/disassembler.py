@@ -0,0 +1,85 @@
+import sys
+from lib import ast
+from lib.token import Token
+from lib.compiler import NAMES, OPERANDS, JUMPS, Prototype, CONSTANT, GET_GLOBAL, SET_GLOBAL
+from lib.compiler import DEFINE_GLOBAL, GET_PROPERTY, SET_PROPERTY, CLOSURE
+from lib.compiler import ENTER_BLOCK, LEAVE_BLOCK, CLASS, GET_SUPER
+
+# the operand of each opcode which indexes the constants
+CONSTANTS = {
+    CONSTANT: 0,
+    GET_GLOBAL: 0,
+    SET_GLOBAL: 0,
+    DEFINE_GLOBAL: 0,
+    GET_PROPERTY: 0,
+    SET_PROPERTY: 0,
+    CLOSURE: 0,
+    ENTER_BLOCK: 0,
+    LEAVE_BLOCK: 0,
+    CLASS: 0,
+    GET_SUPER: 2,
+}
+
+
+def constant_text(value):
+    if isinstance(value, Prototype):
+        return "<fun %s>" % (value.name or "anonymous")
+
+    if isinstance(value, Token):
+        return value.lexeme
+
+    if isinstance(value, ast.AST):
+        return "<%s>" % value.__class__.__name__
+
+    return repr(value)
+
+
+def instructions(code):
+    """Yields the offset, opcode and operands of every instruction of `code`"""
+    ops, offset = code.ops, 0
+
+    while offset < len(ops):
+        op = ops[offset]
+        count = OPERANDS.get(op, 0)
+
+        yield offset, op, ops[offset + 1 : offset + 1 + count]
+        offset += 1 + count
+
+
+def disassemble(code, out=None):
+    """Writes the instructions of `code`, then those of every function in it
+
+    Function bodies are compiled for it, the lazily parsed ones included.
+    """
+    out = out or sys.stdout
+    pending = [code]
+
+    while pending:
+        code = pending.pop(0)
+        out.write("== %s ==\n" % code.name)
+        line = None
+
+        for offset, op, operands in instructions(code):
+            token = code.tokens.get(offset)
+            text = ["%04d" % offset]
+
+            # a superclass check reports its node, as the tree-walker does
+            if not isinstance(token, Token) or token.line == line:
+                text.append("   |")
+            else:
+                line = token.line
+                text.append("%4d" % line)
+
+            text.append("%-16s" % NAMES[op])
+            text.extend(map(str, operands))
+
+            if op in JUMPS:
+                text.append("-> %04d" % operands[0])
+            elif op in CONSTANTS:
+                text.append(constant_text(code.constants[operands[CONSTANTS[op]]]))
+
+            out.write(" ".join(text).rstrip() + "\n")
+
+        for value in code.constants:
+            if isinstance(value, Prototype):
+                pending.append(value.code or value.compile())
@@ -1,46 +1,49 @@
-from imgcat import imgcat
 from textwrap import indent
-from graphviz import Source
 from lib import ast
 from lib.token import Token, Type
+from lib.flat_ast import Handle
 
 
-def dot_node(node, label, children=[]):
-    values = []
+def node_id(node):
+    # handles of a flat tree are made on access, so their id() is not stable
+    return node.key() if isinstance(node, Handle) else id(node)
+
 
-    values.append('%s [label="%s"]' % (id(node), label))
+def dot_node(node, label, children=[]):
+    """Returns the lines describing `node`, with its child nodes left in place of theirs"""
+    parts = ['%s [label="%s"]' % (node_id(node), label)]
 
     if isinstance(children, list):
         for child in children:
             if child is None:
                 continue
 
-            values.append(to_dot(child))
-            values.append(dot_transition(node, child))
+            parts.append(child)
+            parts.append(dot_transition(node, child))
     elif isinstance(children, dict):
         for label, child in children.items():
             if child is None:
                 continue
 
             if isinstance(child, list):
-                for (i, c) in enumerate(child):
-                    values.append(to_dot(c))
-                    values.append(dot_transition(node, c, "argument #%s" % i))
+                for i, c in enumerate(child):
+                    parts.append(c)
+                    parts.append(dot_transition(node, c, "argument #%s" % i))
             else:
-                values.append(dot_transition(node, child, label))
-                values.append(to_dot(child))
+                parts.append(dot_transition(node, child, label))
+                parts.append(child)
     else:
-        values.append(to_dot(children))
-        values.append(dot_transition(node, children))
+        parts.append(children)
+        parts.append(dot_transition(node, children))
 
-    return "\n".join(values)
+    return parts
 
 
 def dot_transition(a, b, label=None):
     if label:
-        return '%s -> %s [label="%s"]' % (id(a), id(b), label)
+        return '%s -> %s [label="%s"]' % (node_id(a), node_id(b), label)
 
-    return "%s -> %s" % (id(a), id(b))
+    return "%s -> %s" % (node_id(a), node_id(b))
 
 
 def dot_block(name, body):
@@ -52,9 +55,24 @@ def dot_digraph(node):
 
 
 def to_dot(node):
-    if node is None:
-        return ""
+    # expanded from a stack rather than by recursion, so that the depth
+    # of the tree is only limited by memory
+    lines, stack = [], [node]
+
+    while stack:
+        part = stack.pop()
+
+        if isinstance(part, str):
+            lines.append(part)
+        elif part is None:
+            lines.append("")
+        else:
+            stack.extend(reversed(dot_parts(part)))
 
+    return "\n".join(lines)
+
+
+def dot_parts(node):
     if isinstance(node, ast.Program):
         return dot_node(node, "Program", node.statements)
 
@@ -74,6 +92,9 @@ def to_dot(node):
     if isinstance(node, ast.Block):
         return dot_node(node, "Block", node.statements)
 
+    if isinstance(node, ast.LazyBlock):
+        return dot_node(node, "LazyBlock")
+
     if isinstance(node, ast.IfStatement):
         return dot_node(
             node,
@@ -154,4 +175,7 @@ def ast_to_dot(node):
 
 
 def ast_to_image(ast):
+    from imgcat import imgcat
+    from graphviz import Source
+
     imgcat(Source(ast_to_dot(ast), format="png").pipe())
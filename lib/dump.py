@@ -0,0 +1,236 @@
+import sys
+from bisect import bisect_right
+from json.encoder import encode_basestring as string
+from lib import ast
+from lib.token import Token, Type
+
+NAMES = {type: string(type.name) for type in Type}
+NAMES.update({int(type): name for type, name in NAMES.items()})
+
+
+class Writer:
+    """Collects output and writes it to `out` in chunks"""
+
+    def __init__(self, out, chunk=1 << 12):
+        self.out = out
+        self.chunk = chunk
+        self.parts = []
+
+    def write(self, part):
+        self.parts.append(part)
+
+        if len(self.parts) >= self.chunk:
+            self.flush()
+
+    def flush(self):
+        self.out.write("".join(self.parts))
+        self.parts = []
+
+
+def literal(value):
+    if value is None:
+        return "null"
+
+    if value is True:
+        return "true"
+
+    if value is False:
+        return "false"
+
+    if isinstance(value, str):
+        return string(value)
+
+    return repr(value)
+
+
+class Positions:
+    """Line and column of offsets which mostly come in increasing order"""
+
+    def __init__(self, source):
+        self.source = source
+        self.line = 1
+
+    def position(self, offset):
+        starts, line = self.source.lines(), self.line
+
+        if starts[line - 1] > offset:
+            line = bisect_right(starts, offset)
+
+        while line < len(starts) and starts[line] <= offset:
+            line += 1
+
+        self.line = line
+
+        return line, offset - starts[line - 1] + 1
+
+
+def token_records(tokens):
+    """Yields (type, lexeme, literal, line, column) for every token"""
+    types = getattr(tokens, "types", None)
+
+    if types is not None:
+        # a TokenBuffer, read straight from its arrays
+        lexemes, literals = tokens.lexemes, tokens.literals
+        positions = Positions(tokens.positions) if tokens.positions else None
+
+        for type, id, start in zip(types, tokens.ids, tokens.starts):
+            line, column = positions.position(start) if positions else (None, None)
+            yield type, lexemes[id], literals[id], line, column
+
+        return
+
+    source, positions = None, None
+
+    for token in tokens:
+        if token.source is None or token.fixed_line is not None:
+            yield token.type, token.lexeme, token.literal, token.line, token.column
+            continue
+
+        if token.source is not source:
+            source = token.source
+            positions = Positions(source) if hasattr(source, "lines") else None
+
+        if positions is None:
+            yield token.type, token.lexeme, token.literal, token.line, token.column
+        else:
+            line, column = positions.position(token.offset)
+            yield token.type, token.lexeme, token.literal, line, column
+
+
+def dump_tokens(tokens, out=None):
+    """Writes the tokens as JSON Lines"""
+    writer = Writer(out or sys.stdout)
+
+    for type, lexeme, value, line, column in token_records(tokens):
+        writer.write(
+            '{"type":%s,"lexeme":%s,"literal":%s,"line":%s,"column":%s}\n'
+            % (
+                NAMES[type],
+                string(lexeme),
+                literal(value),
+                literal(line),
+                literal(column),
+            )
+        )
+
+    writer.flush()
+
+
+def token_text(token):
+    line, column = token.line, token.column
+
+    if column is None:
+        return "%r@%s" % (token.lexeme, line)
+
+    return "%r@%s:%s" % (token.lexeme, line, column)
+
+
+def scalar_text(value):
+    if isinstance(value, Token):
+        return token_text(value)
+
+    if isinstance(value, list):
+        return "[%s]" % ", ".join(map(scalar_text, value))
+
+    return repr(value)
+
+
+def fields(node):
+    # bodies which are not parsed yet are printed without their tokens or bytes
+    return {} if isinstance(node, ast.LazyBlock) else vars(node)
+
+
+def is_node(value):
+    return isinstance(value, ast.AST) or (
+        isinstance(value, list) and any(isinstance(item, ast.AST) for item in value)
+    )
+
+
+def dump_ast(node, out=None):
+    """Writes the tree as indented text, one node per line with its other fields inline"""
+    writer = Writer(out or sys.stdout)
+    stack = [("", node, 0)]
+
+    while stack:
+        label, node, depth = stack.pop()
+        indent = "  " * depth
+
+        if node is None:
+            writer.write("%s%sNone\n" % (indent, label))
+            continue
+
+        values = fields(node)
+        inline = " ".join(
+            "%s=%s" % (name, scalar_text(value))
+            for name, value in values.items()
+            if not is_node(value)
+        )
+        writer.write(
+            "%s%s%s%s\n"
+            % (indent, label, node.__class__.__name__, " " + inline if inline else "")
+        )
+
+        children = []
+        for name, value in values.items():
+            if isinstance(value, list) and is_node(value):
+                children.extend(
+                    ("%s[%d]: " % (name, i), item, depth + 1)
+                    for i, item in enumerate(value)
+                )
+            elif isinstance(value, ast.AST):
+                children.append(("%s: " % name, value, depth + 1))
+
+        stack.extend(reversed(children))
+
+    writer.flush()
+
+
+def token_json(token):
+    return '{"type":%s,"lexeme":%s,"literal":%s,"line":%s,"column":%s}' % (
+        NAMES[token.type],
+        string(token.lexeme),
+        literal(token.literal),
+        literal(token.line),
+        literal(token.column),
+    )
+
+
+def expand(value):
+    """Values still to be expanded on the stack, scalars are encoded right away"""
+    if isinstance(value, (ast.AST, list, Token)):
+        return value
+
+    return literal(value)
+
+
+def dump_ast_json(node, out=None):
+    """Writes the tree as a single JSON document"""
+    writer = Writer(out or sys.stdout)
+    # strings are written as they are, nodes, lists and tokens are expanded
+    stack = ["\n", node]
+
+    while stack:
+        item = stack.pop()
+
+        if isinstance(item, str):
+            writer.write(item)
+        elif isinstance(item, ast.AST):
+            writer.write('{"node":%s' % string(item.__class__.__name__))
+            stack.append("}")
+
+            for name, value in reversed(fields(item).items()):
+                stack.append(expand(value))
+                stack.append(",%s:" % string(name))
+        elif isinstance(item, list):
+            writer.write("[")
+            stack.append("]")
+
+            for i in range(len(item) - 1, -1, -1):
+                stack.append(expand(item[i]))
+
+                if i:
+                    stack.append(",")
+        else:
+            writer.write(token_json(item))
+
+    writer.flush()
@@ -1,3 +1,4 @@
+from itertools import count
 from lib.error import (
     UndefinedVariableError,
     RedeclaringVariableError,
@@ -9,12 +10,16 @@ class EmptyValue:
     pass
 
 
+# value of variables which are declared, but not initialized
+EMPTY = EmptyValue()
+
+
 class Environment:
     def __init__(self, parent=None):
         self.map = {}
         self.parent = parent
 
-    def define(self, var, value=EmptyValue()):
+    def define(self, var, value=EMPTY):
         if var.lexeme in self.map:
             raise RedeclaringVariableError(var)
 
@@ -62,3 +67,182 @@ class Environment:
             ancestor = ancestor.parent
 
         return ancestor
+
+
+# versions of global tables, which no two tables share
+versions = count()
+
+
+class GlobalTable:
+    """Global variables, kept in a list at indices which never move
+
+    Nodes cache the index of the name they refer to, together with the
+    version of the table it is an index into, so a repeated lookup is an
+    index rather than a search by name.
+    """
+
+    # no function is running at the top level, so there is nothing captured
+    upvalues = None
+
+    def __init__(self):
+        self.indices = {}
+        self.values = []
+        self.version = next(versions)
+
+    def index(self, var):
+        index = self.indices.get(var.lexeme)
+
+        if index is None:
+            raise UndefinedVariableError(var)
+
+        return index
+
+    def define(self, var, value=EMPTY):
+        if var.lexeme in self.indices:
+            raise RedeclaringVariableError(var)
+
+        self.indices[var.lexeme] = len(self.values)
+        self.values.append(value)
+
+    def get(self, var):
+        value = self.values[self.index(var)]
+
+        if value is EMPTY:
+            raise UninitializedVariableError(var)
+
+        return value
+
+    def assign(self, var, value):
+        self.values[self.index(var)] = value
+
+    def cache(self, node, var):
+        index = self.index(var)
+        node.cached = (self.version, index)
+
+        return index
+
+    def get_cached(self, node, var):
+        try:
+            version, index = node.cached
+        except AttributeError:
+            version = None
+
+        if version != self.version:
+            index = self.cache(node, var)
+
+        value = self.values[index]
+
+        if value is EMPTY:
+            raise UninitializedVariableError(var)
+
+        return value
+
+    def assign_cached(self, node, var, value):
+        try:
+            version, index = node.cached
+        except AttributeError:
+            version = None
+
+        if version != self.version:
+            index = self.cache(node, var)
+
+        self.values[index] = value
+
+
+class Cell:
+    """Variable closures capture, shared by its frame and every one of them"""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def get(self, name):
+        value = self.value
+
+        if value is EMPTY:
+            raise UninitializedVariableError(name)
+
+        return value
+
+
+class Frame:
+    """Locals of a scope, kept at the slots the resolver numbered them with
+
+    The frames of a call chain up to the one of the function's parameters,
+    and all of them share the cells the function closed over as upvalues.
+    Variables which closures capture are kept in cells of their own.
+    """
+
+    __slots__ = ("values", "parent", "upvalues")
+
+    def __init__(self, parent, values, upvalues=None):
+        self.parent = parent
+        self.values = values
+        self.upvalues = upvalues
+
+    def get_at(self, depth, slot, name):
+        frame = self
+
+        while depth:
+            frame = frame.parent
+            depth -= 1
+
+        value = frame.values[slot]
+
+        if value.__class__ is Cell:
+            value = value.value
+
+        if value is EMPTY:
+            raise UninitializedVariableError(name)
+
+        return value
+
+    def assign_at(self, depth, slot, value):
+        frame = self
+
+        while depth:
+            frame = frame.parent
+            depth -= 1
+
+        values = frame.values
+
+        if values[slot].__class__ is Cell:
+            values[slot].value = value
+        else:
+            values[slot] = value
+
+    def cell_at(self, depth, slot):
+        frame = self
+
+        while depth:
+            frame = frame.parent
+            depth -= 1
+
+        return frame.values[slot]
+
+
+def take_frame(block, parent, upvalues):
+    """Frame to run a block in, from the frames it ran in before
+
+    No frame outlives the run it was taken for, as closures only keep the
+    cells in it. Every declaration sets its slot before it can be read, so
+    the values an earlier run left in the frame are never seen.
+    """
+    try:
+        pool = block.pool
+    except AttributeError:
+        pool = block.pool = []
+
+    if not pool:
+        return Frame(parent, [EMPTY] * block.size, upvalues)
+
+    frame = pool.pop()
+    frame.parent = parent
+    frame.upvalues = upvalues
+
+    return frame
+
+
+def release_frame(block, frame):
+    block.pool.append(frame)
@@ -1,13 +1,23 @@
 from lib.stringify import stringify, stringify_type, stringify_types
 
 
+def location(token):
+    if token is None:
+        return "unknown line"
+
+    if token.column is None:
+        return "line %d" % token.line
+
+    return "line %d, column %d" % (token.line, token.column)
+
+
 class RuntimeError(BaseException):
     def __init__(self, token, message):
         self.token = token
         self.message = message
 
     def __str__(self):
-        return "runtime error on line %d: %s" % (self.token.line, self.message)
+        return "runtime error on %s: %s" % (location(self.token), self.message)
 
     def __eq__(self, other):
         return self.token == other.token and self.message == other.message
@@ -29,12 +39,20 @@ class CompileErrors(CompileError):
 
 
 class ScanError(CompileError):
-    def __init__(self, line, message):
+    def __init__(self, line, message, column=None):
         self.line = line
+        self.column = column
         self.message = message
 
     def __str__(self):
-        return "scan error on line %d: %s" % (self.line, self.message)
+        if self.column is None:
+            return "scan error on line %d: %s" % (self.line, self.message)
+
+        return "scan error on line %d, column %d: %s" % (
+            self.line,
+            self.column,
+            self.message,
+        )
 
     def __eq__(self, other):
         return self.line == other.line and self.message == other.message
@@ -46,7 +64,7 @@ class ParseError(CompileError):
         self.message = message
 
     def __str__(self):
-        return "parse error on line %d: %s" % (self.token.line, self.message)
+        return "parse error on %s: %s" % (location(self.token), self.message)
 
     def __eq__(self, other):
         return self.token == other.token and self.message == other.message
@@ -58,7 +76,7 @@ class ResolverError(CompileError):
         self.message = message
 
     def __str__(self):
-        return "resolver error on line %d: %s" % (self.token.line, self.message)
+        return "resolver error on %s: %s" % (location(self.token), self.message)
 
     def __eq__(self, other):
         return self.token == other.token and self.message == other.message
@@ -0,0 +1,335 @@
+import sys
+from array import array
+from inspect import signature
+from lib import ast
+from lib.token import Token
+from lib.token_buffer import TYPES
+
+# every field is stored as one integer, its kind in the lowest two bits
+NODE, TOKEN, LIST, CONSTANT = range(4)
+
+NONE = -1
+
+# what the resolver annotates nodes with, one array of each in a tree.
+# Those which are tuples are kept as constants, by their index
+ANNOTATIONS = ("depth", "slot", "receiver", "cell", "size", "cells", "upvalues")
+TUPLES = ("cells", "upvalues")
+
+
+def node_classes():
+    """Node classes and their fields, the parameters of their __init__"""
+    classes = []
+
+    for cls in vars(ast).values():
+        if (
+            isinstance(cls, type)
+            and issubclass(cls, ast.AST)
+            and "__init__" in vars(cls)
+            and not issubclass(cls, ast.LazyBlock)
+        ):
+            # every parameter of an __init__ but self is a field of the same name
+            fields = tuple(signature(cls.__init__).parameters)[1:]
+            classes.append((cls, fields))
+
+    return classes
+
+
+CLASSES = node_classes()
+KINDS = {cls: kind for kind, (cls, _) in enumerate(CLASSES)}
+
+
+class FlatAST:
+    """AST stored as parallel arrays instead of an object per node and token
+
+    Nodes are numbered in postorder, so the root is the last one and every
+    child comes before its parent. `node(index)` returns a handle, which is
+    an instance of the node's class whose fields are read from the arrays,
+    so the resolver, interpreter and printers walk it like the object AST.
+    A node has one handle, made on first access, so that what the
+    interpreter keeps on nodes stays between visits.
+    """
+
+    def __init__(self):
+        self.kinds = array("B")
+        self.firsts = array("I")
+        self.fields = array("q")
+        self.lists = array("q")
+
+        self.token_types = array("B")
+        self.token_lexemes = array("I")
+        self.token_literals = array("I")
+        self.token_offsets = array("q")
+        self.token_lines = array("q")
+        self.token_sources = array("I")
+
+        self.constants = []
+        self.interned = {}
+        self.handles = {}
+
+        # resolver annotations, by node
+        self.annotations = {name: array("i") for name in ANNOTATIONS}
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def root(self):
+        return self.node(len(self.kinds) - 1)
+
+    def node(self, index):
+        handle = self.handles.get(index)
+
+        if handle is None:
+            handle = self.handles[index] = HANDLES[self.kinds[index]](self, index)
+
+        return handle
+
+    def field(self, index, position):
+        return self.decode(self.fields[self.firsts[index] + position])
+
+    def decode(self, value):
+        payload, kind = value >> 2, value & 3
+
+        if kind == NODE:
+            return self.node(payload)
+
+        if kind == CONSTANT:
+            return self.constants[payload]
+
+        if kind == TOKEN:
+            return self.token(payload)
+
+        decode, lists = self.decode, self.lists
+        return [
+            decode(lists[i]) for i in range(payload + 1, payload + 1 + lists[payload])
+        ]
+
+    def token(self, index):
+        line, offset = self.token_lines[index], self.token_offsets[index]
+
+        return Token(
+            TYPES[self.token_types[index]],
+            self.constants[self.token_lexemes[index]],
+            self.constants[self.token_literals[index]],
+            None if line == NONE else line,
+            None if offset == NONE else offset,
+            self.constants[self.token_sources[index]],
+        )
+
+    def constant(self, value):
+        key = (type(value), value)
+        index = self.interned.get(key)
+
+        if index is None:
+            index = self.interned[key] = len(self.constants)
+            self.constants.append(value)
+
+        return index
+
+    def encode(self, value, values):
+        """Encodes a field whose nodes are already numbered in `values`"""
+        if isinstance(value, ast.AST) and not isinstance(value, ast.LazyBlock):
+            return values[value] << 2 | NODE
+
+        if isinstance(value, Token):
+            index = len(self.token_types)
+            line, offset = value.fixed_line, value.offset
+
+            self.token_types.append(value.type)
+            self.token_lexemes.append(self.constant(value.lexeme))
+            self.token_literals.append(self.constant(value.literal))
+            self.token_offsets.append(NONE if offset is None else offset)
+            self.token_lines.append(NONE if line is None else line)
+            self.token_sources.append(self.constant(value.source))
+
+            return index << 2 | TOKEN
+
+        if isinstance(value, list):
+            items = [self.encode(item, values) for item in value]
+            index = len(self.lists)
+
+            self.lists.append(len(items))
+            self.lists.extend(items)
+
+            return index << 2 | LIST
+
+        # literal values, and lazy bodies which are kept as they are
+        return self.constant(value) << 2 | CONSTANT
+
+    @staticmethod
+    def from_ast(root):
+        tree, values = FlatAST(), {}
+        stack = [root]
+
+        while stack:
+            item = stack.pop()
+
+            if isinstance(item, tuple):
+                # every child of the node is numbered by now
+                node, fields = item
+                values[node] = len(tree.kinds)
+
+                tree.kinds.append(KINDS[type(node)])
+                for name, annotated in tree.annotations.items():
+                    value = getattr(node, name, None)
+
+                    if value is not None and name in TUPLES:
+                        value = tree.constant(value)
+
+                    annotated.append(NONE if value is None else value)
+                tree.firsts.append(len(tree.fields))
+                tree.fields.extend(
+                    tree.encode(getattr(node, name), values) for name in fields
+                )
+            elif isinstance(item, list):
+                stack.extend(reversed(item))
+            elif isinstance(item, ast.AST) and not isinstance(item, ast.LazyBlock):
+                if item in values:
+                    continue
+
+                fields = CLASSES[KINDS[type(item)]][1]
+                stack.append((item, fields))
+                stack.extend(reversed([getattr(item, name) for name in fields]))
+
+        # constants are only interned while the tree is built
+        tree.interned = {}
+
+        return tree
+
+    def to_ast(self):
+        """Builds the object AST back, children first"""
+        nodes, decode = [], self.decode_object
+
+        for index, kind in enumerate(self.kinds):
+            cls, fields = CLASSES[kind]
+            node = cls.__new__(cls)
+            first = self.firsts[index]
+
+            for position, name in enumerate(fields):
+                setattr(node, name, decode(self.fields[first + position], nodes))
+
+            for name in ANNOTATIONS:
+                value = self.annotation(name, index)
+
+                if value is not None:
+                    setattr(node, name, value)
+
+            nodes.append(node)
+
+        return nodes[-1]
+
+    def annotation(self, name, index):
+        value = self.annotations[name][index]
+
+        if value == NONE:
+            return None
+
+        return self.constants[value] if name in TUPLES else value
+
+    def set_annotation(self, name, index, value):
+        if value is not None and name in TUPLES:
+            value = self.constant(value)
+
+        self.annotations[name][index] = NONE if value is None else value
+
+    def decode_object(self, value, nodes):
+        payload, kind = value >> 2, value & 3
+
+        if kind == NODE:
+            return nodes[payload]
+
+        if kind == LIST:
+            lists = self.lists
+            return [
+                self.decode_object(lists[i], nodes)
+                for i in range(payload + 1, payload + 1 + lists[payload])
+            ]
+
+        return self.decode(value)
+
+    def nbytes(self):
+        """Bytes held by the arrays and the constants they refer to"""
+        arrays = [
+            self.kinds,
+            *self.annotations.values(),
+            self.firsts,
+            self.fields,
+            self.lists,
+            self.token_types,
+            self.token_lexemes,
+            self.token_literals,
+            self.token_offsets,
+            self.token_lines,
+            self.token_sources,
+        ]
+
+        return (
+            sum(sys.getsizeof(values) for values in arrays)
+            + sys.getsizeof(self.constants)
+            + sum(
+                sys.getsizeof(value)
+                for value in self.constants
+                if isinstance(value, (str, int, float))
+            )
+        )
+
+
+class Handle:
+    """Node of a FlatAST, equal to and hashed like any other handle of the same node"""
+
+    # tree and index are slots of each handle class, as AST has slots of its
+    # own which they could not be laid out next to here
+    __slots__ = ()
+
+    def __init__(self, tree, index):
+        self.tree = tree
+        self.index = index
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, Handle)
+            and self.tree is other.tree
+            and self.index == other.index
+        )
+
+    def __hash__(self):
+        return self.index
+
+    def __repr__(self):
+        return "%s#%d" % (self.__class__.__name__, self.index)
+
+    def key(self):
+        """Identifies the node within its tree, as id() does for object nodes"""
+        return "flat%d_%d" % (id(self.tree), self.index)
+
+
+def annotation(name):
+    def get(self):
+        return self.tree.annotation(name, self.index)
+
+    def set(self, value):
+        self.tree.set_annotation(name, self.index, value)
+
+    return property(get, set)
+
+
+def field(position):
+    return property(lambda self: self.tree.field(self.index, position))
+
+
+def field_values(fields):
+    # what vars() of a handle returns, so it is digested and compared like a node
+    return property(lambda self: {name: getattr(self, name) for name in fields})
+
+
+def handle_class(cls, fields):
+    attributes = {
+        "__slots__": ("tree", "index"),
+        "__dict__": field_values(fields),
+    }
+    attributes.update((name, annotation(name)) for name in ANNOTATIONS)
+    attributes.update((name, field(position)) for position, name in enumerate(fields))
+
+    return type(cls.__name__, (Handle, cls), attributes)
+
+
+HANDLES = [handle_class(cls, fields) for cls, fields in CLASSES]
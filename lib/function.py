@@ -1,13 +1,15 @@
 import lib.interpreter
+from lib import ast
 from lib.callable import Callable
-from lib.environment import Environment
-from lib.token import identifier
+from lib.environment import Cell, take_frame, release_frame
 
 
 class Function(Callable):
-    def __init__(self, declaration, closure, isInitializer):
+    def __init__(self, declaration, upvalues, isInitializer):
         self.declaration = declaration
-        self.closure = closure
+        # cells of the variables the function closed over, the first one
+        # of a method holding the instance it is bound to
+        self.upvalues = upvalues
         self.isInitializer = isInitializer
 
     def identifier(self):
@@ -23,18 +25,27 @@ class Function(Callable):
         return self.declaration.body
 
     def call(self, interpreter, arguments):
-        env = Environment(self.closure)
+        body = self.declaration.body
+        if isinstance(body, ast.LazyBlock):
+            body = interpreter.force(body)
 
-        for (i, parameter) in enumerate(self.declaration.parameters):
-            env.define(parameter, arguments[i])
+        # the parameters take the first slots of the frame
+        env = take_frame(body, None, self.upvalues)
+        values = env.values
+        values[: len(arguments)] = arguments
+
+        for slot in body.cells:
+            values[slot] = Cell(values[slot])
 
         try:
-            interpreter.execute_block(self.declaration.body, env)
+            interpreter.execute_block(body, env)
         except lib.interpreter.Return as r:
             return r.value
+        finally:
+            release_frame(body, env)
 
         if self.isInitializer:
-            return self.closure.get_at(0, identifier("this"))
+            return self.upvalues[0].value
 
         return None
 
@@ -42,9 +53,10 @@ class Function(Callable):
         return len(self.declaration.parameters)
 
     def bind(self, this):
-        env = self.closure.child()
-        env.define(identifier("this"), this)
-        return Function(self.declaration, env, self.isInitializer)
+        upvalues = list(self.upvalues)
+        upvalues[0] = Cell(this)
+
+        return Function(self.declaration, upvalues, self.isInitializer)
 
 
 class AnonymousFunction(Function):
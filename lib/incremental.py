@@ -0,0 +1,530 @@
+import random
+from lib import ast
+from lib.token import Token, Type
+from lib.parser import Parser
+from lib.resolver import Resolver
+from lib.regex_scanner import RegexScanner
+from lib.source import Source
+from lib.error import CompileErrors
+
+# how many following declarations a damaged region may take in
+# before its errors are accepted as the errors of the document
+MAX_EXTENSION = 2
+
+
+def place(source, offset, newlines, carried):
+    """Position of `offset` in `source`, whose text comes after `newlines`
+    newlines and `carried` characters of the line it starts on"""
+    line, column = source.position(offset)
+
+    if line == 1:
+        return newlines + 1, carried + column
+
+    return newlines + line, column
+
+
+class Segment:
+    """Maps offsets in text which follows the units `before` onto positions
+    in the whole document"""
+
+    def __init__(self, before, source):
+        self.before = before
+        self.source = source
+
+    def position(self, offset):
+        before = self.before
+
+        if before is None:
+            return self.source.position(offset)
+
+        start = before.last_line if before.last_line is not None else 0
+        return place(self.source, offset, before.total_newlines, before.total - start)
+
+    def line(self, offset):
+        return self.position(offset)[0]
+
+
+class Tail:
+    """Maps offsets in the text from `start` to the end of a document onto
+    positions in the whole document"""
+
+    def __init__(self, document, start):
+        self.document = document
+        self.start = start
+
+    def position(self, offset):
+        return self.document.position(self.start + offset)
+
+    def line(self, offset):
+        return self.position(offset)[0]
+
+
+class Unit:
+    """A top-level declaration with the tokens, node and bindings built from it
+
+    Units are the nodes of a treap kept in document order. Each holds its
+    text, the gap before the declaration included, and every subtree sums
+    up its length and newlines, so that a unit finds where it is from the
+    units on its way to the root instead of from a stored offset.
+    """
+
+    def __init__(self, document, text, lead, tokens, node, errors):
+        self.document = document
+        self.text = text
+        self.lead = lead
+        self.length = len(text) - lead
+        self.tokens = tokens
+        self.node = node
+        self.errors = errors
+        self.bindings = {}
+        self.priority = random.random()
+        self.left = self.right = self.parent = None
+        self.measure()
+
+    def measure(self):
+        self.source = Source(self.text)
+        starts = self.source.lines()
+        self.newlines = len(starts) - 1
+        self.line_start = starts[-1] if self.newlines else None
+        self.update()
+
+    def update(self):
+        """Sums the subtree up again from the sums of its children"""
+        left, right = self.left, self.right
+        count, total, newlines = 1, len(self.text), self.newlines
+        last_line, broken = self.line_start, 1 if self.errors else 0
+
+        if left is not None:
+            if last_line is None:
+                last_line = left.last_line
+            else:
+                last_line += left.total
+
+            count += left.count
+            total += left.total
+            newlines += left.total_newlines
+            broken += left.broken
+
+        if right is not None:
+            if right.last_line is not None:
+                last_line = total + right.last_line
+
+            count += right.count
+            total += right.total
+            newlines += right.total_newlines
+            broken += right.broken
+
+        self.count = count
+        self.total = total
+        self.total_newlines = newlines
+        self.last_line = last_line
+        self.broken = broken
+
+    def relead(self, gap):
+        """Replaces the gap before the declaration"""
+        self.text = gap + self.text[self.lead :]
+        self.lead = len(gap)
+        self.measure()
+
+        node = self.parent
+
+        while node is not None:
+            node.update()
+            node = node.parent
+
+    @property
+    def base(self):
+        base = self.lead + (self.left.total if self.left is not None else 0)
+        node = self
+
+        while node.parent is not None:
+            parent = node.parent
+
+            if node is parent.right:
+                base += len(parent.text)
+
+                if parent.left is not None:
+                    base += parent.left.total
+
+            node = parent
+
+        return base
+
+    def position(self, offset):
+        return self.document.position(self.base + offset)
+
+    def line(self, offset):
+        return self.position(offset)[0]
+
+
+def adopt(node):
+    """Points the children of `node` at it and makes it the root of its subtree"""
+    for child in (node.left, node.right):
+        if child is not None:
+            child.parent = node
+
+    node.parent = None
+    node.update()
+
+    return node
+
+
+def merge(left, right):
+    if left is None:
+        return right
+
+    if right is None:
+        return left
+
+    if left.priority > right.priority:
+        left.right = merge(left.right, right)
+        return adopt(left)
+
+    right.left = merge(left, right.left)
+    return adopt(right)
+
+
+def split(node, count):
+    """The first `count` units of a treap and the rest, as two treaps"""
+    if node is None:
+        return None, None
+
+    left = node.left.count if node.left is not None else 0
+
+    if count <= left:
+        first, node.left = split(node.left, count)
+        return first, adopt(node)
+
+    node.right, rest = split(node.right, count - left - 1)
+    return adopt(node), rest
+
+
+def treap(units):
+    """Treap of `units` in the order given, built in one pass"""
+    stack = []
+
+    for unit in units:
+        last = None
+
+        while stack and stack[-1].priority < unit.priority:
+            last = stack.pop()
+            last.update()
+
+        unit.left = last
+
+        if last is not None:
+            last.parent = unit
+
+        if stack:
+            stack[-1].right = unit
+            unit.parent = stack[-1]
+
+        stack.append(unit)
+
+    for unit in reversed(stack):
+        unit.update()
+
+    return stack[0] if stack else None
+
+
+def leftmost(node):
+    while node.left is not None:
+        node = node.left
+
+    return node
+
+
+def rightmost(node):
+    while node.right is not None:
+        node = node.right
+
+    return node
+
+
+def walk(node):
+    """Yields the units of a treap in order"""
+    stack = []
+
+    while stack or node is not None:
+        if node is not None:
+            stack.append(node)
+            node = node.left
+        else:
+            node = stack.pop()
+            yield node
+            node = node.right
+
+
+class Document:
+    """Front end which, after an edit, only rebuilds the declarations it touched
+
+    An edit costs the rebuilt declarations plus a walk down the treap of
+    units, however long the document is. The text of the whole document is
+    only joined up when `code` is asked for.
+
+    Errors of a unit are only those of its own region. While the document
+    is broken, `errors` checks it again from the first broken unit on, since
+    an error may take in the text after it, e.g. an unterminated string.
+    """
+
+    def __init__(self, code):
+        units, gap, _ = self.build(code, None)
+        self.root = treap(units)
+        self.trailer = Source(gap)
+        self.joined = code
+        self.reported = None
+
+    @property
+    def code(self):
+        if self.joined is None:
+            texts = [unit.text for unit in walk(self.root)]
+            texts.append(self.trailer.text)
+            self.joined = "".join(texts)
+
+        return self.joined
+
+    @property
+    def units(self):
+        return list(walk(self.root))
+
+    def __len__(self):
+        return (self.root.total if self.root is not None else 0) + len(self.trailer.text)
+
+    def edit(self, start, end, text):
+        first = self.count(lambda base, unit: base + unit.length < start)
+        last = self.count(lambda base, unit: base <= end)
+
+        # the declaration before the edit may now be followed by an `else`
+        lo = max(first - 1, 0)
+        before, rest = split(self.root, lo)
+        region, after = split(rest, last - lo)
+
+        while before is not None and rightmost(before).errors:
+            before, unit = split(before, before.count - 1)
+            region = merge(unit, region)
+
+        while after is not None and leftmost(after).errors:
+            unit, after = split(after, 1)
+            region = merge(region, unit)
+
+        offset = before.total if before is not None else 0
+        code = "".join(unit.text for unit in walk(region)) + self.gap(after)
+        code = code[: start - offset] + text + code[end - offset :]
+
+        for extension in range(MAX_EXTENSION + 1):
+            rebuilt, gap, clean = self.build(code, before)
+
+            if clean or after is None or extension == MAX_EXTENSION:
+                break
+
+            unit, after = split(after, 1)
+            code += unit.text[unit.lead :] + self.gap(after)
+
+        if after is None:
+            self.trailer = Source(gap)
+        else:
+            leftmost(after).relead(gap)
+
+        self.root = merge(merge(before, treap(rebuilt)), after)
+        self.joined = None
+        self.reported = None
+
+        return self
+
+    def gap(self, after):
+        """Text between the end of an edited region and the units `after` it"""
+        if after is None:
+            return self.trailer.text
+
+        unit = leftmost(after)
+        return unit.text[: unit.lead]
+
+    def count(self, test):
+        """Number of leading units for which `test(base, unit)` holds"""
+        node, offset, count = self.root, 0, 0
+
+        while node is not None:
+            left = node.left
+            start = offset + (left.total if left is not None else 0)
+
+            if test(start + node.lead, node):
+                count += (left.count if left is not None else 0) + 1
+                offset = start + len(node.text)
+                node = node.right
+            else:
+                node = left
+
+        return count
+
+    def broken(self):
+        """Number of units before the first one with errors"""
+        node, count = self.root, 0
+
+        while node is not None:
+            left = node.left
+
+            if left is not None and left.broken:
+                node = left
+                continue
+
+            count += left.count if left is not None else 0
+
+            if node.errors:
+                return count
+
+            count += 1
+            node = node.right
+
+        return None
+
+    def offset(self, index):
+        """Offset of the text of unit `index`, the gap before it included"""
+        node, offset = self.root, 0
+
+        while True:
+            left = node.left
+            count = left.count if left is not None else 0
+
+            if index < count:
+                node = left
+                continue
+
+            offset += left.total if left is not None else 0
+
+            if index == count:
+                return offset
+
+            offset += len(node.text)
+            index -= count + 1
+            node = node.right
+
+    def position(self, offset):
+        node, base, newlines, start = self.root, 0, 0, 0
+
+        while node is not None:
+            left = node.left
+
+            if left is not None:
+                if offset < base + left.total:
+                    node = left
+                    continue
+
+                newlines += left.total_newlines
+
+                if left.last_line is not None:
+                    start = base + left.last_line
+
+                base += left.total
+
+            if offset < base + len(node.text):
+                return place(node.source, offset - base, newlines, base - start)
+
+            newlines += node.newlines
+
+            if node.line_start is not None:
+                start = base + node.line_start
+
+            base += len(node.text)
+            node = node.right
+
+        return place(self.trailer, offset - base, newlines, base - start)
+
+    def line(self, offset):
+        return self.position(offset)[0]
+
+    def build(self, code, before):
+        """Units built from `code`, which follows the units `before`, the
+        text after the last of them and whether it was all clean"""
+        scanner = RegexScanner(code)
+        scanner.positions = Segment(before, scanner.positions)
+
+        try:
+            tokens = scanner.scan()
+        except CompileErrors as e:
+            return [Unit(self, code, 0, [], None, e.errors)], "", False
+
+        parser = Parser(tokens)
+        units, end = [], 0
+
+        while not parser.at_end():
+            begin, errors = parser.current, len(parser.errors)
+            node = parser.declaration()
+
+            unit = self.unit(
+                code, end, tokens[begin : parser.current], node, parser.errors[errors:]
+            )
+            units.append(unit)
+            end += len(unit.text)
+
+        if units:
+            # errors at the end of the region point at its EOF token
+            eof = tokens[-1]
+            eof.offset -= end - units[-1].length
+            eof.source = units[-1]
+
+        return units, code[end:], not parser.errors
+
+    def unit(self, code, start, tokens, node, errors):
+        first, last = tokens[0].offset, tokens[-1].offset + len(tokens[-1].lexeme)
+        unit = Unit(self, code[start:last], first - start, tokens, node, errors)
+
+        for token in tokens:
+            token.offset -= first
+            token.source = unit
+
+        if node is not None and not errors:
+            try:
+                unit.bindings = Resolver(node).run()
+            except CompileErrors as e:
+                unit.errors = e.errors
+                unit.update()
+
+        return unit
+
+    def tokens(self):
+        tokens = [token for unit in walk(self.root) for token in unit.tokens]
+        tokens.append(Token(Type.EOF, "", None, None, len(self), self))
+        return tokens
+
+    def ast(self):
+        return ast.Program([unit.node for unit in walk(self.root)])
+
+    def bindings(self):
+        bindings = {}
+
+        for unit in walk(self.root):
+            bindings.update(unit.bindings)
+
+        return bindings
+
+    def errors(self):
+        if self.root is None or not self.root.broken:
+            return []
+
+        if self.reported is None:
+            # the first broken unit may start with the `else` of an `if`
+            self.reported = self.check(max(self.broken() - 1, 0))
+
+        return self.reported
+
+    def check(self, index):
+        """Errors of the whole document, which is clean before unit `index`"""
+        start = self.offset(index)
+        scanner = RegexScanner(self.code[start:])
+        scanner.positions = Tail(self, start)
+
+        try:
+            program = Parser(scanner.scan()).parse()
+            Resolver(program).run()
+        except CompileErrors as e:
+            return e.errors
+
+        return []
+
+    def run(self):
+        errors = self.errors()
+
+        if errors:
+            raise CompileErrors(errors)
+
+        return self.ast(), self.bindings()
@@ -1,9 +1,17 @@
+import operator
 from lib import ast
 from lib.token import Type, identifier
 from lib.stringify import stringify
 from lib.error import RuntimeError, TypeError
-from lib.resolver import Resolver
-from lib.environment import Environment
+from lib.resolver import Resolver, UPVALUE
+from lib.environment import (
+    GlobalTable,
+    Frame,
+    Cell,
+    EMPTY,
+    take_frame,
+    release_frame,
+)
 from lib.scanner import Scanner
 from lib.parser import Parser
 from lib.io import RealPrinter, FakePrinter
@@ -25,112 +33,182 @@ class Interpreter:
     printer = RealPrinter
 
     def __init__(self):
-        self.bindings = {}
         self.globals = global_environment()
         self.env = self.globals
         self.printer = Interpreter.printer()
 
-    def interpret(self, ast, bindings):
-        self.bindings = {**self.bindings, **bindings}
+    def interpret(self, ast, bindings=None):
+        """Runs `ast`, whose nodes the resolver has annotated with their depths
+
+        `bindings` only needs passing for nodes which were resolved into a
+        dictionary of their own rather than annotated.
+        """
+        for node, depth in (bindings or {}).items():
+            node.depth = depth
 
         self.execute(ast)
 
         return self
 
+    def force(self, lazy):
+        # resolving or decoding the block annotates its nodes
+        if lazy.block is None:
+            lazy.block, lazy.bindings = lazy.load()
+
+        return lazy.block
+
     def lookup_variable(self, node, name):
-        if node in self.bindings:
-            return self.env.get_at(self.bindings[node], name)
+        try:
+            depth = node.depth
+        except AttributeError:
+            # nodes no resolver has seen are looked up as globals
+            depth = None
+
+        if depth is None:
+            return self.globals.get_cached(node, name)
+
+        if depth == UPVALUE:
+            return self.env.upvalues[node.slot].get(name)
+
+        return self.env.get_at(depth, node.slot, name)
+
+    def define(self, node, name, value=EMPTY):
+        slot = slot_of(node)
+
+        if slot is None:
+            self.env.define(name, value)
         else:
-            return self.globals.get(name)
+            self.env.values[slot] = value
 
-    def execute(self, node):
-        if isinstance(node, ast.Program):
-            for statement in node.statements:
-                self.execute(statement)
+    def cell(self, node):
+        """Puts a cell in the slot of a local closures capture, before they can capture it"""
+        slot = slot_of(node)
+
+        if slot is None or not node.cell:
             return None
 
-        if isinstance(node, ast.ClassDeclaration):
-            self.env.define(node.name, None)
+        cell = self.env.values[slot] = Cell(EMPTY)
 
-            superclass = None
-            if node.super:
-                superclass = self.evaluate(node.super)
+        return cell
 
-                if not isinstance(superclass, Klass):
-                    raise RuntimeError(node.super, "Superclass must be a class")
+    def capture(self, node):
+        """The cells a closure of the function `node` keeps, as the resolver listed them"""
+        env, cells = self.env, []
 
-                self.env = self.env.child()
-                self.env.define(identifier("super"), superclass)
+        for upvalue in node.upvalues:
+            if upvalue is None:
+                # the instance, once a method is bound to one
+                cells.append(None)
+            elif upvalue[0] == UPVALUE:
+                cells.append(env.upvalues[upvalue[1]])
+            else:
+                cells.append(env.cell_at(*upvalue))
 
-            methods = {}
-            for method in node.methods:
-                methods[method.name.lexeme] = Function(
-                    method, self.env, method.name.lexeme == "init"
-                )
+        return cells
 
-            klass = Klass(node.name.lexeme, superclass, methods)
+    def execute(self, node):
+        return EXECUTE[node.__class__](self, node)
 
-            if node.super:
-                self.env = self.env.parent
+    def execute_program(self, node):
+        for statement in node.statements:
+            EXECUTE[statement.__class__](self, statement)
 
-            self.env.assign(node.name, klass)
+    def execute_class_declaration(self, node):
+        cell = self.cell(node)
 
-            return None
+        if cell is None:
+            self.define(node, node.name, None)
 
-        if isinstance(node, ast.ExpressionStatement):
-            self.evaluate(node.expression)
-            return None
+        superclass = None
+        if node.super:
+            superclass = EVALUATE[node.super.__class__](self, node.super)
 
-        if isinstance(node, ast.PrintStatement):
-            self.printer.print(*[stringify(self.evaluate(e)) for e in node.expressions])
-            return None
+            if not isinstance(superclass, Klass):
+                raise RuntimeError(node.super, "Superclass must be a class")
 
-        if isinstance(node, ast.VariableDeclaration):
-            if node.initializer != None:
-                self.env.define(node.identifier, self.evaluate(node.initializer))
-            else:
-                self.env.define(node.identifier)
+            # the scope of `super`, which every method captures
+            self.env = Frame(self.env, [Cell(superclass)], self.env.upvalues)
 
-            return None
+        methods = {}
+        for method in node.methods:
+            methods[method.name.lexeme] = Function(
+                method, self.capture(method), method.name.lexeme == "init"
+            )
 
-        if isinstance(node, ast.Block):
-            self.execute_block(node, self.env.child())
-            return None
+        klass = Klass(node.name.lexeme, superclass, methods)
 
-        if isinstance(node, ast.IfStatement):
-            test = self.evaluate(node.test)
-            Assert.operand_type(test, [bool], None)
+        if node.super:
+            self.env = self.env.parent
 
-            if test:
-                self.execute(node.then)
-            else:
-                if node.neht is not None:
-                    self.execute(node.neht)
+        slot = slot_of(node)
 
-            return None
+        if cell is not None:
+            cell.value = klass
+        elif slot is None:
+            self.env.assign(node.name, klass)
+        else:
+            self.env.values[slot] = klass
 
-        if isinstance(node, ast.WhileStatement):
-            test = self.evaluate(node.test)
-            Assert.operand_type(test, [bool], node.token)
-            while test:
-                self.execute(node.body)
-                test = self.evaluate(node.test)
+    def execute_expression_statement(self, node):
+        EVALUATE[node.expression.__class__](self, node.expression)
 
-            return None
+    def execute_print_statement(self, node):
+        values = [EVALUATE[e.__class__](self, e) for e in node.expressions]
+        self.printer.print(*map(stringify, values))
 
-        if isinstance(node, ast.FunctionDeclaration):
-            fun = Function(node, self.env, False)
+    def execute_variable_declaration(self, node):
+        cell = self.cell(node)
+        value = EMPTY
 
-            self.env.define(fun.identifier(), fun)
+        if node.initializer != None:
+            value = EVALUATE[node.initializer.__class__](self, node.initializer)
 
-            return None
+        if cell is None:
+            self.define(node, node.identifier, value)
+        else:
+            cell.value = value
+
+    def execute_block_statement(self, node):
+        if not node.size:
+            for statement in node.statements:
+                EXECUTE[statement.__class__](self, statement)
+        else:
+            frame = take_frame(node, self.env, self.env.upvalues)
 
-        if isinstance(node, ast.ReturnStatement):
-            raise Return(self.evaluate(node.expression))
+            try:
+                self.execute_block(node, frame)
+            finally:
+                release_frame(node, frame)
 
-        raise ValueError(
-            "[interpreter] Unsupported node type [%s]" % node.__class__.__name__
-        )
+    def execute_if_statement(self, node):
+        test = EVALUATE[node.test.__class__](self, node.test)
+        Assert.operand_type(test, [bool], None)
+
+        if test:
+            EXECUTE[node.then.__class__](self, node.then)
+        else:
+            if node.neht is not None:
+                EXECUTE[node.neht.__class__](self, node.neht)
+
+    def execute_while_statement(self, node):
+        test = EVALUATE[node.test.__class__](self, node.test)
+        Assert.operand_type(test, [bool], node.token)
+        while test:
+            EXECUTE[node.body.__class__](self, node.body)
+            test = EVALUATE[node.test.__class__](self, node.test)
+
+    def execute_function_declaration(self, node):
+        # a recursive function captures the cell it is kept in
+        cell = self.cell(node)
+        fun = Function(node, self.capture(node), False)
+
+        if cell is None:
+            self.define(node, fun.identifier(), fun)
+        else:
+            cell.value = fun
+
+    def execute_return_statement(self, node):
+        raise Return(EVALUATE[node.expression.__class__](self, node.expression))
 
     def execute_block(self, block, env):
         previous_env = self.env
@@ -139,186 +217,171 @@ class Interpreter:
             self.env = env
 
             for statement in block.statements:
-                self.execute(statement)
+                EXECUTE[statement.__class__](self, statement)
         finally:
             self.env = previous_env
 
     def evaluate(self, expr):
-        if isinstance(expr, ast.LiteralExpression):
-            return expr.value
-
-        if isinstance(expr, ast.FunctionExpression):
-            return AnonymousFunction(expr, self.env, isInitializer=False)
-
-        if isinstance(expr, ast.LambdaExpression):
-            return self.evaluate(
-                ast.FunctionExpression(
-                    expr.parameters,
-                    ast.Block([ast.ReturnStatement(expr.expression, expr.arrow)]),
-                )
+        return EVALUATE[expr.__class__](self, expr)
+
+    def evaluate_literal(self, expr):
+        return expr.value
+
+    def evaluate_function(self, expr):
+        return AnonymousFunction(expr, self.capture(expr), isInitializer=False)
+
+    def evaluate_lambda(self, expr):
+        body = ast.Block([ast.ReturnStatement(expr.expression, expr.arrow)])
+        body.size, body.cells = expr.size, expr.cells
+        declaration = ast.FunctionExpression(expr.parameters, body)
+
+        return AnonymousFunction(declaration, self.capture(expr), isInitializer=False)
+
+    def evaluate_grouping(self, expr):
+        return EVALUATE[expr.expression.__class__](self, expr.expression)
+
+    def evaluate_unary(self, expr):
+        operator, right = expr.operator, expr.right
+        value = EVALUATE[right.__class__](self, right)
+
+        if expr.operator.type == Type.MINUS:
+            Assert.operand_type(value, [int, float], operator)
+            return -value
+        elif expr.operator.type == Type.BANG:
+            Assert.operand_type(value, [bool], operator)
+            return not value
+        else:
+            raise ValueError(
+                "[interpreter] Unsupported operator [%s] in unary expression"
+                % expr.operator.lexeme
             )
 
-        if isinstance(expr, ast.GroupingExpression):
-            return self.evaluate(expr.expression)
+    def evaluate_binary(self, expr):
+        left, right = expr.left, expr.right
+        left = EVALUATE[left.__class__](self, left)
+        right = EVALUATE[right.__class__](self, right)
 
-        if isinstance(expr, ast.UnaryExpression):
-            operator, value = expr.operator, self.evaluate(expr.right)
+        try:
+            apply, types = BINARY[expr.operator.type]
+        except KeyError:
+            raise ValueError(
+                "[interpreter] Operator [%s] not supported in binary expressions"
+                % expr.operator.lexeme
+            )
 
-            if expr.operator.type == Type.MINUS:
-                Assert.operand_type(value, [int, float], operator)
-                return -value
-            elif expr.operator.type == Type.BANG:
-                Assert.operand_type(value, [bool], operator)
-                return not value
-            else:
-                raise ValueError(
-                    "[interpreter] Unsupported operator [%s] in unary expression"
-                    % expr.operator.lexeme
-                )
-
-        if isinstance(expr, ast.BinaryExpression):
-            left, right = self.evaluate(expr.left), self.evaluate(expr.right)
-
-            if expr.operator.type == Type.PLUS:
-                Assert.operand_types(left, right, [int, float, str], expr.operator)
-                return left + right
-            elif expr.operator.type == Type.MINUS:
-                Assert.operand_types(left, right, [int, float, str], expr.operator)
-                if isinstance(left, str) and isinstance(right, str):
-                    return left.replace(right, "")
-
-                return left - right
-            elif expr.operator.type == Type.STAR:
-                Assert.operand_types(left, right, [int, float], expr.operator)
-                return left * right
-            elif expr.operator.type == Type.SLASH:
-                Assert.operand_types(left, right, [int, float], expr.operator)
-                return left / right
-            elif expr.operator.type == Type.GREATER:
-                Assert.operand_types(left, right, [int, float], expr.operator)
-                return left > right
-            elif expr.operator.type == Type.LESS:
-                Assert.operand_types(left, right, [int, float], expr.operator)
-                return left < right
-            elif expr.operator.type == Type.GREATER_EQUAL:
-                Assert.operand_types(left, right, [int, float], expr.operator)
-                return left >= right
-            elif expr.operator.type == Type.LESS_EQUAL:
-                Assert.operand_types(left, right, [int, float], expr.operator)
-                return left <= right
-            elif expr.operator.type == Type.EQUAL_EQUAL:
-                return left == right
-            elif expr.operator.type == Type.BANG_EQUAL:
-                return left != right
-            else:
-                raise ValueError(
-                    "[interpreter] Operator [%s] not supported in binary expressions"
-                    % expr.operator.lexeme
-                )
+        if types is not None:
+            Assert.operand_types(left, right, types, expr.operator)
 
-        if isinstance(expr, ast.TernaryExpression):
-            test = self.evaluate(expr.test)
-            Assert.operand_type(test, [bool], expr.operator)
+        return apply(left, right)
 
-            if test:
-                return self.evaluate(expr.then)
-            else:
-                return self.evaluate(expr.neht)
+    def evaluate_ternary(self, expr):
+        test = EVALUATE[expr.test.__class__](self, expr.test)
+        Assert.operand_type(test, [bool], expr.operator)
+
+        if test:
+            return EVALUATE[expr.then.__class__](self, expr.then)
+        else:
+            return EVALUATE[expr.neht.__class__](self, expr.neht)
 
-        if isinstance(expr, ast.VariableExpression):
-            return self.lookup_variable(expr, expr.variable)
+    def evaluate_variable(self, expr):
+        return self.lookup_variable(expr, expr.variable)
 
-        if isinstance(expr, ast.AssignmentExpression):
-            value = self.evaluate(expr.right)
-            self.env.assign(expr.left, value)
-            return value
+    def evaluate_assignment(self, expr):
+        value = EVALUATE[expr.right.__class__](self, expr.right)
 
-        if isinstance(expr, ast.LogicalExpression):
-            if expr.token.type == Type.OR:
-                left = self.evaluate(expr.left)
-                Assert.operand_type(left, [bool], expr.token)
+        try:
+            depth = expr.depth
+        except AttributeError:
+            depth = None
+
+        if depth is None:
+            self.globals.assign_cached(expr, expr.left, value)
+        elif depth == UPVALUE:
+            self.env.upvalues[expr.slot].value = value
+        else:
+            self.env.assign_at(depth, expr.slot, value)
 
-                if left:
-                    return True
+        return value
 
-                right = self.evaluate(expr.right)
-                Assert.operand_type(right, [bool], expr.token)
-                return right
+    def evaluate_logical(self, expr):
+        if expr.token.type == Type.OR:
+            left = EVALUATE[expr.left.__class__](self, expr.left)
+            Assert.operand_type(left, [bool], expr.token)
 
-            if expr.token.type == Type.AND:
-                left = self.evaluate(expr.left)
-                Assert.operand_type(left, [bool], expr.token)
-                if not left:
-                    return False
+            if left:
+                return True
 
-                right = self.evaluate(expr.right)
-                Assert.operand_type(right, [bool], expr.token)
-                return right
+            right = EVALUATE[expr.right.__class__](self, expr.right)
+            Assert.operand_type(right, [bool], expr.token)
+            return right
 
-            raise ValueError("unsupported logical operator (%s)" % expr.token.lexeme)
+        if expr.token.type == Type.AND:
+            left = EVALUATE[expr.left.__class__](self, expr.left)
+            Assert.operand_type(left, [bool], expr.token)
+            if not left:
+                return False
 
-        if isinstance(expr, ast.CallExpression):
-            callee = self.evaluate(expr.callee)
+            right = EVALUATE[expr.right.__class__](self, expr.right)
+            Assert.operand_type(right, [bool], expr.token)
+            return right
 
-            if not isinstance(callee, Callable):
-                raise RuntimeError(expr.token, "Can only call functions or classes")
+        raise ValueError("unsupported logical operator (%s)" % expr.token.lexeme)
 
-            arguments = list(map(self.evaluate, expr.arguments))
+    def evaluate_call(self, expr):
+        callee = EVALUATE[expr.callee.__class__](self, expr.callee)
 
-            if len(arguments) != callee.arity():
-                raise RuntimeError(
-                    expr.token,
-                    "Expected %s arguments but got %s"
-                    % (callee.arity(), len(arguments)),
-                )
+        if not isinstance(callee, Callable):
+            raise RuntimeError(expr.token, "Can only call functions or classes")
 
-            return callee.call(self, arguments)
+        arguments = [EVALUATE[arg.__class__](self, arg) for arg in expr.arguments]
 
-        if isinstance(expr, ast.GetExpression):
-            object = self.evaluate(expr.object)
+        if len(arguments) != callee.arity():
+            raise RuntimeError(
+                expr.token,
+                "Expected %s arguments but got %s" % (callee.arity(), len(arguments)),
+            )
 
-            if not isinstance(object, Instance):
-                raise RuntimeError(expr.name, "Only instances have properties")
+        return callee.call(self, arguments)
 
-            return object.get(expr.name)
+    def evaluate_get(self, expr):
+        object = EVALUATE[expr.object.__class__](self, expr.object)
 
-        if isinstance(expr, ast.SetExpression):
-            object = self.evaluate(expr.object)
+        if not isinstance(object, Instance):
+            raise RuntimeError(expr.name, "Only instances have properties")
 
-            if not isinstance(object, Instance):
-                raise RuntimeError(expr.name, "Only instances have properties")
+        return object.get(expr.name)
 
-            value = self.evaluate(expr.value)
+    def evaluate_set(self, expr):
+        object = EVALUATE[expr.object.__class__](self, expr.object)
 
-            return object.set(expr.name, value)
+        if not isinstance(object, Instance):
+            raise RuntimeError(expr.name, "Only instances have properties")
 
-        if isinstance(expr, ast.SuperExpression):
-            distance = self.bindings[expr]
-            superclass = self.env.get_at(distance, identifier("super"))
-            object = self.env.get_at(distance - 1, identifier("this"))
+        value = EVALUATE[expr.value.__class__](self, expr.value)
 
-            method = superclass.find_method(expr.method.lexeme)
+        return object.set(expr.name, value)
 
-            if method == None:
-                raise RuntimeError(
-                    expr.method, "Undefined method '%s'" % expr.method.lexeme
-                )
+    def evaluate_super(self, expr):
+        upvalues = self.env.upvalues
+        superclass = upvalues[expr.slot].value
+        object = upvalues[expr.receiver].value
 
-            return method.bind(object)
+        method = superclass.find_method(expr.method.lexeme)
 
-        if isinstance(expr, ast.ThisExpression):
-            return self.lookup_variable(expr, expr.token)
+        if method == None:
+            raise RuntimeError(expr.method, "Undefined method '%s'" % expr.method.lexeme)
 
-        raise ValueError(
-            "[interpreter] Unsupported expression type [%s]" % expr.__class__.__name__
-        )
+        return method.bind(object)
 
-    @staticmethod
-    def from_code(code):
+    def evaluate_this(self, expr):
+        return self.lookup_variable(expr, expr.token)
+
+    @classmethod
+    def from_code(cls, code):
         tokens = Scanner(code).scan()
         ast = Parser(tokens).parse()
-        bindings = Resolver(ast).run()
-        return Interpreter().interpret(ast, bindings)
+        Resolver(ast).run()
+        return cls().interpret(ast)
 
     @staticmethod
     def evaluate_expr(code):
@@ -343,10 +406,82 @@ class Assert:
             raise TypeError.operand_mismatch(token, value1, value2)
 
 
+# statements and expressions, each with the method of the interpreter which
+# runs it. Looking the class of a node up costs the same for every class,
+# where a chain of isinstance checks got slower the further down a class was
+EXECUTE = ast.Table(
+    {
+        ast.Program: Interpreter.execute_program,
+        ast.ClassDeclaration: Interpreter.execute_class_declaration,
+        ast.ExpressionStatement: Interpreter.execute_expression_statement,
+        ast.PrintStatement: Interpreter.execute_print_statement,
+        ast.VariableDeclaration: Interpreter.execute_variable_declaration,
+        ast.Block: Interpreter.execute_block_statement,
+        ast.IfStatement: Interpreter.execute_if_statement,
+        ast.WhileStatement: Interpreter.execute_while_statement,
+        ast.FunctionDeclaration: Interpreter.execute_function_declaration,
+        ast.ReturnStatement: Interpreter.execute_return_statement,
+    },
+    "[interpreter] Unsupported node type [%s]",
+)
+
+EVALUATE = ast.Table(
+    {
+        ast.LiteralExpression: Interpreter.evaluate_literal,
+        ast.FunctionExpression: Interpreter.evaluate_function,
+        ast.LambdaExpression: Interpreter.evaluate_lambda,
+        ast.GroupingExpression: Interpreter.evaluate_grouping,
+        ast.UnaryExpression: Interpreter.evaluate_unary,
+        ast.BinaryExpression: Interpreter.evaluate_binary,
+        ast.TernaryExpression: Interpreter.evaluate_ternary,
+        ast.VariableExpression: Interpreter.evaluate_variable,
+        ast.AssignmentExpression: Interpreter.evaluate_assignment,
+        ast.LogicalExpression: Interpreter.evaluate_logical,
+        ast.CallExpression: Interpreter.evaluate_call,
+        ast.GetExpression: Interpreter.evaluate_get,
+        ast.SetExpression: Interpreter.evaluate_set,
+        ast.SuperExpression: Interpreter.evaluate_super,
+        ast.ThisExpression: Interpreter.evaluate_this,
+    },
+    "[interpreter] Unsupported expression type [%s]",
+)
+
+
+def subtract(left, right):
+    if isinstance(left, str) and isinstance(right, str):
+        return left.replace(right, "")
+
+    return left - right
+
+
+# operators of binary expressions, with the function applying each of them
+# and the types both of its operands must be of, or None for any
+BINARY = {
+    Type.PLUS: (operator.add, [int, float, str]),
+    Type.MINUS: (subtract, [int, float, str]),
+    Type.STAR: (operator.mul, [int, float]),
+    Type.SLASH: (operator.truediv, [int, float]),
+    Type.GREATER: (operator.gt, [int, float]),
+    Type.LESS: (operator.lt, [int, float]),
+    Type.GREATER_EQUAL: (operator.ge, [int, float]),
+    Type.LESS_EQUAL: (operator.le, [int, float]),
+    Type.EQUAL_EQUAL: (operator.eq, None),
+    Type.BANG_EQUAL: (operator.ne, None),
+}
+
+
 def global_environment():
-    env = Environment()
+    env = GlobalTable()
 
     env.define(identifier("clock"), ClockFunction())
     env.define(identifier("sleep"), SleepFunction())
 
     return env
+
+
+def slot_of(node):
+    # declarations no resolver has seen are globals
+    try:
+        return node.slot
+    except AttributeError:
+        return None
@@ -10,8 +10,8 @@ class FakePrinter:
     def __init__(self):
         self.buffer = []
 
-    def print(self, value):
-        self.buffer.append(value)
+    def print(self, *values):
+        self.buffer.append(" ".join(values))
 
     def get(self):
         return self.buffer
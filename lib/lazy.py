@@ -0,0 +1,411 @@
+from lib import ast
+from lib.token import Token, Type
+from lib.parser import Parser
+from lib.resolver import Resolver
+from lib.error import ParseError, CompileErrors
+
+# tokens which make an operand on their own
+LITERALS = {Type.NUMBER, Type.STRING, Type.TRUE, Type.FALSE, Type.NIL}
+
+BINARY = {
+    Type.OR,
+    Type.AND,
+    Type.BANG_EQUAL,
+    Type.EQUAL_EQUAL,
+    Type.GREATER,
+    Type.GREATER_EQUAL,
+    Type.LESS,
+    Type.LESS_EQUAL,
+    Type.PLUS,
+    Type.MINUS,
+    Type.STAR,
+    Type.SLASH,
+}
+
+# what the frames of an expression are closed by: a grouping by `)`, the
+# arguments of a call by `,` or `)` and the middle of a ternary by `:`
+GROUP, CALL, THEN = range(3)
+
+
+class LazyParser(Parser):
+    """Parser which only checks function bodies, leaving them to be parsed on first call
+
+    A body is run through a Recognizer, which goes over its tokens without
+    building nodes. Bodies it turns down are parsed right away, so syntax
+    errors are reported at load time and exactly as the eager parser does.
+    """
+
+    def __init__(self, tokens):
+        # bodies are parsed long after a stream would have let go of their tokens
+        if not hasattr(tokens, "__len__"):
+            tokens = list(tokens)
+
+        super().__init__(tokens)
+        types = getattr(tokens, "types", None)
+        self.types = types if types is not None else [token.type for token in tokens]
+
+    def function_body(self):
+        start = self.current
+        recognizer = Recognizer(self.tokens, self.types, start)
+
+        try:
+            recognizer.block()
+        except Rejected:
+            return self.block()
+
+        self.current = recognizer.current
+
+        return TokenBlock(
+            self.tokens, start, self.current - 1, recognizer.names, recognizer.risks
+        )
+
+
+class Rejected(Exception):
+    pass
+
+
+class Recognizer:
+    """Goes over the tokens of a block the way the parser would, without building nodes
+
+    It may turn down blocks the parser accepts, which are then just parsed,
+    but never accepts one the parser would not. On the way it collects what
+    the resolver could reject the block for, depending on where it is: the
+    names the block declares and the tokens which only some places allow.
+    """
+
+    def __init__(self, tokens, types, start):
+        self.tokens = tokens
+        self.types = types
+        self.current = start
+        self.names = set()
+        # THIS, SUPER and RETURN when the block uses them, VAR when it
+        # declares a name twice or reads a variable in its own initializer,
+        # and CLASS when it declares a class, which brings a context of its own
+        self.risks = set()
+
+    def expect(self, type):
+        if self.types[self.current] != type:
+            raise Rejected()
+
+        self.current += 1
+
+    def match(self, type):
+        if self.types[self.current] == type:
+            self.current += 1
+            return True
+
+        return False
+
+    def name(self):
+        if self.types[self.current] != Type.IDENTIFIER:
+            raise Rejected()
+
+        name = self.tokens[self.current].lexeme
+        self.current += 1
+
+        if name in self.names:
+            self.risks.add(Type.VAR)
+
+        self.names.add(name)
+
+        return name
+
+    def block(self):
+        # past the opening brace, up to and including the closing one
+        types = self.types
+
+        while types[self.current] != Type.RIGHT_BRACE:
+            if types[self.current] == Type.EOF:
+                raise Rejected()
+
+            self.declaration()
+
+        self.current += 1
+
+    def declaration(self):
+        type = self.types[self.current]
+
+        if type == Type.CLASS:
+            self.current += 1
+            self.risks.add(Type.CLASS)
+            self.name()
+
+            if self.match(Type.LESS):
+                self.expect(Type.IDENTIFIER)
+
+            self.expect(Type.LEFT_BRACE)
+
+            while not self.match(Type.RIGHT_BRACE):
+                self.function()
+        elif type == Type.VAR:
+            self.current += 1
+            self.variable()
+        elif type == Type.FUN:
+            self.current += 1
+            self.function()
+        else:
+            self.statement()
+
+    def variable(self):
+        name = self.name()
+
+        if self.match(Type.EQUAL):
+            self.expression(name)
+
+        self.expect(Type.SEMICOLON)
+
+    def function(self, named=True):
+        if named and self.types[self.current] != Type.LEFT_PAREN:
+            self.name()
+
+        self.expect(Type.LEFT_PAREN)
+        self.parameters(Type.RIGHT_PAREN)
+        self.expect(Type.LEFT_BRACE)
+        self.block()
+
+    def parameters(self, end):
+        if self.types[self.current] != end:
+            count = 1
+            self.name()
+
+            while self.match(Type.COMMA):
+                if count >= 255:
+                    raise Rejected()
+
+                count += 1
+                self.name()
+
+        self.expect(end)
+
+    def statement(self):
+        types, type = self.types, self.types[self.current]
+        self.current += 1
+
+        if type == Type.IF or type == Type.WHILE:
+            self.expect(Type.LEFT_PAREN)
+            self.expression()
+            self.expect(Type.RIGHT_PAREN)
+            self.statement()
+
+            if type == Type.IF and self.match(Type.ELSE):
+                self.statement()
+        elif type == Type.FOR:
+            self.expect(Type.LEFT_PAREN)
+
+            if self.match(Type.VAR):
+                self.variable()
+            elif not self.match(Type.SEMICOLON):
+                self.expression()
+                self.expect(Type.SEMICOLON)
+
+            if types[self.current] != Type.SEMICOLON:
+                self.expression()
+
+            self.expect(Type.SEMICOLON)
+
+            if types[self.current] != Type.RIGHT_PAREN:
+                self.expression()
+
+            self.expect(Type.RIGHT_PAREN)
+            # the parser takes the statements of the body, which only a block has
+            self.expect(Type.LEFT_BRACE)
+            self.block()
+        elif type == Type.PRINT:
+            self.expression()
+
+            while self.match(Type.COMMA):
+                self.expression()
+
+            self.expect(Type.SEMICOLON)
+        elif type == Type.LEFT_BRACE:
+            self.block()
+        elif type == Type.RETURN:
+            self.risks.add(Type.RETURN)
+
+            if types[self.current] != Type.SEMICOLON:
+                self.expression()
+
+            self.expect(Type.SEMICOLON)
+        else:
+            self.current -= 1
+            self.expression()
+            self.expect(Type.SEMICOLON)
+
+    def expression(self, name=None):
+        """Goes over an expression, `name` being the variable it initializes
+
+        Rather than a method for each level of precedence, which is what
+        parsing costs most, it takes operands and what follows them in a
+        loop, keeping groupings, calls and ternaries on a stack of frames.
+        """
+        types, tokens, frames = self.types, self.tokens, []
+        # whether a whole expression starts here, which `fun` and `\` may
+        # begin, and whether everything since is a single operand
+        start, single = True, True
+
+        while True:
+            type = types[self.current]
+            ended = prefixed = False
+
+            if start and type == Type.FUN:
+                self.current += 1
+                self.function(named=False)
+                # nothing may follow a function expression
+                ended = True
+            elif start and type == Type.BACKSLASH:
+                self.current += 1
+                self.parameters(Type.ARROW)
+                continue
+            else:
+                while type == Type.BANG or type == Type.MINUS:
+                    self.current += 1
+                    prefixed = True
+                    type = types[self.current]
+
+                self.current += 1
+
+                if type == Type.IDENTIFIER:
+                    if name is not None and tokens[self.current - 1].lexeme == name:
+                        self.risks.add(Type.VAR)
+                elif type == Type.THIS:
+                    self.risks.add(Type.THIS)
+                elif type == Type.SUPER:
+                    self.risks.add(Type.SUPER)
+                    self.expect(Type.DOT)
+                    self.expect(Type.IDENTIFIER)
+                elif type == Type.LEFT_PAREN:
+                    frames.append((GROUP, single, prefixed, 0))
+                    start, single = True, True
+                    continue
+                elif type not in LITERALS:
+                    raise Rejected()
+
+            # only a variable or a property may be assigned to
+            target = type == Type.IDENTIFIER and not prefixed
+
+            while True:
+                type = types[self.current]
+                frame = frames[-1][0] if frames else None
+
+                if ended:
+                    pass
+                elif type == Type.LEFT_PAREN:
+                    self.current += 1
+                    target = False
+
+                    if self.match(Type.RIGHT_PAREN):
+                        continue
+
+                    frames.append((CALL, single, prefixed, 1))
+                    start, single = True, True
+                    break
+                elif type == Type.DOT:
+                    self.current += 1
+                    self.expect(Type.IDENTIFIER)
+                    target = not prefixed
+                    continue
+                elif type in BINARY:
+                    self.current += 1
+                    start, single = False, False
+                    break
+                elif type == Type.QUESTION_MARK and frame != THEN:
+                    self.current += 1
+                    frames.append((THEN, False, False, 0))
+                    start, single = False, False
+                    break
+                elif type == Type.EQUAL:
+                    if not (single and target):
+                        raise Rejected()
+
+                    self.current += 1
+                    start, single = True, True
+                    break
+
+                if (frame == GROUP or frame == CALL) and type == Type.RIGHT_PAREN:
+                    self.current += 1
+                    _, single, prefixed, _ = frames.pop()
+                    ended = target = False
+                elif frame == CALL and type == Type.COMMA:
+                    _, outer, outer_prefixed, count = frames.pop()
+
+                    if count >= 255:
+                        raise Rejected()
+
+                    self.current += 1
+                    frames.append((CALL, outer, outer_prefixed, count + 1))
+                    start, single = True, True
+                    break
+                elif frame == THEN and type == Type.COLON:
+                    self.current += 1
+                    frames.pop()
+                    start, single = False, False
+                    break
+                elif frames:
+                    raise Rejected()
+                else:
+                    return
+
+
+class TokenBlock(ast.LazyBlock):
+    """Function body kept as tokens[start:end + 1] until it is first called"""
+
+    def __init__(self, tokens, start, end, names, risks):
+        self.tokens = tokens
+        self.start = start
+        self.end = end
+        self.names = names
+        self.risks = risks
+        self.context = None
+        self.parsed = None
+
+    def deferrable(self, parameters, initializer, in_class, in_subclass):
+        risks = self.risks
+
+        if Type.VAR in risks or Type.CLASS in risks:
+            return False
+
+        if Type.RETURN in risks and initializer:
+            return False
+
+        if Type.THIS in risks and not in_class or Type.SUPER in risks and not in_subclass:
+            return False
+
+        return not any(parameter.lexeme in self.names for parameter in parameters)
+
+    def load(self):
+        return force(self)
+
+    def parse(self):
+        # parsed before it is resolved, when the body is digested
+        if self.block is not None:
+            return self.block
+
+        if self.parsed is None:
+            self.parsed = parse(self)
+
+        return self.parsed
+
+
+def parse(lazy):
+    tokens = lazy.tokens[lazy.start : lazy.end + 1]
+    brace = tokens[-1]
+    tokens.append(Token(Type.EOF, "", None, None, brace.offset + 1, brace.source))
+
+    parser = LazyParser(tokens)
+
+    try:
+        block = parser.block()
+    except ParseError:
+        pass
+
+    if parser.errors:
+        raise CompileErrors(parser.errors)
+
+    return block
+
+
+def force(lazy):
+    """Parses and resolves a lazy function body, returning the block and its bindings"""
+    block = lazy.parse()
+
+    return block, Resolver(block).resume(lazy.context)
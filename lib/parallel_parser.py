@@ -0,0 +1,150 @@
+import gc
+import os
+from lib import ast
+from lib.token import Token, Type
+from lib.parser import Parser
+
+# tokens which cannot continue an expression ended by `}`, so a `}` closing
+# a top-level declaration is only a boundary when one of them follows it
+STARTS = {
+    Type.CLASS,
+    Type.FUN,
+    Type.VAR,
+    Type.FOR,
+    Type.IF,
+    Type.WHILE,
+    Type.PRINT,
+    Type.RETURN,
+    Type.LEFT_BRACE,
+    Type.IDENTIFIER,
+    Type.THIS,
+    Type.SUPER,
+    Type.NUMBER,
+    Type.STRING,
+    Type.TRUE,
+    Type.FALSE,
+    Type.NIL,
+    Type.BACKSLASH,
+}
+
+OPENING = {Type.LEFT_BRACE, Type.LEFT_PAREN}
+CLOSING = {Type.RIGHT_BRACE, Type.RIGHT_PAREN}
+
+
+# tokens of the program being parsed, shared with every worker once
+shared = None
+
+
+def share(tokens):
+    global shared
+    shared = tokens
+
+
+def parse_slice(begin, end):
+    tokens, next = shared[begin:end], shared[end]
+    # every slice is parsed as a program of its own
+    tokens.append(Token(Type.EOF, "", None, None, next.offset, next.source))
+
+    parser = Parser(tokens)
+    program = parser.program()
+
+    return program.statements, bool(parser.errors)
+
+
+def boundaries(types):
+    """Returns the indices at which top-level declarations start"""
+    depth, result = 0, []
+
+    # the last token is EOF, which no declaration starts at
+    for i in range(len(types) - 2):
+        type = types[i]
+
+        if type in OPENING:
+            depth += 1
+        elif type in CLOSING:
+            depth -= 1
+
+            if depth == 0 and type == Type.RIGHT_BRACE and types[i + 1] in STARTS:
+                result.append(i + 1)
+        elif depth == 0 and type == Type.SEMICOLON and types[i + 1] != Type.ELSE:
+            result.append(i + 1)
+
+    return result
+
+
+class ParallelParser:
+    """Parses slices of top-level declarations in a process pool
+
+    The slices are cut by brace depth alone. Should any of them fail to parse,
+    the whole program is parsed again sequentially, so errors and their
+    positions are exactly those of the sequential parser.
+    """
+
+    def __init__(self, tokens, workers=None, slices=None):
+        # slices are cut out of the whole token list, which a stream never holds
+        if not hasattr(tokens, "__len__"):
+            tokens = list(tokens)
+
+        self.tokens = tokens
+        self.workers = workers or os.cpu_count()
+        self.slices = slices or self.workers * 4
+
+    def parse(self):
+        results = self.parse_slices(self.split())
+        statements = []
+
+        for part, failed in results:
+            if failed:
+                return Parser(self.tokens).parse()
+
+            statements.extend(part)
+
+        return ast.Program(statements)
+
+    def types(self):
+        types = getattr(self.tokens, "types", None)
+
+        if types is None:
+            types = [token.type for token in self.tokens]
+
+        return types
+
+    def split(self):
+        tokens, starts = self.tokens, boundaries(self.types())
+        size = len(tokens) // self.slices + 1
+        slices, begin = [], 0
+
+        for start in starts:
+            if start - begin >= size:
+                slices.append((begin, start))
+                begin = start
+
+        if begin < len(tokens) - 1 or not slices:
+            slices.append((begin, len(tokens) - 1))
+
+        return slices
+
+    def parse_slices(self, slices):
+        begins, ends = [begin for begin, _ in slices], [end for _, end in slices]
+
+        if self.workers == 1 or len(slices) <= 1:
+            share(self.tokens)
+            try:
+                return list(map(parse_slice, begins, ends))
+            finally:
+                share(None)
+
+        from concurrent.futures import ProcessPoolExecutor
+
+        # forked workers inherit the tokens, others receive them once
+        pool = ProcessPoolExecutor(self.workers, initializer=share, initargs=(self.tokens,))
+        # unpickling the nodes sets off collections which find nothing to free
+        enabled = gc.isenabled()
+        gc.disable()
+
+        try:
+            with pool:
+                return list(pool.map(parse_slice, begins, ends))
+        finally:
+            if enabled:
+                gc.enable()
@@ -0,0 +1,115 @@
+import os
+from lib.token import Token, Type
+from lib.error import ScanError, CompileErrors
+from lib.source import Source
+from lib.token_buffer import TokenBuffer, BufferScanner, TYPES
+
+
+class ChunkScanner(BufferScanner):
+    """Scans one chunk of a larger source, keeping error offsets unresolved"""
+
+    def error(self, message, offset):
+        self.errors.append((message, offset))
+
+
+def scan_chunk(text, base):
+    scanner = ChunkScanner(None)
+    buffer = TokenBuffer()
+
+    scanner.fill(buffer, text, base)
+
+    errors = scanner.errors
+    if scanner.unterminated is not None:
+        # the string may still be closed in one of the following chunks
+        errors = errors[:-1]
+
+    return buffer, errors, scanner.unterminated
+
+
+class ParallelScanner:
+    """Scans newline-aligned chunks of a large source in a process pool
+
+    Every chunk is scanned as if it started outside of a string literal.
+    When a chunk ends inside an unterminated string, the string is closed
+    here and the chunk it closes in is scanned again from that point on.
+    """
+
+    def __init__(self, source, workers=None, chunk_size=1 << 18):
+        self.source = source
+        self.positions = Source(source)
+        self.workers = workers or os.cpu_count()
+        self.chunk_size = chunk_size
+        self.errors = []
+
+    def scan(self):
+        buffer = self.scan_buffer()
+        lexemes, literals, positions = buffer.lexemes, buffer.literals, self.positions
+
+        return [
+            Token(TYPES[type], lexemes[id], literals[id], None, start, positions)
+            for type, id, start in zip(buffer.types, buffer.ids, buffer.starts)
+        ]
+
+    def scan_buffer(self):
+        source = self.source
+        chunks = self.chunks()
+        results = self.scan_chunks(chunks)
+        buffer = TokenBuffer(self.positions)
+
+        i = 0
+        while i < len(chunks):
+            part, errors, unterminated = results[i]
+            buffer.extend(part)
+            self.errors.extend(errors)
+
+            if unterminated is None:
+                i += 1
+                continue
+
+            close = source.find(source[unterminated], unterminated + 1)
+
+            if close == -1:
+                self.errors.append(("Unterminated string", len(source)))
+                break
+
+            string = source[unterminated : close + 1]
+            buffer.append(Type.STRING, string, unterminated, close + 1)
+
+            while chunks[i][1] <= close:
+                i += 1
+
+            results[i] = scan_chunk(source[close + 1 : chunks[i][1]], close + 1)
+
+        buffer.append(Type.EOF, "", len(source), len(source))
+
+        if self.errors:
+            raise CompileErrors([self.error(*error) for error in self.errors])
+
+        return buffer
+
+    def chunks(self):
+        chunks, start = [], 0
+
+        while start < len(self.source):
+            end = self.source.find("\n", start + self.chunk_size)
+            end = len(self.source) if end == -1 else end + 1
+            chunks.append((start, end))
+            start = end
+
+        return chunks
+
+    def scan_chunks(self, chunks):
+        texts = [self.source[start:end] for start, end in chunks]
+        bases = [start for start, _ in chunks]
+
+        if self.workers == 1 or len(chunks) <= 1:
+            return list(map(scan_chunk, texts, bases))
+
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(self.workers) as pool:
+            return list(pool.map(scan_chunk, texts, bases))
+
+    def error(self, message, offset):
+        line, column = self.positions.position(offset)
+        return ScanError(line, message, column)
@@ -26,6 +26,9 @@ class Parser:
     def peek(self):
         return self.tokens[self.current]
 
+    def peek_type(self):
+        return self.tokens[self.current].type
+
     def previous(self):
         if self.current == 0:
             raise ValueError("cannot look at previous token when at position 0")
@@ -143,7 +146,7 @@ class Parser:
 
         self.consume(Type.LEFT_BRACE, "Expected { before function body")
 
-        body = self.block()
+        body = self.function_body()
 
         return ast.FunctionDeclaration(identifier, parameters, body)
 
@@ -196,6 +199,9 @@ class Parser:
 
         return ast.Block(statements)
 
+    def function_body(self):
+        return self.block()
+
     def _return(self):
         token = self.previous()
 
@@ -294,7 +300,7 @@ class Parser:
 
         self.consume(Type.LEFT_BRACE, "Expected { before function body")
 
-        body = self.block()
+        body = self.function_body()
 
         return ast.FunctionExpression(parameters, body)
 
@@ -413,23 +419,7 @@ class Parser:
 
         while True:
             if self.match_any(Type.LEFT_PAREN):
-                arguments = []
-
-                if not self.matches(Type.RIGHT_PAREN):
-                    arguments.append(self.expression())
-
-                    while self.match_any(Type.COMMA):
-                        if len(arguments) >= 255:
-                            self.error(
-                                self.peek(), "Maximum argument count of 255 exceeded"
-                            )
-
-                        arguments.append(self.expression())
-
-                self.consume(Type.RIGHT_PAREN, "Expected closing parenthesis")
-                token = self.previous()
-
-                expr = ast.CallExpression(expr, token, arguments)
+                expr = self.finish_call(expr)
             elif self.match_any(Type.DOT):
                 name = self.consume(Type.IDENTIFIER, "Expected property name after '.'")
                 expr = ast.GetExpression(expr, name)
@@ -438,6 +428,23 @@ class Parser:
 
         return expr
 
+    def finish_call(self, callee):
+        arguments = []
+
+        if not self.matches(Type.RIGHT_PAREN):
+            arguments.append(self.expression())
+
+            while self.match_any(Type.COMMA):
+                if len(arguments) >= 255:
+                    self.error(self.peek(), "Maximum argument count of 255 exceeded")
+
+                arguments.append(self.expression())
+
+        self.consume(Type.RIGHT_PAREN, "Expected closing parenthesis")
+        token = self.previous()
+
+        return ast.CallExpression(callee, token, arguments)
+
     def primary(self):
         if self.match_any(Type.TRUE):
             return ast.LiteralExpression(True)
@@ -487,3 +494,27 @@ class Parser:
             return False
 
         return True
+
+
+class BufferParser(Parser):
+    """Parser over a TokenBuffer, checking token types by their integer codes"""
+
+    def __init__(self, buffer):
+        super().__init__(buffer)
+        self.types = buffer.types
+
+    def match_any(self, *types):
+        if self.types[self.current] in types:
+            self.current += 1
+            return True
+
+        return False
+
+    def matches(self, type):
+        return self.types[self.current] == type
+
+    def peek_type(self):
+        return self.types[self.current]
+
+    def at_end(self):
+        return self.types[self.current] == Type.EOF
@@ -0,0 +1,83 @@
+import lib.ast as ast
+from lib.token import Type
+from lib.parser import Parser, BufferParser
+
+# binding powers, from the loosest to the tightest
+TERNARY = 1
+OR = 2
+AND = 3
+EQUALITY = 4
+COMPARISON = 5
+TERM = 6
+FACTOR = 7
+UNARY = 8
+CALL = 9
+
+INFIX = {
+    Type.QUESTION_MARK: TERNARY,
+    Type.OR: OR,
+    Type.AND: AND,
+    Type.BANG_EQUAL: EQUALITY,
+    Type.EQUAL_EQUAL: EQUALITY,
+    Type.GREATER: COMPARISON,
+    Type.GREATER_EQUAL: COMPARISON,
+    Type.LESS: COMPARISON,
+    Type.LESS_EQUAL: COMPARISON,
+    Type.PLUS: TERM,
+    Type.MINUS: TERM,
+    Type.STAR: FACTOR,
+    Type.SLASH: FACTOR,
+    Type.LEFT_PAREN: CALL,
+    Type.DOT: CALL,
+}
+
+
+class PrattParser(Parser):
+    """Parses operators by binding power instead of one method per precedence level
+
+    Statements, assignment and primaries are shared with the recursive descent
+    parser, so both produce the same nodes and report the same errors.
+    """
+
+    def ternary(self):
+        return self.binary(TERNARY)
+
+    def binary(self, power):
+        if self.match_any(Type.BANG, Type.MINUS):
+            operator = self.previous()
+            expr = ast.UnaryExpression(operator, self.binary(UNARY))
+        else:
+            expr = self.primary()
+
+        while True:
+            infix = INFIX.get(self.peek_type())
+
+            if infix is None or infix < power:
+                return expr
+
+            operator = self.advance()
+
+            if infix == CALL:
+                expr = self.postfix(expr, operator)
+            elif infix == TERNARY:
+                then = self.binary(OR)
+                self.consume(Type.COLON, "Expected colon in ternary")
+                nhet = self.binary(TERNARY)
+                expr = ast.TernaryExpression(expr, operator, then, nhet)
+            elif infix <= AND:
+                right = self.binary(infix + 1)
+                expr = ast.LogicalExpression(expr, operator, right)
+            else:
+                right = self.binary(infix + 1)
+                expr = ast.BinaryExpression(expr, operator, right)
+
+    def postfix(self, expr, operator):
+        if operator.type == Type.LEFT_PAREN:
+            return self.finish_call(expr)
+
+        name = self.consume(Type.IDENTIFIER, "Expected property name after '.'")
+        return ast.GetExpression(expr, name)
+
+
+class BufferPrattParser(PrattParser, BufferParser):
+    """Pratt parser over a TokenBuffer"""
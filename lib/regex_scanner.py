@@ -0,0 +1,115 @@
+import re
+from lib.token import Token, Type
+from lib.error import ScanError, CompileErrors
+from lib.scanner import KEYWORDS
+from lib.source import Source
+
+
+OPERATORS = {
+    "(": Type.LEFT_PAREN,
+    ")": Type.RIGHT_PAREN,
+    "{": Type.LEFT_BRACE,
+    "}": Type.RIGHT_BRACE,
+    ",": Type.COMMA,
+    ".": Type.DOT,
+    "+": Type.PLUS,
+    ";": Type.SEMICOLON,
+    "*": Type.STAR,
+    "/": Type.SLASH,
+    "?": Type.QUESTION_MARK,
+    ":": Type.COLON,
+    "\\": Type.BACKSLASH,
+    "!": Type.BANG,
+    "!=": Type.BANG_EQUAL,
+    "=": Type.EQUAL,
+    "==": Type.EQUAL_EQUAL,
+    "<": Type.LESS,
+    "<=": Type.LESS_EQUAL,
+    ">": Type.GREATER,
+    ">=": Type.GREATER_EQUAL,
+    "-": Type.MINUS,
+    "->": Type.ARROW,
+}
+
+# alternatives are ordered so that the longest lexeme wins,
+# exactly like the branches of Scanner.scan_single
+PATTERN = re.compile(
+    r"""
+      (?P<space>[ \t\r\n]+)
+    | (?P<identifier>[A-Za-z_][A-Za-z0-9_]*)
+    | (?P<number>[0-9]+(?:\.[0-9]+)?)
+    | (?P<operator>[!=<>]=|->|[-(){},.+;*/?:\\!=<>])
+    | (?P<string>"[^"]*"|'[^']*')
+    | (?P<unterminated>["'])
+    | (?P<unknown>.)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+
+# a token ending this close to the end of an incomplete buffer
+# might continue in the next chunk, e.g. "1." followed by "5"
+LOOKAHEAD = 2
+
+
+class RegexScanner:
+    def __init__(self, source):
+        self.source = source
+        self.positions = Source(source)
+        self.tokens = []
+        self.errors = []
+        self.base = 0
+        self.position = 0
+
+    def scan(self):
+        self.tokens.extend(self.tokenize(self.source))
+        self.tokens.append(
+            Token(Type.EOF, "", None, None, len(self.source), self.positions)
+        )
+
+        if self.errors:
+            raise CompileErrors(self.errors)
+
+        return self.tokens
+
+    def tokenize(self, source, final=True):
+        base, positions = self.base, self.positions
+        limit = len(source) if final else len(source) - LOOKAHEAD
+        self.position = len(source)
+
+        for match in PATTERN.finditer(source):
+            kind = match.lastgroup
+
+            if match.end() > limit or (kind == "unterminated" and not final):
+                self.position = match.start()
+                break
+
+            if kind == "space":
+                continue
+
+            lexeme = match.group()
+            offset = base + match.start()
+
+            if kind == "identifier":
+                if lexeme in KEYWORDS:
+                    yield Token(KEYWORDS[lexeme], lexeme, None, None, offset, positions)
+                else:
+                    yield Token(
+                        Type.IDENTIFIER, lexeme, lexeme, None, offset, positions
+                    )
+            elif kind == "operator":
+                yield Token(OPERATORS[lexeme], lexeme, None, None, offset, positions)
+            elif kind == "number":
+                value = float(lexeme) if "." in lexeme else int(lexeme)
+                yield Token(Type.NUMBER, lexeme, value, None, offset, positions)
+            elif kind == "string":
+                yield Token(Type.STRING, lexeme, lexeme[1:-1], None, offset, positions)
+            elif kind == "unterminated":
+                self.error("Unterminated string", base + len(source))
+                break
+            else:
+                self.error("Unrecognized character [%s]" % lexeme, offset)
+
+    def error(self, message, offset):
+        line, column = self.positions.position(offset)
+        self.errors.append(ScanError(line, message, column))
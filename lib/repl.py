@@ -0,0 +1,43 @@
+from lib import ast
+from lib.token import Type
+from lib.scanner import Scanner
+from lib.parser import Parser
+from lib.resolver import Resolver
+from lib.interpreter import Interpreter
+
+
+class ReplParser(Parser):
+    """Parser of a line of the REPL, which prints a line that is a lone expression
+
+    The expression is told apart by the missing semicolon at the end of the
+    line, so the line is parsed once whichever it is.
+    """
+
+    def expression_statement(self):
+        start = self.current
+        expression = self.expression()
+
+        if start == 0 and self.at_end():
+            return ast.PrintStatement([expression])
+
+        self.consume(Type.SEMICOLON, "Expected semicolon after statement")
+        return ast.ExpressionStatement(expression)
+
+
+class ReplSession:
+    """Lines of the REPL, run one after another by the same interpreter
+
+    Nothing is kept per line but what the program itself holds on to, so a
+    line takes as long in a long session as it does in a new one.
+    """
+
+    def __init__(self, interpreter=None):
+        self.interpreter = interpreter or Interpreter()
+
+    def run(self, code):
+        program = ReplParser(Scanner(code).scan()).parse()
+        # lines are resolved at the top level, where there are no scopes to
+        # carry over, and the resolver leaves what it finds on the nodes
+        Resolver(program).run()
+
+        self.interpreter.interpret(program)
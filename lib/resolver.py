@@ -1,6 +1,7 @@
 from lib import ast
 from lib.error import ResolverError, CompileErrors
 from enum import Enum, auto
+from functools import partial
 
 
 class FunctionType(Enum):
@@ -16,12 +17,61 @@ class ClassType(Enum):
     SUBCLASS = auto()
 
 
+# statements which declare a variable in the scope they are in
+DECLARATIONS = (ast.VariableDeclaration, ast.FunctionDeclaration, ast.ClassDeclaration)
+
+# depth of variables a function closed over, whose slot is the index of
+# their cell among those the function captured
+UPVALUE = -2
+
+
+class Local:
+    """Variable declared in a scope, at a slot of the frame the scope runs in"""
+
+    __slots__ = ("slot", "defined", "declaration", "captured")
+
+    def __init__(self, slot, defined=False, declaration=None):
+        self.slot = slot
+        self.defined = defined
+        # the node declaring the variable, None for parameters
+        self.declaration = declaration
+        self.captured = False
+
+
+class FreeVariables:
+    """Variables a function captures from the scopes around it, in the order of its cells"""
+
+    def __init__(self, base):
+        # index of the scope of the function's own parameters
+        self.base = base
+        # where the cell of each one comes from, a (depth, slot) of the
+        # scopes around the function, or (UPVALUE, index) of the function
+        # around it. None is the `this` a method is bound to
+        self.upvalues = []
+        self.indices = {}
+
+    def add(self, name, upvalue):
+        index = self.indices[name] = len(self.upvalues)
+        self.upvalues.append(upvalue)
+
+        return index
+
+    def copy(self):
+        free = FreeVariables(self.base)
+        free.upvalues, free.indices = list(self.upvalues), dict(self.indices)
+
+        return free
+
+
 class Resolver:
     def __init__(self, ast):
         self.ast = ast
         self.scopes = []
+        # free variables of the functions being resolved, innermost last
+        self.functions = []
         self.bindings = {}
         self.errors = []
+        self.work = []
         self.current_function = FunctionType.NONE
         self.current_class = ClassType.NONE
 
@@ -33,71 +83,226 @@ class Resolver:
 
         return self.bindings
 
+    def context(self):
+        scopes = [dict(scope) for scope in self.scopes]
+        functions = [function.copy() for function in self.functions]
+        return scopes, functions, self.current_function, self.current_class
+
+    def resume(self, context):
+        """Resolves the statements of a function body in the scopes it was declared in"""
+        scopes, functions, self.current_function, self.current_class = context
+        self.scopes = [dict(scope) for scope in scopes]
+        self.functions = [function.copy() for function in functions]
+
+        for statement in self.ast.statements:
+            self.resolve(statement)
+
+        self.ast.size = len(self.inner_scope())
+        self.ast.cells = self.close(self.inner_scope())
+
+        if self.errors:
+            raise CompileErrors(self.errors)
+
+        return self.bindings
+
     def begin_scope(self):
         self.scopes.append({})
 
     def end_scope(self):
         self.scopes.pop()
 
-    def declare(self, token):
+    def close(self, scope):
+        """Marks the declarations of the variables of `scope` closures capture,
+        returning the slots of such parameters"""
+        cells = []
+
+        for local in scope.values():
+            if not local.captured:
+                continue
+
+            if local.declaration is None:
+                cells.append(local.slot)
+            else:
+                local.declaration.cell = True
+
+        return tuple(cells)
+
+    def declare(self, token, declaration=None):
+        """Returns the slot of the variable in the frame of its scope, None for globals"""
         if self.in_global_scope():
-            return
+            return None
+
+        scope = self.inner_scope()
 
-        if token.lexeme in self.inner_scope():
+        if token.lexeme in scope:
             self.error(token, "Variable [%s] is already defined" % token.lexeme)
 
-        self.inner_scope()[token.lexeme] = False
+        if declaration is not None:
+            # until a closure is found to capture the variable
+            declaration.cell = False
+
+        slot = len(scope)
+        scope[token.lexeme] = Local(slot, declaration=declaration)
+
+        return slot
 
     def define(self, token):
         if self.in_global_scope():
             return
 
-        self.inner_scope()[token.lexeme] = True
+        self.inner_scope()[token.lexeme].defined = True
+
+    def schedule(self, *items):
+        """Queues nodes to resolve and actions to call next, in the given order"""
+        self.work.extend(items[::-1])
 
     def resolve_block(self, node):
-        self.begin_scope()
+        if not any(isinstance(statement, DECLARATIONS) for statement in node.statements):
+            # with nothing to keep, the block runs in the frame it is in
+            node.size = 0
+            return self.schedule(*node.statements)
 
-        for statement in node.statements:
-            self.resolve(statement)
+        self.begin_scope()
+        self.schedule(*node.statements, partial(self.end_block, node))
 
+    def end_block(self, node):
+        node.size = len(self.inner_scope())
+        self.close(self.inner_scope())
         self.end_scope()
 
     def resolve_variable_declaration(self, node):
-        self.declare(node.identifier)
+        node.slot = self.declare(node.identifier, node)
 
         if node.initializer:
-            self.resolve(node.initializer)
-
-        self.define(node.identifier)
+            self.schedule(node.initializer, partial(self.define, node.identifier))
+        else:
+            self.define(node.identifier)
 
     def resolve_local(self, node, name):
-        for i in range(len(self.scopes) - 1, 0 - 1, -1):
-            scope = self.scopes[i]
-            if name in scope:
-                self.add_binding(node, len(self.scopes) - 1 - i)
+        # locals of the function being resolved are found in its own frames
+        base = self.functions[-1].base if self.functions else 0
+
+        for i in range(len(self.scopes) - 1, base - 1, -1):
+            local = self.scopes[i].get(name)
+            if local is not None:
+                self.add_binding(node, len(self.scopes) - 1 - i, local.slot)
                 return
 
+        # those of functions around it in the cells it captured
+        index = self.upvalue(name)
+        if index is not None:
+            self.add_binding(node, UPVALUE, index)
+            return
+
         # otherwise it's global
+        node.depth = None
+
+    def upvalue(self, name):
+        """Returns the index of the cell of `name` among those the innermost function captures"""
+        functions, scopes = self.functions, self.scopes
+
+        # the innermost function which captures the variable already, or
+        # which is declared in one of the scopes the variable is in
+        for level in range(len(functions) - 1, -1, -1):
+            function = functions[level]
+            index = function.indices.get(name)
+
+            if index is not None:
+                break
+
+            outer = functions[level - 1].base if level else 0
+
+            for i in range(function.base - 1, outer - 1, -1):
+                local = scopes[i].get(name)
+
+                if local is not None:
+                    local.captured = True
+                    index = function.add(name, (function.base - 1 - i, local.slot))
+                    break
+
+            if index is not None:
+                break
+        else:
+            return None
+
+        # every function in between passes the cell on
+        for function in functions[level + 1 :]:
+            index = function.add(name, (UPVALUE, index))
+
+        return index
 
     def resolve_function(self, node, declaration):
-        self.declare(node.name)
+        node.slot = self.declare(node.name, node)
         self.define(node.name)
         self.resolve_anonymous_function(node, declaration)
 
-    def resolve_anonymous_function(self, node, declaration):
+    def resolve_anonymous_function(self, node, declaration, superclass=False):
         enclosing_function = self.current_function
         self.current_function = declaration
         self.begin_scope()
 
+        function = FreeVariables(len(self.scopes) - 1)
+        self.functions.append(function)
+
+        if declaration in (FunctionType.METHOD, FunctionType.INITIALIZER):
+            # methods take the instance they are bound to as their first
+            # cell, and the superclass as the second one
+            function.add("this", None)
+
+            if superclass:
+                self.upvalue("super")
+
         for parameter in node.parameters:
             self.declare(parameter)
             self.define(parameter)
 
+        end = partial(self.end_function, node, enclosing_function)
+        body = None if isinstance(node, ast.LambdaExpression) else node.body
+
+        if isinstance(node, ast.LambdaExpression):
+            self.schedule(node.expression, end)
+        elif isinstance(body, ast.LazyBlock) and self.defers(node, body):
+            # the body is resolved once it is parsed, in the scopes it sees now
+            body.context = self.context()
+            end()
+        elif isinstance(body, ast.LazyBlock):
+            # what a closure captures, or what is wrong with the body, is
+            # needed before it is first called
+            body.block = body.parse()
+            self.schedule(*body.block.statements, end)
+        else:
+            self.schedule(*body.statements, end)
+
+    def defers(self, node, body):
+        """Whether resolving a lazy body can wait until it is first called"""
+        return not self.encloses_locals() and body.deferrable(
+            node.parameters,
+            self.current_function == FunctionType.INITIALIZER,
+            self.current_class != ClassType.NONE,
+            self.current_class == ClassType.SUBCLASS,
+        )
+
+    def encloses_locals(self):
+        # the scopes around the function, but for those which hold nothing but
+        # the superclass every method captures anyway
+        return any(list(scope) != ["super"] for scope in self.scopes[:-1])
+
+    def end_function(self, node, enclosing_function):
+        # the frame of a call holds the parameters and the locals of the body,
+        # which a lazy body only knows once it is resumed
+        scope = self.inner_scope()
+        node.upvalues = tuple(self.functions.pop().upvalues)
+
         if isinstance(node, ast.LambdaExpression):
-            self.resolve(node.expression)
+            body = node
+        elif isinstance(node.body, ast.LazyBlock):
+            body = node.body.block
         else:
-            for statement in node.body.statements:
-                self.resolve(statement)
+            body = node.body
+
+        if body is not None:
+            body.size = len(scope)
+            body.cells = self.close(scope)
 
         self.end_scope()
         self.current_function = enclosing_function
@@ -106,7 +311,7 @@ class Resolver:
         enclosing_class = self.current_class
         self.current_class = ClassType.CLASS
 
-        self.declare(node.name)
+        node.slot = self.declare(node.name, node)
 
         if node.super:
             self.current_class = ClassType.SUBCLASS
@@ -114,166 +319,153 @@ class Resolver:
             if node.name.lexeme == node.super.variable.lexeme:
                 self.error(node.super.variable, "A class cannot inherit from itself")
 
-            self.resolve(node.super)
+            self.schedule(
+                node.super, partial(self.resolve_methods, node, enclosing_class)
+            )
+        else:
+            self.resolve_methods(node, enclosing_class)
 
+    def resolve_methods(self, node, enclosing_class):
+        if node.super:
             self.begin_scope()
-            self.inner_scope()["super"] = True
-
-        self.begin_scope()
-        self.inner_scope()["this"] = True
+            self.inner_scope()["super"] = Local(0, defined=True)
 
+        methods = []
         for method in node.methods:
             declaration = FunctionType.METHOD
 
             if method.name.lexeme == "init":
                 declaration = FunctionType.INITIALIZER
 
-            self.resolve_function(method, declaration)
+            methods.append(
+                partial(
+                    self.resolve_anonymous_function,
+                    method,
+                    declaration,
+                    node.super is not None,
+                )
+            )
 
-        self.define(node.name)
+        self.schedule(*methods, partial(self.end_class, node, enclosing_class))
 
+    def end_class(self, node, enclosing_class):
         if node.super:
             self.end_scope()
 
-        self.end_scope()
+        # in the scope the class is declared in, not that of `super`
+        self.define(node.name)
 
         self.current_class = enclosing_class
 
     def resolve(self, node):
-        if isinstance(node, ast.Program):
-            for statement in node.statements:
-                self.resolve(statement)
-            return
-
-        if isinstance(node, ast.Block):
-            return self.resolve_block(node)
-
-        if isinstance(node, ast.ClassDeclaration):
-            return self.resolve_class(node)
+        # nodes are resolved from a work list rather than by recursion,
+        # so that the depth of the tree is only limited by memory
+        work = self.work
+        work.append(node)
 
-        if isinstance(node, ast.FunctionDeclaration):
-            return self.resolve_function(node, FunctionType.FUNCTION)
+        while work:
+            item = work.pop()
+            visit = VISIT.get(item.__class__)
 
-        if isinstance(node, ast.VariableDeclaration):
-            return self.resolve_variable_declaration(node)
+            if visit is not None:
+                visit(self, item)
+            elif isinstance(item, ast.AST):
+                self.visit(item)
+            else:
+                item()
 
-        if isinstance(node, ast.PrintStatement):
-            for expression in node.expressions:
-                self.resolve(expression)
+    def visit(self, node):
+        visit = ast.dispatch(VISIT, node.__class__)
 
-            return
-
-        if isinstance(node, ast.IfStatement):
-            self.resolve(node.test)
-            self.resolve(node.then)
-            if node.neht:
-                self.resolve(node.neht)
-            return
+        if visit is None:
+            raise ValueError("[resolver] unsupported ast node [%s]" % node.__class__)
 
-        if isinstance(node, ast.WhileStatement):
-            self.resolve(node.test)
-            self.resolve(node.body)
-            return
+        return visit(self, node)
 
-        if isinstance(node, ast.ReturnStatement):
-            if self.current_function == FunctionType.NONE:
-                self.error(node.token, "Cannot return from top-level code")
+    def visit_variable(self, node):
+        if self.variable_access_inside_own_initializer(node):
+            self.error(
+                node.variable,
+                "Variable [%s] accessed inside its own initializer"
+                % node.variable.lexeme,
+            )
 
-            if self.current_function == FunctionType.INITIALIZER:
-                self.error(node.token, "Cannot return a value from an initializer")
+        self.resolve_local(node, node.variable.lexeme)
 
-            self.resolve(node.expression)
-            return
+    def visit_literal(self, node):
+        pass
 
-        if isinstance(node, ast.BinaryExpression):
-            self.resolve(node.left)
-            self.resolve(node.right)
-            return
+    def visit_call(self, node):
+        self.schedule(node.callee, *node.arguments)
 
-        if isinstance(node, ast.GroupingExpression):
-            self.resolve(node.expression)
-            return
+    def visit_print(self, node):
+        self.schedule(*node.expressions)
 
-        if isinstance(node, ast.LogicalExpression):
-            self.resolve(node.left)
-            self.resolve(node.right)
-            return
+    def visit_binary(self, node):
+        self.schedule(node.left, node.right)
 
-        if isinstance(node, ast.ExpressionStatement):
-            return self.resolve(node.expression)
+    def visit_return(self, node):
+        if self.current_function == FunctionType.NONE:
+            self.error(node.token, "Cannot return from top-level code")
 
-        if isinstance(node, ast.VariableExpression):
-            if self.variable_access_inside_own_initializer(node):
-                self.error(
-                    node.variable,
-                    "Variable [%s] accessed inside its own initializer"
-                    % node.variable.lexeme,
-                )
+        if self.current_function == FunctionType.INITIALIZER:
+            self.error(node.token, "Cannot return a value from an initializer")
 
-            self.resolve_local(node, node.variable.lexeme)
-            return
+        self.work.append(node.expression)
 
-        if isinstance(node, ast.CallExpression):
-            self.resolve(node.callee)
+    def visit_logical(self, node):
+        self.schedule(node.left, node.right)
 
-            for argument in node.arguments:
-                self.resolve(argument)
+    def visit_expression_statement(self, node):
+        self.work.append(node.expression)
 
-            return
+    def visit_function_declaration(self, node):
+        self.resolve_function(node, FunctionType.FUNCTION)
 
-        if isinstance(node, ast.GetExpression):
-            self.resolve(node.object)
-            return
+    def visit_assignment(self, node):
+        self.schedule(node.right, partial(self.resolve_local, node, node.left.lexeme))
 
-        if isinstance(node, ast.SetExpression):
-            self.resolve(node.value)
-            self.resolve(node.object)
-            return
+    def visit_get(self, node):
+        self.work.append(node.object)
 
-        if isinstance(node, ast.FunctionExpression):
-            self.resolve_anonymous_function(node, FunctionType.FUNCTION)
-            return
+    def visit_set(self, node):
+        self.schedule(node.value, node.object)
 
-        if isinstance(node, ast.LambdaExpression):
-            self.resolve_anonymous_function(node, FunctionType.FUNCTION)
-            return
+    def visit_this(self, node):
+        if self.current_class == ClassType.NONE:
+            self.error(node.token, "Cannot use 'this' outside of a class")
 
-        if isinstance(node, ast.AssignmentExpression):
-            self.resolve(node.right)
-            self.resolve_local(node, node.left.lexeme)
-            return
+        self.resolve_local(node, node.token.lexeme)
 
-        if isinstance(node, ast.TernaryExpression):
-            self.resolve(node.test)
-            self.resolve(node.then)
-            if node.neht:
-                self.resolve(node.neht)
-            return
+    def visit_while(self, node):
+        self.schedule(node.test, node.body)
 
-        if isinstance(node, ast.LiteralExpression):
-            return
+    def visit_grouping(self, node):
+        self.work.append(node.expression)
 
-        if isinstance(node, ast.UnaryExpression):
-            self.resolve(node.right)
-            return
+    def visit_if(self, node):
+        if node.neht:
+            return self.schedule(node.test, node.then, node.neht)
+        self.schedule(node.test, node.then)
 
-        if isinstance(node, ast.ThisExpression):
-            if self.current_class == ClassType.NONE:
-                self.error(node, "Cannot use 'this' outside of a class")
+    def visit_anonymous_function(self, node):
+        self.resolve_anonymous_function(node, FunctionType.FUNCTION)
 
-            self.resolve_local(node, node.token.lexeme)
-            return
+    def visit_unary(self, node):
+        self.work.append(node.right)
 
-        if isinstance(node, ast.SuperExpression):
-            if self.current_class == ClassType.NONE:
-                self.error(node, "Cannot use 'super' outside of a class")
-            elif self.current_class != ClassType.SUBCLASS:
-                self.error(node, "Cannot use 'super' in a class with no superclass")
+    def visit_super(self, node):
+        if self.current_class == ClassType.NONE:
+            self.error(node.keyword, "Cannot use 'super' outside of a class")
+        elif self.current_class != ClassType.SUBCLASS:
+            self.error(node.keyword, "Cannot use 'super' in a class with no superclass")
 
-            self.resolve_local(node, node.keyword.lexeme)
-            return
+        self.resolve_local(node, node.keyword.lexeme)
+        # the instance `super` calls the method of
+        node.receiver = self.upvalue("this")
 
-        raise ValueError("[resolver] unsupported ast node [%s]" % node.__class__)
+    def visit_program(self, node):
+        self.schedule(*node.statements)
 
     def in_global_scope(self):
         return len(self.scopes) == 0
@@ -291,10 +483,42 @@ class Resolver:
         if variable not in scope:
             return False
 
-        return scope[variable] == False
+        return not scope[variable].defined
 
-    def add_binding(self, node, depth):
+    def add_binding(self, node, depth, slot):
+        node.depth = depth
+        node.slot = slot
         self.bindings[node] = depth
 
     def error(self, token, message):
         self.errors.append(ResolverError(token, message))
+
+
+# node classes, each with the method of the resolver which visits it
+VISIT = {
+    ast.VariableExpression: Resolver.visit_variable,
+    ast.LiteralExpression: Resolver.visit_literal,
+    ast.CallExpression: Resolver.visit_call,
+    ast.PrintStatement: Resolver.visit_print,
+    ast.BinaryExpression: Resolver.visit_binary,
+    ast.VariableDeclaration: Resolver.resolve_variable_declaration,
+    ast.Block: Resolver.resolve_block,
+    ast.ReturnStatement: Resolver.visit_return,
+    ast.LogicalExpression: Resolver.visit_logical,
+    ast.ExpressionStatement: Resolver.visit_expression_statement,
+    ast.FunctionDeclaration: Resolver.visit_function_declaration,
+    ast.AssignmentExpression: Resolver.visit_assignment,
+    ast.GetExpression: Resolver.visit_get,
+    ast.SetExpression: Resolver.visit_set,
+    ast.ThisExpression: Resolver.visit_this,
+    ast.WhileStatement: Resolver.visit_while,
+    ast.GroupingExpression: Resolver.visit_grouping,
+    ast.IfStatement: Resolver.visit_if,
+    ast.TernaryExpression: Resolver.visit_if,
+    ast.LambdaExpression: Resolver.visit_anonymous_function,
+    ast.FunctionExpression: Resolver.visit_anonymous_function,
+    ast.UnaryExpression: Resolver.visit_unary,
+    ast.ClassDeclaration: Resolver.resolve_class,
+    ast.SuperExpression: Resolver.visit_super,
+    ast.Program: Resolver.visit_program,
+}
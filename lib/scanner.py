@@ -1,22 +1,45 @@
 from lib.token import Token, Type
 from lib.error import ScanError, CompileErrors
+from lib.source import Source
+
+
+KEYWORDS = {
+    "and": Type.AND,
+    "or": Type.OR,
+    "class": Type.CLASS,
+    "if": Type.IF,
+    "else": Type.ELSE,
+    "true": Type.TRUE,
+    "false": Type.FALSE,
+    "for": Type.FOR,
+    "fun": Type.FUN,
+    "nil": Type.NIL,
+    "print": Type.PRINT,  # TODO: remove this
+    "while": Type.WHILE,
+    "this": Type.THIS,
+    "var": Type.VAR,
+    "super": Type.SUPER,
+    "return": Type.RETURN,
+}
 
 
 class Scanner:
     def __init__(self, source):
         self.source = source
+        self.positions = Source(source)
         self.tokens = []
         self.errors = []
         self.start = 0
         self.current = 0
-        self.line = 1
 
     def scan(self):
         while not self.at_end():
             self.start = self.current
             self.scan_single()
 
-        self.tokens.append(Token(Type.EOF, "", None, self.line))
+        self.tokens.append(
+            Token(Type.EOF, "", None, None, len(self.source), self.positions)
+        )
 
         if self.errors:
             raise CompileErrors(self.errors)
@@ -68,26 +91,21 @@ class Scanner:
             self.string('"')
         elif c == "'":
             self.string("'")
-        elif c == " " or c == "\r" or c == "\t":
+        elif c == " " or c == "\r" or c == "\t" or c == "\n":
             pass
-        elif c == "\n":
-            self.line += 1
         elif self.is_digit(c):
             self.number()
         elif self.is_alpha(c):
             self.identifier()
         else:
-            self.error("Unrecognized character [%s]" % c)
+            self.error("Unrecognized character [%s]" % c, self.start)
 
     def string(self, quote):
         while self.peek() != quote and not self.at_end():
-            if self.peek() == "\n":
-                self.line += 1
-
             self.advance()
 
         if self.at_end():
-            self.error("Unterminated string")
+            self.error("Unterminated string", self.current)
             return
 
         self.advance()
@@ -118,27 +136,8 @@ class Scanner:
 
         keyword = self.source[self.start : self.current]
 
-        keywords = {
-            "and": Type.AND,
-            "or": Type.OR,
-            "class": Type.CLASS,
-            "if": Type.IF,
-            "else": Type.ELSE,
-            "true": Type.TRUE,
-            "false": Type.FALSE,
-            "for": Type.FOR,
-            "fun": Type.FUN,
-            "nil": Type.NIL,
-            "print": Type.PRINT,  # TODO: remove this
-            "while": Type.WHILE,
-            "this": Type.THIS,
-            "var": Type.VAR,
-            "super": Type.SUPER,
-            "return": Type.RETURN,
-        }
-
-        if keyword in keywords:
-            self.add_token(keywords.get(keyword))
+        if keyword in KEYWORDS:
+            self.add_token(KEYWORDS[keyword])
         else:
             self.add_token(Type.IDENTIFIER, keyword)
 
@@ -181,8 +180,16 @@ class Scanner:
 
     def add_token(self, type, literal=None):
         self.tokens.append(
-            Token(type, self.source[self.start : self.current], literal, self.line)
+            Token(
+                type,
+                self.source[self.start : self.current],
+                literal,
+                None,
+                self.start,
+                self.positions,
+            )
         )
 
-    def error(self, message):
-        self.errors.append(ScanError(self.line, message))
+    def error(self, message, offset):
+        line, column = self.positions.position(offset)
+        self.errors.append(ScanError(line, message, column))
@@ -0,0 +1,44 @@
+import re
+from array import array
+from bisect import bisect_right
+
+NEWLINE = re.compile("\n")
+
+
+class Source:
+    """Source text whose line index is only built once a position is asked for"""
+
+    def __init__(self, text):
+        self.text = text
+        self.starts = None
+
+    def lines(self):
+        if self.starts is None:
+            self.starts = array("Q", [0])
+            self.starts.extend(match.end() for match in NEWLINE.finditer(self.text))
+
+        return self.starts
+
+    def position(self, offset):
+        starts = self.lines()
+        line = bisect_right(starts, offset)
+
+        return line, offset - starts[line - 1] + 1
+
+    def line(self, offset):
+        return bisect_right(self.lines(), offset)
+
+    def __getstate__(self):
+        # positions only need the line index, not the text itself
+        return {"text": None, "starts": self.lines()}
+
+
+class StreamSource(Source):
+    """Line index of a source which is read in chunks and never held in memory whole"""
+
+    def __init__(self):
+        super().__init__(None)
+        self.starts = array("Q", [0])
+
+    def feed(self, chunk, offset):
+        self.starts.extend(offset + match.end() for match in NEWLINE.finditer(chunk))
@@ -0,0 +1,332 @@
+import lib.ast as ast
+from lib.token import Type
+from lib.error import ParseError, CompileErrors
+from lib.parser import Parser, BufferParser
+from lib.pratt_parser import INFIX, TERNARY, OR, AND, UNARY, CALL
+
+
+class StackParser(Parser):
+    """Parser whose nesting depth is only limited by memory
+
+    Every rule which descends into another one is a generator. It yields
+    the generator of the rule it descends into and is sent back its result,
+    so the rules in progress are kept on a list instead of the Python stack.
+    Operators are parsed by binding power, as in PrattParser.
+    """
+
+    def parse(self):
+        ast = self.run(self.program())
+
+        if self.errors:
+            raise CompileErrors(self.errors)
+
+        return ast
+
+    def run(self, rule):
+        stack, value, error = [rule], None, None
+
+        while True:
+            try:
+                if error is None:
+                    child = stack[-1].send(value)
+                else:
+                    child = stack[-1].throw(error)
+            except StopIteration as stop:
+                stack.pop()
+                value, error = stop.value, None
+            except ParseError as e:
+                stack.pop()
+                value, error = None, e
+            else:
+                stack.append(child)
+                value, error = None, None
+                continue
+
+            if not stack:
+                if error is not None:
+                    raise error
+
+                return value
+
+    """ Rules """
+
+    def program(self):
+        statements = []
+
+        while not self.at_end():
+            statements.append((yield self.declaration()))
+
+        return ast.Program(statements)
+
+    def declaration(self):
+        try:
+            if self.match_any(Type.CLASS):
+                return (yield self.class_declaration())
+
+            if self.match_any(Type.VAR):
+                return (yield self.variable_declaration())
+
+            if self.match_any(Type.FUN):
+                return (yield self.function_declaration())
+
+            return (yield self.statement())
+        except ParseError as e:
+            self.synchronize(e)
+            return None
+
+    def class_declaration(self):
+        name = self.consume(Type.IDENTIFIER, "Expected class name")
+
+        superclass = None
+        if self.match_any(Type.LESS):
+            superclass = ast.VariableExpression(
+                self.consume(Type.IDENTIFIER, "Expected a superclass name")
+            )
+
+        self.consume(Type.LEFT_BRACE, "Expected left brace")
+        methods = []
+
+        while not self.matches(Type.RIGHT_BRACE):
+            methods.append((yield self.function_declaration()))
+
+        self.consume(Type.RIGHT_BRACE, "Expected right brace")
+
+        return ast.ClassDeclaration(name, superclass, methods)
+
+    def variable_declaration(self):
+        identifier = self.consume(Type.IDENTIFIER, "Expected variable name")
+        initializer = (yield self.expression()) if self.match_any(Type.EQUAL) else None
+        self.consume(Type.SEMICOLON, "Expected semicolon after variable declaration")
+        return ast.VariableDeclaration(identifier, initializer)
+
+    def function_declaration(self):
+        if self.matches(Type.LEFT_PAREN):
+            return ast.ExpressionStatement((yield self.function_expression()))
+
+        identifier = self.consume(Type.IDENTIFIER, "Expected function name")
+
+        self.consume(Type.LEFT_PAREN, "Expected ( after function name")
+        parameters = self.parameters()
+        self.consume(Type.RIGHT_PAREN, "Expected ) after function parameters")
+
+        self.consume(Type.LEFT_BRACE, "Expected { before function body")
+
+        body = yield self.block()
+
+        return ast.FunctionDeclaration(identifier, parameters, body)
+
+    def statement(self):
+        if self.match_any(Type.WHILE):
+            return (yield self.while_statement())
+
+        if self.match_any(Type.FOR):
+            return (yield self.for_statement())
+
+        if self.match_any(Type.IF):
+            return (yield self.if_statement())
+
+        if self.match_any(Type.PRINT):
+            return (yield self.print_statement())
+
+        if self.match_any(Type.LEFT_BRACE):
+            return (yield self.block())
+
+        if self.match_any(Type.RETURN):
+            return (yield self._return())
+
+        return (yield self.expression_statement())
+
+    def block(self):
+        statements = []
+
+        while not self.at_end() and not self.matches(Type.RIGHT_BRACE):
+            statements.append((yield self.declaration()))
+
+        self.consume(Type.RIGHT_BRACE, "Expected closing brace")
+
+        return ast.Block(statements)
+
+    def _return(self):
+        token = self.previous()
+
+        if not self.matches(Type.SEMICOLON):
+            expr = yield self.expression()
+        else:
+            expr = ast.LiteralExpression(None)
+
+        self.consume(Type.SEMICOLON, "Expected ; after return statement")
+        return ast.ReturnStatement(expr, token)
+
+    def expression_statement(self):
+        expr = yield self.expression()
+        self.consume(Type.SEMICOLON, "Expected semicolon after statement")
+        return ast.ExpressionStatement(expr)
+
+    def print_statement(self):
+        exprs = [(yield self.expression())]
+
+        while self.match_any(Type.COMMA):
+            exprs = exprs + [(yield self.expression())]
+
+        self.consume(Type.SEMICOLON, "Expected semicolon after statement")
+        return ast.PrintStatement(exprs)
+
+    def if_statement(self):
+        self.consume(Type.LEFT_PAREN, "Expected left parenthesis on IF statement")
+        test = yield self.expression()
+        self.consume(Type.RIGHT_PAREN, "Expected right parenthesis on IF statement")
+        then = yield self.statement()
+        neht = (yield self.statement()) if self.match_any(Type.ELSE) else None
+        return ast.IfStatement(test, then, neht)
+
+    def while_statement(self):
+        token = self.previous()
+        self.consume(Type.LEFT_PAREN, "Expected left parenthesis on IF statement")
+        test = yield self.expression()
+        self.consume(Type.RIGHT_PAREN, "Expected right parenthesis on IF statement")
+        body = yield self.statement()
+        return ast.WhileStatement(token, test, body)
+
+    def for_statement(self):
+        token = self.previous()
+        self.consume(Type.LEFT_PAREN, "Expected left parenthesis on FOR statement")
+
+        initializer = None
+        if self.match_any(Type.SEMICOLON):
+            initializer = None
+        elif self.match_any(Type.VAR):
+            initializer = yield self.variable_declaration()
+        else:
+            initializer = yield self.expression_statement()
+
+        condition = None
+        if not self.matches(Type.SEMICOLON):
+            condition = yield self.expression()
+        self.consume(Type.SEMICOLON, "Expected semicolon after loop condition")
+
+        increment = None
+        if not self.matches(Type.RIGHT_PAREN):
+            increment = ast.ExpressionStatement((yield self.expression()))
+        self.consume(Type.RIGHT_PAREN, "Expected right parenthesis on FOR statement")
+
+        body = yield self.statement()
+
+        statements = []
+        while_body = []
+
+        if len(body.statements) > 0:
+            while_body.append(body)
+
+        if initializer:
+            statements.append(initializer)
+
+        if increment:
+            while_body.append(increment)
+
+        test = condition if condition is not None else ast.LiteralExpression(True)
+        statements.append(ast.WhileStatement(token, test, ast.Block(while_body)))
+
+        return ast.Block(statements)
+
+    def expression(self):
+        if self.match_any(Type.FUN):
+            return (yield self.function_expression())
+
+        if self.match_any(Type.BACKSLASH):
+            return (yield self.lambda_expression())
+
+        left = yield self.binary(TERNARY)
+
+        if self.match_any(Type.EQUAL):
+            token = self.previous()
+            right = yield self.expression()
+
+            if isinstance(left, ast.VariableExpression):
+                return ast.AssignmentExpression(left.variable, token, right)
+
+            if isinstance(left, ast.GetExpression):
+                return ast.SetExpression(left.object, left.name, right)
+
+            raise self.error(token, "Invalid assignment target")
+
+        return left
+
+    def function_expression(self):
+        self.consume(Type.LEFT_PAREN, "Expected ( after function name")
+        parameters = self.parameters()
+        self.consume(Type.RIGHT_PAREN, "Expected ) after function name")
+
+        self.consume(Type.LEFT_BRACE, "Expected { before function body")
+
+        body = yield self.block()
+
+        return ast.FunctionExpression(parameters, body)
+
+    def lambda_expression(self):
+        parameters = self.parameters(end_mark=Type.ARROW)
+
+        arrow = self.consume(Type.ARROW, "Expected arrow after lambda parameters")
+
+        expr = yield self.expression()
+
+        return ast.LambdaExpression(parameters, arrow, expr)
+
+    def binary(self, power):
+        if self.match_any(Type.BANG, Type.MINUS):
+            operator = self.previous()
+            expr = ast.UnaryExpression(operator, (yield self.binary(UNARY)))
+        elif self.match_any(Type.LEFT_PAREN):
+            expr = yield self.expression()
+            self.consume(Type.RIGHT_PAREN, "Expected ')' after expression")
+            expr = ast.GroupingExpression(expr)
+        else:
+            expr = self.primary()
+
+        while True:
+            infix = INFIX.get(self.peek_type())
+
+            if infix is None or infix < power:
+                return expr
+
+            operator = self.advance()
+
+            if infix == CALL:
+                if operator.type == Type.LEFT_PAREN:
+                    expr = yield self.finish_call(expr)
+                else:
+                    name = self.consume(
+                        Type.IDENTIFIER, "Expected property name after '.'"
+                    )
+                    expr = ast.GetExpression(expr, name)
+            elif infix == TERNARY:
+                then = yield self.binary(OR)
+                self.consume(Type.COLON, "Expected colon in ternary")
+                nhet = yield self.binary(TERNARY)
+                expr = ast.TernaryExpression(expr, operator, then, nhet)
+            elif infix <= AND:
+                right = yield self.binary(infix + 1)
+                expr = ast.LogicalExpression(expr, operator, right)
+            else:
+                right = yield self.binary(infix + 1)
+                expr = ast.BinaryExpression(expr, operator, right)
+
+    def finish_call(self, callee):
+        arguments = []
+
+        if not self.matches(Type.RIGHT_PAREN):
+            arguments.append((yield self.expression()))
+
+            while self.match_any(Type.COMMA):
+                if len(arguments) >= 255:
+                    self.error(self.peek(), "Maximum argument count of 255 exceeded")
+
+                arguments.append((yield self.expression()))
+
+        self.consume(Type.RIGHT_PAREN, "Expected closing parenthesis")
+        token = self.previous()
+
+        return ast.CallExpression(callee, token, arguments)
+
+
+class BufferStackParser(StackParser, BufferParser):
+    """Stack parser over a TokenBuffer"""
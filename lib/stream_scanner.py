@@ -0,0 +1,85 @@
+import codecs
+from lib.token import Token, Type
+from lib.error import CompileErrors
+from lib.regex_scanner import RegexScanner
+from lib.source import StreamSource
+
+
+class StreamScanner(RegexScanner):
+    """Scans a file object or an mmap chunk by chunk, yielding tokens lazily"""
+
+    def __init__(self, file, chunk_size=1 << 16):
+        super().__init__(None)
+        self.positions = StreamSource()
+        self.file = file
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+
+    def scan(self):
+        return TokenStream(self.stream())
+
+    def stream(self):
+        tokens = self.chunks()
+
+        for token in tokens:
+            if self.errors:
+                # the parser must not see tokens past a bad character, yet the
+                # errors after it are reported too, as the other scanners do
+                for _ in tokens:
+                    pass
+
+                raise CompileErrors(self.errors)
+
+            yield token
+
+    def chunks(self):
+        buffer = ""
+
+        while True:
+            chunk, final = self.read()
+            self.positions.feed(chunk, self.base + len(buffer))
+
+            self.base += self.position
+            buffer = buffer[self.position :] + chunk
+
+            yield from self.tokenize(buffer, final)
+
+            if final:
+                break
+
+        yield Token(Type.EOF, "", None, None, self.base + len(buffer), self.positions)
+
+    def read(self):
+        chunk = self.file.read(self.chunk_size)
+
+        if isinstance(chunk, str):
+            return chunk, not chunk
+
+        return self.decoder.decode(chunk, final=not chunk), not chunk
+
+
+class TokenStream:
+    """Sequence over a token iterator, keeping only the tokens the parser can still look at"""
+
+    def __init__(self, iterator):
+        self.iterator = iterator
+        self.window = []
+        self.offset = 0
+
+    def __getitem__(self, index):
+        if index < self.offset:
+            raise IndexError("token #%d was already discarded" % index)
+
+        while index >= self.offset + len(self.window):
+            try:
+                self.window.append(next(self.iterator))
+            except StopIteration:
+                raise IndexError("token #%d is past the end of stream" % index)
+
+        # the parser only ever looks at the current and the previous token
+        discard = index - 1 - self.offset
+        if discard > 0:
+            del self.window[:discard]
+            self.offset += discard
+
+        return self.window[index - self.offset]
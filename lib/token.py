@@ -1,21 +1,51 @@
-from enum import Enum, auto
+from enum import IntEnum, auto
 
 
 class Token:
-    def __init__(self, type, lexeme, literal, line):
+    __slots__ = ("type", "lexeme", "literal", "offset", "source", "fixed_line")
+
+    def __init__(self, type, lexeme, literal, line=None, offset=None, source=None):
         self.type = type
         self.lexeme = lexeme
         self.literal = literal
-        self.line = line
+        self.offset = offset
+        self.source = source
+        self.fixed_line = line
+
+    @property
+    def line(self):
+        if self.fixed_line is not None or self.source is None:
+            return self.fixed_line
+
+        return self.source.line(self.offset)
+
+    @property
+    def column(self):
+        if self.source is None:
+            return None
+
+        return self.source.position(self.offset)[1]
+
+    def fields(self):
+        return {
+            "type": self.type,
+            "lexeme": self.lexeme,
+            "literal": self.literal,
+            "line": self.line,
+        }
 
     def __repr__(self):
-        return "Token(%s)" % vars(self)
+        return "Token(%s)" % self.fields()
 
     def __eq__(self, other):
-        return isinstance(self, type(other)) and vars(self) == vars(other)
+        return isinstance(self, type(other)) and self.fields() == other.fields()
 
+    def __reduce__(self):
+        args = (self.type, self.lexeme, self.literal, self.fixed_line, self.offset)
+        return Token, args + (self.source,)
 
-class Type(Enum):
+
+class Type(IntEnum):
     # Single - character tokens
     LEFT_PAREN = auto()
     RIGHT_PAREN = auto()
@@ -70,6 +100,10 @@ class Type(Enum):
     def __repr__(self):
         return "TokenType.%s" % self.name
 
+    def __str__(self):
+        # an IntEnum reads as its number from 3.11 on, messages name the type
+        return "Type.%s" % self.name
+
 
 def identifier(name, line=1):
     return Token(Type.IDENTIFIER, name, name, line)
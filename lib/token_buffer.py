@@ -0,0 +1,136 @@
+from array import array
+from lib.token import Token, Type
+from lib.error import CompileErrors
+from lib.scanner import KEYWORDS
+from lib.regex_scanner import RegexScanner, PATTERN, OPERATORS
+
+TYPES = {int(type): type for type in Type}
+
+
+def literal(type, lexeme):
+    if type == Type.IDENTIFIER:
+        return lexeme
+
+    if type == Type.STRING:
+        return lexeme[1:-1]
+
+    if type == Type.NUMBER:
+        return float(lexeme) if "." in lexeme else int(lexeme)
+
+    return None
+
+
+class TokenBuffer:
+    """Token stream stored as parallel arrays, with every distinct lexeme kept once"""
+
+    def __init__(self, positions=None):
+        self.positions = positions
+        self.types = array("B")
+        self.starts = array("I")
+        self.ends = array("I")
+        self.ids = array("I")
+        self.lexemes = []
+        self.literals = []
+        self.interned = {}
+
+    def append(self, type, lexeme, start, end):
+        id = self.interned.get(lexeme)
+
+        if id is None:
+            id = self.interned[lexeme] = len(self.lexemes)
+            self.lexemes.append(lexeme)
+            self.literals.append(literal(type, lexeme))
+
+        self.types.append(type)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.ids.append(id)
+
+    def extend(self, other):
+        ids = []
+
+        for lexeme, value in zip(other.lexemes, other.literals):
+            id = self.interned.get(lexeme)
+
+            if id is None:
+                id = self.interned[lexeme] = len(self.lexemes)
+                self.lexemes.append(lexeme)
+                self.literals.append(value)
+
+            ids.append(id)
+
+        self.types.extend(other.types)
+        self.starts.extend(other.starts)
+        self.ends.extend(other.ends)
+        self.ids.extend(map(ids.__getitem__, other.ids))
+
+    def __len__(self):
+        return len(self.types)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        id = self.ids[index]
+
+        return Token(
+            TYPES[self.types[index]],
+            self.lexemes[id],
+            self.literals[id],
+            None,
+            self.starts[index],
+            self.positions,
+        )
+
+    @staticmethod
+    def from_tokens(tokens):
+        buffer = TokenBuffer(tokens[0].source)
+
+        for token in tokens:
+            end = token.offset + len(token.lexeme)
+            buffer.append(token.type, token.lexeme, token.offset, end)
+
+        return buffer
+
+
+class BufferScanner(RegexScanner):
+    """Scans straight into a TokenBuffer, without creating a Token per lexeme"""
+
+    def scan(self):
+        buffer = TokenBuffer(self.positions)
+
+        self.fill(buffer, self.source)
+        buffer.append(Type.EOF, "", len(self.source), len(self.source))
+
+        if self.errors:
+            raise CompileErrors(self.errors)
+
+        return buffer
+
+    def fill(self, buffer, source, base=0):
+        append = buffer.append
+        self.unterminated = None
+
+        for match in PATTERN.finditer(source):
+            kind = match.lastgroup
+
+            if kind == "space":
+                continue
+
+            lexeme = match.group()
+            start, end = base + match.start(), base + match.end()
+
+            if kind == "identifier":
+                append(KEYWORDS.get(lexeme, Type.IDENTIFIER), lexeme, start, end)
+            elif kind == "operator":
+                append(OPERATORS[lexeme], lexeme, start, end)
+            elif kind == "number":
+                append(Type.NUMBER, lexeme, start, end)
+            elif kind == "string":
+                append(Type.STRING, lexeme, start, end)
+            elif kind == "unterminated":
+                self.unterminated = start
+                self.error("Unterminated string", base + len(source))
+                break
+            else:
+                self.error("Unrecognized character [%s]" % lexeme, start)
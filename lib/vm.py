@@ -0,0 +1,561 @@
+from lib.compiler import (
+    Compiler,
+    GET_LOCAL,
+    CONSTANT,
+    GET_GLOBAL,
+    GET_UPVALUE,
+    CALL,
+    RETURN,
+    ADD,
+    SUBTRACT,
+    LESS,
+    LESS_EQUAL,
+    GREATER,
+    GREATER_EQUAL,
+    EQUAL,
+    NOT_EQUAL,
+    MULTIPLY,
+    DIVIDE,
+    TEST_JUMP,
+    LOOP_IF_TRUE,
+    JUMP,
+    POP,
+    ASSERT_CALLABLE,
+    SET_LOCAL,
+    SET_GLOBAL,
+    SET_UPVALUE,
+    GET_LOCAL_AT,
+    SET_LOCAL_AT,
+    DEFINE_LOCAL,
+    DEFINE_CELL,
+    DEFINE_GLOBAL,
+    NEW_CELL,
+    OR_JUMP,
+    AND_JUMP,
+    ASSERT_BOOL,
+    NEGATE,
+    NOT,
+    GET_PROPERTY,
+    ASSERT_INSTANCE,
+    SET_PROPERTY,
+    GET_SUPER,
+    CLOSURE,
+    ENTER_BLOCK,
+    LEAVE_BLOCK,
+    PRINT,
+    INHERIT,
+    CLASS,
+)
+from lib.resolver import UPVALUE
+from lib.stringify import stringify
+from lib.error import (
+    RuntimeError,
+    UndefinedVariableError,
+    UninitializedVariableError,
+)
+from lib.environment import Frame, Cell, EMPTY, take_frame, release_frame
+from lib.klass import Klass, Instance
+from lib.function import Function, Callable
+from lib.interpreter import Interpreter, Assert, BINARY as OPERATORS
+
+BOOL = [bool]
+NUMBERS = [int, float]
+NUMBERS_AND_STRINGS = (int, float, str)
+
+
+class BytecodeFunction(Function):
+    def __init__(self, declaration, upvalues, isInitializer, prototype):
+        Function.__init__(self, declaration, upvalues, isInitializer)
+        self.prototype = prototype
+
+    def call(self, interpreter, arguments):
+        return interpreter.call_function(self, arguments)
+
+    def bind(self, this):
+        upvalues = list(self.upvalues)
+        upvalues[0] = Cell(this)
+
+        return BytecodeFunction(
+            self.declaration, upvalues, self.isInitializer, self.prototype
+        )
+
+
+class BytecodeAnonymousFunction(BytecodeFunction):
+    def name(self):
+        return "anonymous"
+
+
+# functions whose calls the VM runs in its own loop, rather than by call()
+FUNCTIONS = (BytecodeFunction, BytecodeAnonymousFunction)
+
+
+def binary_error(code, ip, left, right, op):
+    token = code.tokens[ip]
+    Assert.operand_types(left, right, OPERATORS[token.type][1], token)
+
+
+class VM(Interpreter):
+    """Stack machine which runs the bytecode the compiler lowers resolved programs to
+
+    Every call of a function runs in the loop of the call which started the
+    VM, with the caller's state kept on a list, so calls nest no deeper in
+    Python than they do in the program. The values of variables are kept in
+    the frames and cells the tree-walker keeps them in, at the same slots.
+    """
+
+    def __init__(self):
+        Interpreter.__init__(self)
+        self.compiler = Compiler()
+
+    def interpret(self, ast, bindings=None):
+        for node, depth in (bindings or {}).items():
+            node.depth = depth
+
+        self.run(self.compiler.compile(ast), self.env, None)
+
+        return self
+
+    def evaluate(self, expr):
+        return self.run(self.compiler.compile_expression(expr), self.env, None)
+
+    def call_function(self, function, arguments):
+        """Runs a call of `function` which did not start in the VM, of a class say"""
+        prototype = function.prototype
+        code = prototype.code or prototype.compile()
+        block = prototype.block
+
+        env = take_frame(block, None, function.upvalues)
+        values = env.values
+        values[: len(arguments)] = arguments
+
+        for slot in block.cells:
+            values[slot] = Cell(values[slot])
+
+        return self.run(code, env, block)
+
+    def run(self, code, env, block):
+        """Runs `code` in the frame `env` of `block` until it returns, and returns what it returns"""
+        ops, constants = code.ops, code.constants
+        values, stack, ip = env.values, [], 0
+        globals = self.globals
+        indices, variables = globals.indices, globals.values
+        # what callers were running, as (code, ip, env, block, stack)
+        frames = []
+
+        while True:
+            op = ops[ip]
+
+            if op == GET_LOCAL:
+                value = values[ops[ip + 1]]
+
+                if value.__class__ is Cell:
+                    value = value.value
+
+                if value is EMPTY:
+                    raise UninitializedVariableError(code.tokens[ip])
+
+                stack.append(value)
+                ip += 2
+
+            elif op == CONSTANT:
+                stack.append(constants[ops[ip + 1]])
+                ip += 2
+
+            elif op == GET_GLOBAL:
+                index = indices.get(constants[ops[ip + 1]])
+
+                if index is None:
+                    raise UndefinedVariableError(code.tokens[ip])
+
+                value = variables[index]
+
+                if value is EMPTY:
+                    raise UninitializedVariableError(code.tokens[ip])
+
+                stack.append(value)
+                ip += 2
+
+            elif op == GET_UPVALUE:
+                value = env.upvalues[ops[ip + 1]].value
+
+                if value is EMPTY:
+                    raise UninitializedVariableError(code.tokens[ip])
+
+                stack.append(value)
+                ip += 2
+
+            elif op == CALL:
+                count = ops[ip + 1]
+                callee = stack[-1 - count]
+
+                if callee.__class__ in FUNCTIONS:
+                    prototype = callee.prototype
+
+                    if count != prototype.arity:
+                        raise RuntimeError(
+                            code.tokens[ip],
+                            "Expected %s arguments but got %s" % (prototype.arity, count),
+                        )
+
+                    arguments = stack[len(stack) - count :]
+                    del stack[-1 - count :]
+                    frames.append((code, ip + 2, env, block, stack))
+
+                    code = prototype.code or prototype.compile()
+                    block = prototype.block
+                    ops, constants = code.ops, code.constants
+
+                    # the parameters take the first slots of the frame
+                    env = take_frame(block, None, callee.upvalues)
+                    values = env.values
+                    values[:count] = arguments
+
+                    for slot in block.cells:
+                        values[slot] = Cell(values[slot])
+
+                    stack, ip = [], 0
+                    continue
+
+                arguments = stack[len(stack) - count :]
+                del stack[-1 - count :]
+
+                if count != callee.arity():
+                    raise RuntimeError(
+                        code.tokens[ip],
+                        "Expected %s arguments but got %s" % (callee.arity(), count),
+                    )
+
+                stack.append(callee.call(self, arguments))
+                ip += 2
+
+            elif op == ASSERT_CALLABLE:
+                callee = stack[-1]
+
+                if callee.__class__ not in FUNCTIONS and not isinstance(callee, Callable):
+                    raise RuntimeError(code.tokens[ip], "Can only call functions or classes")
+
+                ip += 1
+
+            elif op == RETURN:
+                value = stack.pop()
+
+                if block is not None:
+                    release_frame(block, env)
+
+                if not frames:
+                    return value
+
+                code, ip, env, block, stack = frames.pop()
+                ops, constants, values = code.ops, code.constants, env.values
+                stack.append(value)
+
+            elif op == TEST_JUMP:
+                value = stack.pop()
+
+                if value is True:
+                    ip += 2
+                elif value is False:
+                    ip = ops[ip + 1]
+                else:
+                    Assert.operand_type(value, BOOL, code.tokens.get(ip))
+
+            elif op == ADD:
+                right = stack.pop()
+                left = stack[-1]
+
+                if left.__class__ is not right.__class__ or left.__class__ not in NUMBERS_AND_STRINGS:
+                    binary_error(code, ip, left, right, op)
+
+                stack[-1] = left + right
+                ip += 1
+
+            elif op == SUBTRACT:
+                right = stack.pop()
+                left = stack[-1]
+
+                if left.__class__ is not right.__class__ or left.__class__ not in NUMBERS_AND_STRINGS:
+                    binary_error(code, ip, left, right, op)
+
+                if left.__class__ is str:
+                    stack[-1] = left.replace(right, "")
+                else:
+                    stack[-1] = left - right
+
+                ip += 1
+
+            elif op == LESS:
+                right = stack.pop()
+                left = stack[-1]
+
+                if left.__class__ is not right.__class__ or (
+                    left.__class__ is not int and left.__class__ is not float
+                ):
+                    binary_error(code, ip, left, right, op)
+
+                stack[-1] = left < right
+                ip += 1
+
+            elif op == LESS_EQUAL:
+                right = stack.pop()
+                left = stack[-1]
+
+                if left.__class__ is not right.__class__ or (
+                    left.__class__ is not int and left.__class__ is not float
+                ):
+                    binary_error(code, ip, left, right, op)
+
+                stack[-1] = left <= right
+                ip += 1
+
+            elif op == GREATER:
+                right = stack.pop()
+                left = stack[-1]
+
+                if left.__class__ is not right.__class__ or (
+                    left.__class__ is not int and left.__class__ is not float
+                ):
+                    binary_error(code, ip, left, right, op)
+
+                stack[-1] = left > right
+                ip += 1
+
+            elif op == GREATER_EQUAL:
+                right = stack.pop()
+                left = stack[-1]
+
+                if left.__class__ is not right.__class__ or (
+                    left.__class__ is not int and left.__class__ is not float
+                ):
+                    binary_error(code, ip, left, right, op)
+
+                stack[-1] = left >= right
+                ip += 1
+
+            elif op == EQUAL:
+                right = stack.pop()
+                stack[-1] = stack[-1] == right
+                ip += 1
+
+            elif op == NOT_EQUAL:
+                right = stack.pop()
+                stack[-1] = stack[-1] != right
+                ip += 1
+
+            elif op == MULTIPLY:
+                right = stack.pop()
+                left = stack[-1]
+
+                if left.__class__ is not right.__class__ or (
+                    left.__class__ is not int and left.__class__ is not float
+                ):
+                    binary_error(code, ip, left, right, op)
+
+                stack[-1] = left * right
+                ip += 1
+
+            elif op == DIVIDE:
+                right = stack.pop()
+                left = stack[-1]
+
+                if left.__class__ is not right.__class__ or (
+                    left.__class__ is not int and left.__class__ is not float
+                ):
+                    binary_error(code, ip, left, right, op)
+
+                stack[-1] = left / right
+                ip += 1
+
+            elif op == POP:
+                stack.pop()
+                ip += 1
+
+            elif op == JUMP:
+                ip = ops[ip + 1]
+
+            elif op == LOOP_IF_TRUE:
+                if stack.pop():
+                    ip = ops[ip + 1]
+                else:
+                    ip += 2
+
+            elif op == SET_LOCAL:
+                slot = ops[ip + 1]
+
+                if values[slot].__class__ is Cell:
+                    values[slot].value = stack[-1]
+                else:
+                    values[slot] = stack[-1]
+
+                ip += 2
+
+            elif op == SET_GLOBAL:
+                index = indices.get(constants[ops[ip + 1]])
+
+                if index is None:
+                    raise UndefinedVariableError(code.tokens[ip])
+
+                variables[index] = stack[-1]
+                ip += 2
+
+            elif op == SET_UPVALUE:
+                env.upvalues[ops[ip + 1]].value = stack[-1]
+                ip += 2
+
+            elif op == GET_LOCAL_AT:
+                stack.append(env.get_at(ops[ip + 1], ops[ip + 2], code.tokens[ip]))
+                ip += 3
+
+            elif op == SET_LOCAL_AT:
+                env.assign_at(ops[ip + 1], ops[ip + 2], stack[-1])
+                ip += 3
+
+            elif op == DEFINE_LOCAL:
+                values[ops[ip + 1]] = stack.pop()
+                ip += 2
+
+            elif op == DEFINE_CELL:
+                values[ops[ip + 1]].value = stack.pop()
+                ip += 2
+
+            elif op == DEFINE_GLOBAL:
+                globals.define(constants[ops[ip + 1]], stack.pop())
+                ip += 2
+
+            elif op == NEW_CELL:
+                values[ops[ip + 1]] = Cell(EMPTY)
+                ip += 2
+
+            elif op == OR_JUMP or op == AND_JUMP:
+                value = stack[-1]
+                Assert.operand_type(value, BOOL, code.tokens[ip])
+
+                # `or` stops at true, `and` at false, which is what it returns
+                if value is (op == OR_JUMP):
+                    ip = ops[ip + 1]
+                else:
+                    stack.pop()
+                    ip += 2
+
+            elif op == ASSERT_BOOL:
+                Assert.operand_type(stack[-1], BOOL, code.tokens[ip])
+                ip += 1
+
+            elif op == NEGATE:
+                value = stack[-1]
+                Assert.operand_type(value, NUMBERS, code.tokens[ip])
+                stack[-1] = -value
+                ip += 1
+
+            elif op == NOT:
+                value = stack[-1]
+                Assert.operand_type(value, BOOL, code.tokens[ip])
+                stack[-1] = not value
+                ip += 1
+
+            elif op == GET_PROPERTY:
+                object = stack[-1]
+
+                if not isinstance(object, Instance):
+                    raise RuntimeError(code.tokens[ip], "Only instances have properties")
+
+                stack[-1] = object.get(constants[ops[ip + 1]])
+                ip += 2
+
+            elif op == ASSERT_INSTANCE:
+                if not isinstance(stack[-1], Instance):
+                    raise RuntimeError(code.tokens[ip], "Only instances have properties")
+
+                ip += 1
+
+            elif op == SET_PROPERTY:
+                value = stack.pop()
+                # what the tree-walker evaluates a set expression to
+                stack[-1] = stack[-1].set(constants[ops[ip + 1]], value)
+                ip += 2
+
+            elif op == GET_SUPER:
+                upvalues = env.upvalues
+                superclass = upvalues[ops[ip + 1]].value
+                object = upvalues[ops[ip + 2]].value
+                method = constants[ops[ip + 3]]
+
+                found = superclass.find_method(method.lexeme)
+
+                if found == None:
+                    raise RuntimeError(method, "Undefined method '%s'" % method.lexeme)
+
+                stack.append(found.bind(object))
+                ip += 4
+
+            elif op == CLOSURE:
+                prototype = constants[ops[ip + 1]]
+                stack.append(self.closure(prototype, env))
+                ip += 2
+
+            elif op == ENTER_BLOCK:
+                env = take_frame(constants[ops[ip + 1]], env, env.upvalues)
+                values = env.values
+                ip += 2
+
+            elif op == LEAVE_BLOCK:
+                release_frame(constants[ops[ip + 1]], env)
+                env = env.parent
+                values = env.values
+                ip += 2
+
+            elif op == PRINT:
+                count = ops[ip + 1]
+                printed = stack[len(stack) - count :]
+                del stack[len(stack) - count :]
+                self.printer.print(*[stringify(value) for value in printed])
+                ip += 2
+
+            elif op == INHERIT:
+                superclass = stack[-1]
+
+                if not isinstance(superclass, Klass):
+                    raise RuntimeError(code.tokens[ip], "Superclass must be a class")
+
+                # the scope of `super`, which every method captures
+                env = Frame(env, [Cell(superclass)], env.upvalues)
+                values = env.values
+                ip += 1
+
+            elif op == CLASS:
+                name, count, inherits = constants[ops[ip + 1]], ops[ip + 2], ops[ip + 3]
+                methods = stack[len(stack) - count :]
+                del stack[len(stack) - count :]
+                superclass = None
+
+                if inherits:
+                    superclass = stack.pop()
+                    env = env.parent
+                    values = env.values
+
+                methods = {method.declaration.name.lexeme: method for method in methods}
+                stack.append(Klass(name, superclass, methods))
+                ip += 4
+
+            else:
+                raise ValueError("[vm] Unsupported opcode [%s]" % op)
+
+    def closure(self, prototype, env):
+        cells = []
+
+        for upvalue in prototype.upvalues:
+            if upvalue is None:
+                # the instance, once a method is bound to one
+                cells.append(None)
+            elif upvalue[0] == UPVALUE:
+                cells.append(env.upvalues[upvalue[1]])
+            else:
+                cells.append(env.cell_at(*upvalue))
+
+        if prototype.name is None:
+            return BytecodeAnonymousFunction(
+                prototype.declaration, cells, prototype.isInitializer, prototype
+            )
+
+        return BytecodeFunction(
+            prototype.declaration, cells, prototype.isInitializer, prototype
+        )
@@ -1,5 +1,6 @@
 import sys
 import os
+import glob
 import unittest
 
 path = os.path.dirname(__file__)
@@ -8,6 +9,18 @@ path = os.path.join(path, "../lib")
 if path not in sys.path:
     sys.path.append(path)
 
+stubs = os.path.join(os.path.dirname(__file__), "../stubs")
+
+
+def read_stubs():
+    sources = {}
+
+    for name in sorted(glob.glob(os.path.join(stubs, "*.lox"))):
+        with open(name) as file:
+            sources[os.path.basename(name)] = file.read()
+
+    return sources
+
 
 class TestCase(unittest.TestCase):
     maxDiff = None
@@ -0,0 +1,156 @@
+import os
+import tempfile
+from test import TestCase, read_stubs
+from lib import ast, cache
+from lib.parser import Parser
+from lib.lazy import LazyParser
+from lib.scanner import Scanner
+from lib.resolver import Resolver
+from lib.interpreter import Interpreter
+from lib.io import FakePrinter
+from lib.error import RuntimeError
+
+CODE = """
+var a = 1;
+fun add(x) { return a + x; }
+fun unused() { print "never"; }
+class Counter {
+    init() { this.count = 0; }
+    increment() { this.count = this.count + 1; return this; }
+}
+{
+    var b = add(2);
+    print b;
+    print Counter().increment().increment().count;
+}
+"""
+
+
+def compile(code, parser=Parser):
+    program = parser(Scanner(code).scan()).parse()
+    return program, Resolver(program).run()
+
+
+def run(program, bindings):
+    Interpreter.printer = FakePrinter
+    return Interpreter().interpret(program, bindings).printer.get()
+
+
+def force(node):
+    """Replaces every cached function body by the block it decodes to"""
+    bindings, stack = {}, [node]
+
+    while stack:
+        item = stack.pop()
+
+        if isinstance(item, list):
+            stack.extend(item)
+        elif isinstance(item, ast.AST):
+            body = getattr(item, "body", None)
+
+            if isinstance(body, cache.CachedBlock):
+                item.body, inner = body.load()
+                bindings.update(inner)
+
+            stack.extend(vars(item).values())
+
+    return bindings
+
+
+class CacheTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "__pycache__", "program.loxc")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_it_names_cache_files_like_pycache(self):
+        self.assertEqual(
+            os.path.join("stubs", "__pycache__", "fib.loxc"),
+            cache.cache_path(os.path.join("stubs", "fib.lox")),
+        )
+
+    def test_it_round_trips_programs(self):
+        for name, code in list(read_stubs().items()) + [("code", CODE)]:
+            program, bindings = compile(code)
+            cache.store(self.path, code, program)
+
+            loaded, loaded_bindings = cache.load(self.path, code)
+            loaded_bindings.update(force(loaded))
+
+            self.assertEqual(program, loaded, name)
+            self.assertEqual(
+                sorted(bindings.values()), sorted(loaded_bindings.values()), name
+            )
+
+    def test_cached_program_runs_like_the_original(self):
+        cache.store(self.path, CODE, compile(CODE)[0])
+
+        self.assertEqual(run(*compile(CODE)), run(*cache.load(self.path, CODE)))
+
+    def test_it_decodes_function_bodies_on_first_call(self):
+        cache.store(self.path, CODE, compile(CODE)[0])
+        program, bindings = cache.load(self.path, CODE)
+        add, unused = program.statements[1].body, program.statements[2].body
+
+        run(program, bindings)
+
+        self.assertIsInstance(add, cache.CachedBlock)
+        self.assertIsNotNone(add.block)
+        self.assertIsNone(unused.block)
+
+    def test_it_stores_lazily_parsed_programs(self):
+        program, bindings = compile(CODE, LazyParser)
+        cache.store(self.path, CODE, program)
+
+        self.assertEqual(run(*compile(CODE)), run(*cache.load(self.path, CODE)))
+
+    def test_it_keeps_token_positions(self):
+        code = "var a = 1;\n\nfun f() {\n  return a - nil;\n}\nprint f();"
+        cache.store(self.path, code, compile(code)[0])
+
+        with self.assertRaises(RuntimeError) as e:
+            run(*cache.load(self.path, code))
+
+        self.assertIn("line 4, column 12", str(e.exception))
+
+    def test_it_misses_when_source_changes(self):
+        cache.store(self.path, CODE, compile(CODE)[0])
+
+        self.assertIsNone(cache.load(self.path, CODE + " "))
+
+    def test_it_misses_on_other_versions_and_corrupt_files(self):
+        cache.store(self.path, CODE, compile(CODE)[0])
+
+        with open(self.path, "rb") as file:
+            data = file.read()
+
+        version = len(cache.MAGIC)
+
+        for corrupt in [
+            data[:version] + bytes([cache.VERSION + 1]) + data[version + 1 :],
+            data[:-20],
+            data[: len(cache.header(CODE))] + b"garbage",
+        ]:
+            with open(self.path, "wb") as file:
+                file.write(corrupt)
+
+            self.assertIsNone(cache.load(self.path, CODE))
+
+        self.assertIsNone(cache.load(self.path + ".missing", CODE))
+
+    def test_it_writes_atomically(self):
+        cache.store(self.path, CODE, compile(CODE)[0])
+
+        self.assertEqual(["program.loxc"], os.listdir(os.path.dirname(self.path)))
+
+    def test_it_gives_up_quietly_when_it_cannot_write(self):
+        path = os.path.join(self.directory.name, "file", "__pycache__", "program.loxc")
+
+        with open(os.path.join(self.directory.name, "file"), "w"):
+            pass
+
+        cache.store(path, CODE, compile(CODE)[0])
+
+        self.assertIsNone(cache.load(path, CODE))
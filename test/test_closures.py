@@ -0,0 +1,112 @@
+from test import TestCase, read_stubs
+from lib.parser import Parser
+from lib.lazy import LazyParser
+from lib.scanner import Scanner
+from lib.resolver import Resolver
+from lib.interpreter import Interpreter
+from lib.closures import ClosureInterpreter, CompiledFunction
+from lib.error import RuntimeError
+from lib.io import FakePrinter
+
+PROGRAMS = [
+    "print 1 + 2 * 3 - 4 / 2; print 'foo' + 'bar'; print 'foobar' - 'o';",
+    "print 1 < 2; print 2 <= 1; print 3 > 2; print 3 >= 4; print 1 == 1; print nil != 1;",
+    "print !true; print -(2); print true ? 1 : 2; print false or true; print true and false;",
+    "var a; a = 1; { var a = 2; print a; a = 3; print a; } print a;",
+    "var i = 0; while (i < 3) { print i; i = i + 1; }",
+    "for (var i = 0; i < 3; i = i + 1) { var j = i * 2; if (j > 2) print j; else print -j; }",
+    "fun f(n) { if (n < 2) return n; return f(n - 1) + f(n - 2); } print f(10);",
+    "fun f() { return; } print f(); fun g() {} print g(); print f;",
+    "fun counter() { var n = 0; return \\ -> n = n + 1; } var c = counter(); c(); print c();",
+    "var add = fun (a, b) { return a + b; }; print add(1, 2); print add;",
+    "class A { init(x) { this.x = x; } get() { return this.x; } } print A(3).get(); print A;",
+    "class A { init() {} } print A(); print A().init();",
+    "class A { f() { return 1; } } class B < A { f() { return super.f() + 1; } } print B().f();",
+    "class A { f() { return \\ -> this; } } var a = A(); print a.f()() == a;",
+    "fun outer() { var x = 1; fun inner() { return x; } x = 2; return inner; } print outer()();",
+    "{ fun f(n) { if (n > 0) return f(n - 1) + 1; return 0; } print f(3); }",
+    "var a = 1; { var b = a; { var c = b; print a + b + c; } }",
+    "class A {} var a = A(); print a.x = 3; print a.x;",
+    "print clock() > 0;",
+    # errors
+    "print -nil;",
+    "print !2;",
+    "print 1 + 'a';",
+    "print true + false;",
+    "print 1 < 'a';",
+    "print 1 and true;",
+    "print 1 ? 2 : 3;",
+    "var a; print a;",
+    "print b;",
+    "b = 1;",
+    "var a = 1; a();",
+    "fun f(a) {} print 1; f();",
+    "fun f(a) {} f(1, 2);",
+    "class A {} print A().x;",
+    "var a = 1; print a.x;",
+    "var a = 1; a.x = 2;",
+    "var a = 1; class B < a {}",
+    "class A {} class B < A { f() { return super.g(); } } B().f();",
+    "var a = 1; var a = 2;",
+    "fun f() { var x; return \\ -> x; } f()();",
+    "while (1) {}",
+]
+
+
+def compile(code, parser=Parser):
+    program = parser(Scanner(code).scan()).parse()
+    Resolver(program).run()
+    return program
+
+
+def run(engine, code, parser=Parser):
+    interpreter = engine()
+
+    try:
+        interpreter.interpret(compile(code, parser))
+    except RuntimeError as error:
+        return interpreter.printer.get(), (error.__class__, error.token, error.message)
+
+    return interpreter.printer.get(), None
+
+
+class ClosureInterpreterTest(TestCase):
+    def setUp(self):
+        Interpreter.printer = FakePrinter
+
+    def test_it_runs_like_the_tree_walker(self):
+        # time.lox sleeps and prints how long it slept
+        stubs = [code for name, code in read_stubs().items() if name != "time.lox"]
+
+        for code in PROGRAMS + stubs:
+            self.assertEqual(
+                run(Interpreter, code), run(ClosureInterpreter, code), code
+            )
+
+    def test_it_runs_lazily_parsed_functions(self):
+        for code in PROGRAMS:
+            self.assertEqual(
+                run(Interpreter, code), run(ClosureInterpreter, code, LazyParser), code
+            )
+
+    def test_it_keeps_state_across_interpretations(self):
+        interpreter = ClosureInterpreter()
+        interpreter.interpret(compile("var a = 1; fun f(x) { return x + a; }"))
+        interpreter.interpret(compile("a = 2; print f(3);"))
+
+        self.assertEqual(["5"], interpreter.printer.get())
+        self.assertEqual(5, interpreter.evaluate(Parser.parse_expr("f(3)")))
+
+    def test_functions_compile_their_bodies_once(self):
+        interpreter = ClosureInterpreter.from_code(
+            "fun f(n) { return n; } fun g() { return 1; } f(1); f(2);"
+        )
+        f = interpreter.evaluate(Parser.parse_expr("f"))
+        g = interpreter.evaluate(Parser.parse_expr("g"))
+        code = f.routine.code
+
+        interpreter.evaluate(Parser.parse_expr("f(3)"))
+
+        self.assertIsInstance(f, CompiledFunction)
+        self.assertIs(code, f.routine.code)
+        self.assertIsNone(g.routine.code)
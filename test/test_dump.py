@@ -0,0 +1,191 @@
+import io
+import json
+from test import TestCase, read_stubs
+from lib import dump
+from lib.parser import Parser
+from lib.lazy import LazyParser
+from lib.scanner import Scanner
+from lib.stream_scanner import StreamScanner
+from lib.token_buffer import BufferScanner
+from lib.stack_parser import StackParser
+
+
+def output(fn, value):
+    out = io.StringIO()
+    fn(value, out)
+    return out.getvalue()
+
+
+def tokens(code):
+    return [
+        json.loads(line)
+        for line in output(dump.dump_tokens, Scanner(code).scan()).splitlines()
+    ]
+
+
+class DumpTokensTest(TestCase):
+    def test_it_writes_a_json_object_per_line(self):
+        self.assertEqual(
+            [
+                {
+                    "type": "VAR",
+                    "lexeme": "var",
+                    "literal": None,
+                    "line": 1,
+                    "column": 1,
+                },
+                {
+                    "type": "IDENTIFIER",
+                    "lexeme": "a",
+                    "literal": "a",
+                    "line": 1,
+                    "column": 5,
+                },
+                {
+                    "type": "EQUAL",
+                    "lexeme": "=",
+                    "literal": None,
+                    "line": 1,
+                    "column": 7,
+                },
+                {
+                    "type": "STRING",
+                    "lexeme": '"x\\ty"',
+                    "literal": "x\\ty",
+                    "line": 1,
+                    "column": 9,
+                },
+                {
+                    "type": "SEMICOLON",
+                    "lexeme": ";",
+                    "literal": None,
+                    "line": 1,
+                    "column": 15,
+                },
+                {
+                    "type": "NUMBER",
+                    "lexeme": "1.5",
+                    "literal": 1.5,
+                    "line": 2,
+                    "column": 3,
+                },
+                {
+                    "type": "TRUE",
+                    "lexeme": "true",
+                    "literal": None,
+                    "line": 3,
+                    "column": 1,
+                },
+                {"type": "EOF", "lexeme": "", "literal": None, "line": 3, "column": 5},
+            ],
+            tokens('var a = "x\\ty";\n  1.5\ntrue'),
+        )
+
+    def test_positions_match_the_tokens(self):
+        for name, code in read_stubs().items():
+            self.assertEqual(
+                [(t.line, t.column) for t in Scanner(code).scan()],
+                [(t["line"], t["column"]) for t in tokens(code)],
+                name,
+            )
+
+    def test_buffers_and_streams_dump_like_lists(self):
+        for name, code in read_stubs().items():
+            expected = output(dump.dump_tokens, Scanner(code).scan())
+
+            self.assertEqual(
+                expected, output(dump.dump_tokens, BufferScanner(code).scan()), name
+            )
+            self.assertEqual(
+                expected,
+                output(
+                    dump.dump_tokens, StreamScanner(io.BytesIO(code.encode())).scan()
+                ),
+                name,
+            )
+
+    def test_it_writes_in_chunks(self):
+        writes = []
+
+        class Out:
+            def write(self, part):
+                writes.append(part)
+
+        dump.dump_tokens(Scanner("print 1;" * 5000).scan(), Out())
+
+        self.assertLess(1, len(writes))
+        self.assertEqual(15001, "".join(writes).count("\n"))
+
+
+class DumpAstTest(TestCase):
+    def test_it_writes_one_node_per_line(self):
+        program = Parser(Scanner("var a = -1;\nprint a + 2, f(a);").scan()).parse()
+
+        self.assertEqual(
+            "\n".join(
+                [
+                    "Program",
+                    "  statements[0]: VariableDeclaration identifier='a'@1:5",
+                    "    initializer: UnaryExpression operator='-'@1:9",
+                    "      right: LiteralExpression value=1",
+                    "  statements[1]: PrintStatement",
+                    "    expressions[0]: BinaryExpression operator='+'@2:9",
+                    "      left: VariableExpression variable='a'@2:7",
+                    "      right: LiteralExpression value=2",
+                    "    expressions[1]: CallExpression token=')'@2:17",
+                    "      callee: VariableExpression variable='f'@2:14",
+                    "      arguments[0]: VariableExpression variable='a'@2:16",
+                    "",
+                ]
+            ),
+            output(dump.dump_ast, program),
+        )
+
+    def test_json_round_trips_every_stub(self):
+        for name, code in read_stubs().items():
+            document = json.loads(
+                output(dump.dump_ast_json, Parser(Scanner(code).scan()).parse())
+            )
+
+            self.assertEqual("Program", document["node"], name)
+
+    def test_json_nests_nodes_and_tokens(self):
+        program = Parser(Scanner('print "a", nil;').scan()).parse()
+
+        self.assertEqual(
+            {
+                "node": "Program",
+                "statements": [
+                    {
+                        "node": "PrintStatement",
+                        "expressions": [
+                            {"node": "LiteralExpression", "value": "a"},
+                            {"node": "LiteralExpression", "value": None},
+                        ],
+                    }
+                ],
+            },
+            json.loads(output(dump.dump_ast_json, program)),
+        )
+
+    def test_lazy_bodies_are_not_expanded(self):
+        program = LazyParser(Scanner("fun f() { print 1; }").scan()).parse()
+
+        self.assertEqual(
+            "Program\n"
+            "  statements[0]: FunctionDeclaration name='f'@1:5 parameters=[]\n"
+            "    body: TokenBlock\n",
+            output(dump.dump_ast, program),
+        )
+        self.assertEqual(
+            {"node": "TokenBlock"},
+            json.loads(output(dump.dump_ast_json, program))["statements"][0]["body"],
+        )
+
+    def test_deep_trees_do_not_recurse(self):
+        program = StackParser(
+            Scanner("print %s1%s;" % ("(" * 5000, ")" * 5000)).scan()
+        ).parse()
+
+        self.assertEqual(5003, output(dump.dump_ast, program).count("\n"))
+        self.assertEqual(5003, output(dump.dump_ast_json, program).count('{"node":'))
@@ -1,6 +1,7 @@
 from test import TestCase
 from lib.token import Token, Type, identifier
-from lib.environment import Environment
+from lib.environment import Environment, GlobalTable, Frame, EMPTY
+from lib.ast import VariableExpression
 from lib.error import (
     UndefinedVariableError,
     RedeclaringVariableError,
@@ -135,3 +136,57 @@ class EnvironmentTest(TestCase):
 
         self.assertEqual(99, child.get_at(0, identifier("foo")))
         self.assertEqual(77, child.get_at(1, identifier("foo")))
+
+    def test_frames_keep_values_at_slots(self):
+        env = Environment()
+        outer = Frame(env, [1, 2])
+        inner = Frame(outer, [3])
+
+        inner.assign_at(1, 0, 99)
+
+        self.assertEqual(99, inner.get_at(1, 0, identifier("a")))
+        self.assertEqual(2, inner.get_at(1, 1, identifier("b")))
+        self.assertEqual(3, inner.get_at(0, 0, identifier("c")))
+
+    def test_frames_throw_when_accessing_uninitialized_slot(self):
+        frame = Frame(Environment(), [EMPTY])
+
+        with self.assertRaises(UninitializedVariableError):
+            frame.get_at(0, 0, identifier("foo"))
+
+    def test_global_table_keeps_variables_by_index(self):
+        table = GlobalTable()
+        table.define(identifier("foo"), 1)
+        table.define(identifier("bar"))
+
+        table.assign(identifier("foo"), 2)
+
+        self.assertEqual(2, table.get(identifier("foo")))
+        self.assertEqual([2, EMPTY], table.values)
+        with self.assertRaises(UninitializedVariableError):
+            table.get(identifier("bar"))
+        with self.assertRaises(RedeclaringVariableError):
+            table.define(identifier("foo"), 3)
+
+    def test_global_table_caches_indices_on_nodes(self):
+        table = GlobalTable()
+        table.define(identifier("foo"), 1)
+        node = VariableExpression(identifier("foo"))
+
+        self.assertEqual(1, table.get_cached(node, identifier("foo")))
+        self.assertEqual((table.version, 0), node.cached)
+
+        table.assign_cached(node, identifier("foo"), 5)
+        self.assertEqual(5, table.get_cached(node, identifier("foo")))
+
+    def test_cached_indices_do_not_carry_over_to_other_tables(self):
+        node = VariableExpression(identifier("foo"))
+        table = GlobalTable()
+        table.define(identifier("bar"), 1)
+        table.define(identifier("foo"), 2)
+        table.get_cached(node, identifier("foo"))
+
+        with self.assertRaises(UndefinedVariableError):
+            GlobalTable().get_cached(node, identifier("foo"))
+        with self.assertRaises(UndefinedVariableError):
+            GlobalTable().assign_cached(node, identifier("foo"), 3)
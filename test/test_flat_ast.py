@@ -0,0 +1,119 @@
+import re
+from test import TestCase, read_stubs
+from lib import ast
+from lib.flat_ast import FlatAST
+from lib.parser import Parser
+from lib.lazy import LazyParser
+from lib.scanner import Scanner
+from lib.resolver import Resolver
+from lib.interpreter import Interpreter
+from lib.dot_printer import ast_to_dot
+from lib.io import FakePrinter
+
+CODE = """
+var a = 1;
+fun add(x) { return a + x; }
+class Counter {
+    init() { this.count = 0; }
+    increment() { this.count = this.count + 1; return this; }
+}
+{
+    var b = add(2);
+    print b;
+    print Counter().increment().increment().count;
+    print a > 0 ? "positive" : "negative";
+    print (\\x -> x * 2)(21);
+}
+"""
+
+
+def parse(code, parser=Parser):
+    return parser(Scanner(code).scan()).parse()
+
+
+def run(program):
+    Interpreter.printer = FakePrinter
+    return Interpreter().interpret(program, Resolver(program).run()).printer.get()
+
+
+class FlatAstTest(TestCase):
+    def test_it_converts_to_and_from_the_object_ast(self):
+        for name, code in read_stubs().items():
+            program = parse(code)
+            tree = FlatAST.from_ast(program)
+
+            self.assertEqual(program, tree.to_ast(), name)
+            self.assertEqual(program, FlatAST.from_ast(tree.to_ast()).to_ast(), name)
+
+    def test_nodes_are_numbered_in_postorder(self):
+        tree = FlatAST.from_ast(parse("print 1 + 2;"))
+
+        self.assertEqual(5, len(tree))
+        self.assertIsInstance(tree.root(), ast.Program)
+        self.assertIsInstance(tree.node(0), ast.LiteralExpression)
+        self.assertIsInstance(tree.node(2), ast.BinaryExpression)
+        self.assertEqual(tree.node(2), tree.root().statements[0].expressions[0])
+        self.assertEqual(2, tree.node(1).value)
+        self.assertEqual("+", tree.node(2).operator.lexeme)
+        self.assertEqual(
+            (1, 9), (tree.node(2).operator.line, tree.node(2).operator.column)
+        )
+
+    def test_handles_of_one_node_are_equal(self):
+        tree = FlatAST.from_ast(parse("print 1;"))
+        other = FlatAST.from_ast(parse("print 1;"))
+
+        self.assertEqual(tree.root(), tree.root())
+        self.assertEqual(hash(tree.root()), hash(tree.root()))
+        self.assertNotEqual(tree.root(), other.root())
+        self.assertEqual({tree.root(): 1}[tree.root()], 1)
+
+    def test_a_node_has_one_handle(self):
+        tree = FlatAST.from_ast(parse("{ var a = 1; print a; }"))
+        block = tree.root().statements[0]
+        block.pool = []
+
+        self.assertIs(block, tree.root().statements[0])
+        self.assertEqual([], tree.root().statements[0].pool)
+
+    def test_handles_have_the_fields_of_their_node(self):
+        program = parse("print true ? 1 : 2;")
+        handle = FlatAST.from_ast(program).root().statements[0].expressions[0]
+        ternary = program.statements[0].expressions[0]
+
+        self.assertEqual(["test", "operator", "then", "neht"], list(vars(handle)))
+        self.assertEqual(list(vars(ternary)), list(vars(handle)))
+        self.assertEqual(ternary.digest(), handle.digest())
+
+    def test_interpreter_walks_handles(self):
+        program = parse(CODE)
+
+        self.assertEqual(run(program), run(FlatAST.from_ast(program).root()))
+        self.assertEqual(
+            ["3", "2", "positive", "42"], run(FlatAST.from_ast(program).root())
+        )
+
+    def test_lazy_bodies_are_kept_as_they_are(self):
+        program = parse(CODE, LazyParser)
+        tree = FlatAST.from_ast(program)
+
+        self.assertIs(program.statements[1].body, tree.root().statements[1].body)
+        self.assertEqual(["3", "2", "positive", "42"], run(tree.root()))
+
+    def test_dot_printer_walks_handles(self):
+        for name in ["fib.lox", "functions.lox", "logic.lox"]:
+            program = parse(read_stubs()[name])
+            tree = FlatAST.from_ast(program)
+
+            self.assertEqual(
+                re.sub(r"\d+", "N", ast_to_dot(program)),
+                re.sub(r"flat\d+_\d+|\d+", "N", ast_to_dot(tree.root())),
+                name,
+            )
+
+    def test_it_is_smaller_than_the_object_ast(self):
+        from bench.flat_ast import object_size
+
+        program = parse("\n".join(read_stubs().values()))
+
+        self.assertLess(FlatAST.from_ast(program).nbytes() * 2, object_size(program))
@@ -0,0 +1,134 @@
+import random
+from test import TestCase, read_stubs
+from lib.parser import Parser
+from lib.scanner import Scanner
+from lib.resolver import Resolver
+from lib.incremental import Document
+from lib.error import CompileErrors
+
+
+def analyze(code):
+    tokens = Scanner(code).scan()
+    program = Parser(tokens).parse()
+    return tokens, program, Resolver(program).run()
+
+
+class IncrementalTest(TestCase):
+    def assertMatchesFullRun(self, document):
+        tokens, program, bindings = analyze(document.code)
+
+        self.assertEqual(tokens, document.tokens())
+        self.assertAstMatches(program, document.ast())
+        self.assertEqual(
+            [(type(node), depth) for node, depth in bindings.items()],
+            [(type(node), depth) for node, depth in document.bindings().items()],
+        )
+
+    def test_it_matches_full_run(self):
+        for name, code in read_stubs().items():
+            self.assertMatchesFullRun(Document(code))
+
+    def test_it_only_rebuilds_touched_declarations(self):
+        document = Document("var a = 1;\nfun f(x) { return x; }\nprint f(a);\n")
+        untouched = document.units[2]
+
+        document.edit(17, 18, "y")
+
+        self.assertIs(untouched, document.units[2])
+        self.assertEqual("fun f(y) { return x; }\n", document.code[11:34])
+        self.assertMatchesFullRun(document)
+
+    def test_edits_shift_following_declarations(self):
+        document = Document("var a = 1;\n\nprint a;")
+
+        document.edit(8, 9, "1 +\n\n 2")
+
+        self.assertEqual("var a = 1 +\n\n 2;\n\nprint a;", document.code)
+        self.assertEqual(5, document.tokens()[-3].line)
+        self.assertMatchesFullRun(document)
+
+    def test_edits_leave_following_declarations_as_they_are(self):
+        document = Document("var a = 1;\n" * 100)
+        following = [(unit, unit.text, unit.lead) for unit in document.units[1:]]
+
+        document.edit(8, 9, "1 +\n 2")
+
+        self.assertEqual(following, [(u, u.text, u.lead) for u in document.units[1:]])
+        self.assertEqual(
+            [0] + [len("var a = 1 +\n 2;\n") + 11 * i for i in range(99)],
+            [unit.base for unit in document.units],
+        )
+        self.assertEqual(102, document.tokens()[-1].line)
+        self.assertMatchesFullRun(document)
+
+    def test_an_else_attaches_to_previous_if(self):
+        document = Document("if (true) print 1;\nprint 2;")
+
+        document.edit(19, 19, "else ")
+
+        self.assertMatchesFullRun(document)
+
+    def test_it_recovers_from_errors(self):
+        document = Document("fun f() {\n  return 1;\n}\nprint f();")
+
+        document.edit(22, 23, "")
+        self.assertTrue(document.errors())
+
+        with self.assertRaises(CompileErrors):
+            document.run()
+
+        document.edit(22, 22, "}")
+        self.assertEqual([], document.errors())
+        self.assertMatchesFullRun(document)
+
+    def test_it_reports_scan_errors_with_document_lines(self):
+        document = Document("print 1;\nprint 2;\nprint 3;")
+
+        document.edit(15, 16, "@")
+
+        self.assertEqual(
+            ["scan error on line 2, column 7: Unrecognized character [@]"],
+            [str(error) for error in document.errors()],
+        )
+
+    def test_errors_take_in_the_text_after_a_broken_declaration(self):
+        document = Document("print 1;\nprint 2;\nprint 3;\nprint 4;")
+
+        document.edit(6, 7, '"')
+
+        self.assertEqual(
+            ["scan error on line 4, column 9: Unterminated string"],
+            [str(error) for error in document.errors()],
+        )
+
+        document.edit(6, 7, "1")
+        document.edit(16, 17, "")
+
+        self.assertEqual(
+            ["parse error on line 3, column 1: Expected semicolon after statement"],
+            [str(error) for error in document.errors()],
+        )
+
+    def test_random_edits(self):
+        code = "\n".join(read_stubs().values())
+        fragments = ["", " ", "\n", ";", "}", "{", "'", "1", "x", "fun", "else", "var b = 2;"]
+        rng = random.Random(7)
+        document = Document(code)
+
+        for _ in range(200):
+            start = rng.randrange(len(document.code) + 1)
+            end = min(len(document.code), start + rng.randrange(4))
+            document.edit(start, end, rng.choice(fragments))
+
+            try:
+                analyze(document.code)
+            except CompileErrors as e:
+                self.assertEqual(
+                    list(map(str, e.errors)),
+                    list(map(str, document.errors())),
+                    document.code,
+                )
+                continue
+
+            self.assertEqual([], document.errors(), document.code)
+            self.assertMatchesFullRun(document)
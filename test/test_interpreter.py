@@ -181,6 +181,81 @@ class InterpreterTest(TestCase):
         )
         self.assertEqual(["0", "1", "2"], interpreter.printer.get())
 
+    def test_loop_bodies_reuse_their_frame(self):
+        program = Parser.parse_code(
+            "for (var a = 0; a < 3; a = a + 1) { var b = a * 2; print b; }"
+        )
+        Resolver(program).run()
+        interpreter = Interpreter().interpret(program)
+        body = program.statements[0].statements[1].body.statements[0]
+        frame = body.pool[0]
+
+        interpreter.interpret(program)
+
+        self.assertEqual(["0", "2", "4"] * 2, interpreter.printer.get())
+        self.assertEqual([frame], body.pool)
+
+    def test_recursive_blocks_get_frames_of_their_own(self):
+        interpreter = Interpreter.from_code(
+            "fun f(n) { { var x = n; if (n > 0) f(n - 1); print x; } } f(2);"
+        )
+
+        self.assertEqual(["0", "1", "2"], interpreter.printer.get())
+
+    def test_closures_capture_the_frame_of_each_iteration(self):
+        interpreter = Interpreter.from_code(
+            """
+var f; var g;
+for (var i = 0; i < 2; i = i + 1) {
+    var j = i;
+    if (i == 0) f = \\ -> j; else g = \\ -> j;
+}
+print f();
+print g();
+"""
+        )
+
+        self.assertEqual(["0", "1"], interpreter.printer.get())
+
+    def test_calls_take_frames_from_a_pool(self):
+        program = Parser.parse_code(
+            """
+fun f(n) { if (n > 0) f(n - 1); print n; }
+fun counter() { var n = 0; return \\ -> n = n + 1; }
+f(3);
+var c = counter();
+c();
+print c();
+"""
+        )
+        Resolver(program).run()
+        interpreter = Interpreter().interpret(program)
+        f, counter = program.statements[0], program.statements[1]
+
+        self.assertEqual(["0", "1", "2", "3", "2"], interpreter.printer.get())
+        self.assertEqual(4, len(f.body.pool))
+        # closures keep the cell of n rather than the frame
+        self.assertEqual(1, len(counter.body.pool))
+
+    def test_subclasses_of_nodes_run_like_their_base(self):
+        class Literal(ast.LiteralExpression):
+            pass
+
+        class Unknown(ast.Expression):
+            pass
+
+        self.assertEqual(2, Interpreter().evaluate(Literal(2)))
+
+        with self.assertRaises(ValueError):
+            Interpreter().evaluate(Unknown())
+
+    def test_it_recurses_as_deep_as_one_frame_per_node_allows(self):
+        interpreter = Interpreter.from_code(
+            "fun d(n) { if (n == 0) return 0; return d(n - 1) + 1; } print d(150);"
+        )
+
+        self.assertEqual(["150"], interpreter.printer.get())
+
     def test_function_declaration(self):
         interpreter = Interpreter.from_code("fun foo(a) { }")
 
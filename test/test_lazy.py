@@ -0,0 +1,147 @@
+import io
+from test import TestCase
+from lib import ast
+from lib.lazy import LazyParser
+from lib.parser import Parser
+from lib.scanner import Scanner
+from lib.stream_scanner import StreamScanner
+from lib.resolver import Resolver
+from lib.interpreter import Interpreter
+from lib.io import FakePrinter
+from lib.error import CompileErrors
+
+PROGRAMS = [
+    """
+fun fib(n) { if (n < 2) return n; return fib(n - 1) + fib(n - 2); }
+print fib(10);
+""",
+    """
+fun counter() {
+    var i = 0;
+    fun next() { i = i + 1; return i; }
+    return next;
+}
+var c = counter();
+c();
+print c();
+print c();
+""",
+    """
+var a = "global";
+{
+    fun show() { print a; }
+    show();
+    var a = "local";
+    show();
+}
+""",
+    """
+class A {
+    init(x) { this.x = x; }
+    get() { return this.x; }
+}
+class B < A {
+    get() { return super.get() * 2; }
+}
+print B(21).get();
+""",
+    """
+var twice = fun (f) { return fun (x) { return f(f(x)); }; };
+print twice(\\x -> x + 1)(1);
+""",
+]
+
+
+def run(parser, code):
+    Interpreter.printer = FakePrinter
+
+    node = parser(Scanner(code).scan()).parse()
+    interpreter = Interpreter().interpret(node, Resolver(node).run())
+
+    return node, interpreter.printer.get()
+
+
+class LazyTest(TestCase):
+    def test_it_matches_eager_parsing(self):
+        for code in PROGRAMS:
+            self.assertEqual(run(Parser, code)[1], run(LazyParser, code)[1], code)
+
+    def test_it_parses_bodies_on_first_call(self):
+        node, output = run(
+            LazyParser, "fun used() { print 1; } fun unused() { print 2; } used();"
+        )
+        used, unused = node.statements[0].body, node.statements[1].body
+
+        self.assertEqual(["1"], output)
+        self.assertIsInstance(used, ast.LazyBlock)
+        self.assertIsInstance(unused, ast.LazyBlock)
+        self.assertEqual(
+            Parser(Scanner("{ print 1; }").scan()).statement(), used.block
+        )
+        self.assertIsNone(unused.block)
+
+    def test_it_reports_unbalanced_bodies_at_load_time(self):
+        for code in ["fun f() { ( } f();", "fun f() { print 1;", "var f = fun () { ) };"]:
+            with self.assertRaises(CompileErrors) as expected:
+                Parser(Scanner(code).scan()).parse()
+
+            with self.assertRaises(CompileErrors) as actual:
+                LazyParser(Scanner(code).scan()).parse()
+
+            self.assertEqual(
+                list(map(str, expected.exception.errors)),
+                list(map(str, actual.exception.errors)),
+            )
+
+    def test_it_reports_body_errors_at_load_time(self):
+        for code in [
+            "print 0;\nfun f() {\n print ;\n}",
+            "fun f() { var a = 1 +; } fun g() { return (1; }",
+            "fun f() { a + b = 1; (c) = 2; var d = fun () {} (); }",
+            "print 0;\nfun f() {\n return this;\n}",
+            "class A { init() { return 1; } }",
+            "class A { m() { return super.m(); } }",
+            "fun f() { super.m(); }",
+            "fun f(a) { var a; }",
+            "fun f() { var a = 1; var a = 2; }",
+            "fun f() { var a = a; }",
+            "fun f() { class A < A {} }",
+        ]:
+            with self.assertRaises(CompileErrors) as expected:
+                node = Parser(Scanner(code).scan()).parse()
+                Resolver(node).run()
+
+            with self.assertRaises(CompileErrors) as actual:
+                node = LazyParser(Scanner(code).scan()).parse()
+                Resolver(node).run()
+
+            self.assertEqual(
+                list(map(str, expected.exception.errors)),
+                list(map(str, actual.exception.errors)),
+                code,
+            )
+
+    def test_it_defers_bodies_which_are_fine_where_they_are(self):
+        code = """
+class A { init() { this.x = \\ -> 1; fun g() { return 2; } } m(a) { { var a = 1; } } }
+class B < A { m() { return super.m(this); } }
+fun f() { var a = 1; fun g(b) { return \\c -> b + c; } }
+"""
+        node = LazyParser(Scanner(code).scan()).parse()
+        Resolver(node).run()
+        init, m = node.statements[0].methods
+        super_m = node.statements[1].methods[0]
+        f = node.statements[2]
+
+        self.assertIsNotNone(init.body.block)
+        self.assertIsNotNone(m.body.block)
+        self.assertIsNone(super_m.body.block)
+        self.assertIsNone(f.body.block)
+
+    def test_it_parses_token_streams(self):
+        for code in PROGRAMS:
+            tokens = StreamScanner(io.StringIO(code), 16).scan()
+            node = LazyParser(tokens).parse()
+            interpreter = Interpreter().interpret(node, Resolver(node).run())
+
+            self.assertEqual(run(Parser, code)[1], interpreter.printer.get(), code)
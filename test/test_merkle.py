@@ -0,0 +1,100 @@
+import pickle
+from test import TestCase, read_stubs
+from lib import ast
+from lib.parser import Parser
+from lib.lazy import LazyParser
+from lib.stack_parser import StackParser
+from lib.flat_ast import FlatAST
+from lib.scanner import Scanner
+
+
+def parse(code, parser=Parser):
+    return parser(Scanner(code).scan()).parse()
+
+
+class MerkleTest(TestCase):
+    def test_it_ignores_positions(self):
+        self.assertEqual(
+            parse("fun f(a) { return a + 1; }").digest(),
+            parse("\n\n  fun   f(a) {\n return a+1;\n}").digest(),
+        )
+
+    def test_it_tells_different_trees_apart(self):
+        digests = {
+            parse(code).digest()
+            for code in [
+                "print 1;",
+                "print 1.0;",
+                "print true;",
+                'print "1";',
+                "print 1, 1;",
+                "print -1;",
+                "print a;",
+                "print b;",
+                "print a + b;",
+                "print a - b;",
+                "print b + a;",
+                "print (a + b);",
+                "print a and b;",
+                "var a = 1;",
+                "{ print 1; }",
+            ]
+        }
+
+        self.assertEqual(15, len(digests))
+
+    def test_equal_subtrees_share_a_digest(self):
+        program = parse("fun f(x) { return x * 2; } fun g(x) { return x * 2; }")
+        f, g = program.statements
+
+        self.assertEqual(f.body.digest(), g.body.digest())
+        self.assertNotEqual(f.digest(), g.digest())
+
+    def test_digest_is_cached_outside_of_the_fields(self):
+        program = parse(read_stubs()["fib.lox"])
+        digest = program.digest()
+
+        self.assertIs(digest, program.digest())
+        self.assertNotIn("_digest", vars(program))
+        self.assertEqual(parse(read_stubs()["fib.lox"]), program)
+
+    def test_equality_still_compares_positions(self):
+        self.assertEqual(parse("print a;").digest(), parse("\nprint a;").digest())
+        self.assertNotEqual(parse("print a;"), parse("\nprint a;"))
+        self.assertNotEqual(parse("print a;"), parse("print b;"))
+        self.assertEqual(parse("print a;"), parse("print a;"))
+
+    def test_hash_is_still_identity(self):
+        a, b = parse("print a;"), parse("print a;")
+
+        self.assertEqual(a, b)
+        self.assertEqual(2, len({a, b}))
+
+    def test_lazy_bodies_digest_like_parsed_ones(self):
+        for name, code in read_stubs().items():
+            self.assertEqual(
+                parse(code).digest(), parse(code, LazyParser).digest(), name
+            )
+
+    def test_flat_trees_digest_like_object_ones(self):
+        for name, code in read_stubs().items():
+            program = parse(code)
+
+            self.assertEqual(
+                program.digest(), FlatAST.from_ast(program).root().digest(), name
+            )
+
+    def test_deep_trees_do_not_recurse(self):
+        code = "print %s1%s;" % ("(" * 10000, ")" * 10000)
+
+        self.assertEqual(
+            parse(code, StackParser).digest(), parse(code, StackParser).digest()
+        )
+
+    def test_nodes_pickle_with_their_digest(self):
+        program = parse(read_stubs()["fib.lox"])
+        program.digest()
+        copy = pickle.loads(pickle.dumps(program))
+
+        self.assertEqual(program.digest(), copy._digest)
+        self.assertEqual(program, copy)
@@ -0,0 +1,86 @@
+import io
+from test import TestCase, read_stubs
+from lib.parser import Parser
+from lib.parallel_parser import ParallelParser, boundaries
+from lib.scanner import Scanner
+from lib.token_buffer import BufferScanner
+from lib.stream_scanner import StreamScanner
+from lib.error import CompileErrors
+
+
+class ParallelParserTest(TestCase):
+    def assertSameParse(self, code, **options):
+        tokens = Scanner(code).scan()
+
+        try:
+            expected = Parser(tokens).parse()
+        except CompileErrors as e:
+            with self.assertRaises(CompileErrors) as actual:
+                ParallelParser(tokens, **options).parse()
+
+            self.assertEqual(
+                list(map(str, e.errors)), list(map(str, actual.exception.errors)), code
+            )
+        else:
+            self.assertEqual(expected, ParallelParser(tokens, **options).parse(), code)
+
+    def test_it_splits_at_top_level_declarations(self):
+        code = "var a = 1; fun f() { return a; } class A { m() {} } if (a) { } else { } print a;"
+        tokens = Scanner(code).scan()
+
+        self.assertEqual(
+            ["var", "fun", "class", "if", "print"],
+            [tokens[i].lexeme for i in [0] + boundaries([t.type for t in tokens])],
+        )
+
+    def test_it_does_not_split_inside_expressions(self):
+        code = "var f = fun () {} ; for (var i = 0; i < 1; i = i + 1) {} x = fun () {} (1);"
+        tokens = Scanner(code).scan()
+
+        self.assertEqual(
+            ["var", "for", "x"],
+            [tokens[i].lexeme for i in [0] + boundaries([t.type for t in tokens])],
+        )
+
+    def test_it_matches_parser_on_stubs(self):
+        code = "\n".join(read_stubs().values())
+
+        for workers in [1, 2]:
+            self.assertSameParse(code, workers=workers, slices=5)
+
+    def test_it_matches_parser_on_edge_cases(self):
+        for code in [
+            "",
+            "print 1;",
+            "if (a) print 1; else print 2; print 3;",
+            "{ var a = 1; } { print a; }",
+            "fun f() {} fun g() {} f(); g();",
+            "var f = fun () { return 1; }; print f();",
+        ]:
+            self.assertSameParse(code, workers=1, slices=3)
+
+    def test_it_reports_errors_of_sequential_parse(self):
+        for code in [
+            "var a = 1;\nprint a\nvar b = ;\nfun f() { return 1; }",
+            "fun f() {\n print 1;\n\nfun g() {}",
+            "print 1; } print 2;",
+        ]:
+            self.assertSameParse(code, workers=2, slices=3)
+
+    def test_it_parses_token_buffers(self):
+        code = "\n".join(read_stubs().values())
+
+        self.assertEqual(
+            Parser(Scanner(code).scan()).parse(),
+            ParallelParser(BufferScanner(code).scan(), workers=1, slices=7).parse(),
+        )
+
+    def test_it_parses_token_streams(self):
+        code = "\n".join(read_stubs().values())
+
+        tokens = StreamScanner(io.StringIO(code), 64).scan()
+
+        self.assertEqual(
+            Parser(Scanner(code).scan()).parse(),
+            ParallelParser(tokens, workers=1, slices=7).parse(),
+        )
@@ -0,0 +1,47 @@
+from test import TestCase, read_stubs
+from lib.scanner import Scanner
+from lib.parallel_scanner import ParallelScanner
+from lib.error import CompileErrors
+
+
+class ParallelScannerTest(TestCase):
+    def assertScansLikeScanner(self, code, **options):
+        try:
+            expected = Scanner(code).scan()
+        except CompileErrors as e:
+            with self.assertRaises(CompileErrors) as context:
+                ParallelScanner(code, **options).scan()
+
+            self.assertEqual(
+                [str(error) for error in e.errors],
+                [str(error) for error in context.exception.errors],
+            )
+        else:
+            self.assertEqual(expected, ParallelScanner(code, **options).scan())
+
+    def test_it_splits_at_newlines(self):
+        scanner = ParallelScanner("a\nbb\nccc\nd", chunk_size=2)
+
+        self.assertEqual([(0, 5), (5, 9), (9, 10)], scanner.chunks())
+
+    def test_it_matches_scanner_on_stubs(self):
+        code = "\n".join(read_stubs().values())
+
+        for chunk_size in [1, 16, 100, 1 << 18]:
+            self.assertScansLikeScanner(code, workers=1, chunk_size=chunk_size)
+
+    def test_it_repairs_strings_spanning_chunks(self):
+        code = "print 'a\n\"b\nc\n';\nprint \"x\ny\" + 'z';\n'\n\n\n\n' 1 2\n3"
+
+        for chunk_size in [1, 2, 3, 5, 8]:
+            self.assertScansLikeScanner(code, workers=1, chunk_size=chunk_size)
+
+    def test_it_reports_errors_in_order(self):
+        for code in ["@\n1\n#", "1 'a\n\n\nb", "$\n'x\ny' ~\n'\n"]:
+            for chunk_size in [1, 2, 4]:
+                self.assertScansLikeScanner(code, workers=1, chunk_size=chunk_size)
+
+    def test_it_scans_in_process_pool(self):
+        code = "\n".join(read_stubs().values()) * 4 + "\nprint 'multi\nline';"
+
+        self.assertScansLikeScanner(code, workers=2, chunk_size=512)
@@ -298,6 +298,15 @@ class ParserTest(TestCase):
         else:
             self.fail("Expected exception")
 
+    def test_it_names_the_token_a_parameter_list_ends_at(self):
+        for code, end_mark in [("fun f(1) {}", "RIGHT_PAREN"), ("\\ 1 -> 2;", "ARROW")]:
+            try:
+                Parser.parse_code(code)
+            except CompileErrors as e:
+                self.assertEqual(["Expected argument before Type.%s" % end_mark], e.messages())
+            else:
+                self.fail("Expected exception")
+
     def test_if_statements(self):
         self.assertParseTree(
             ast.Program(
@@ -0,0 +1,85 @@
+from test import TestCase, read_stubs
+import lib.ast as ast
+from lib.parser import Parser, BufferParser
+from lib.pratt_parser import PrattParser, BufferPrattParser
+from lib.scanner import Scanner
+from lib.token_buffer import BufferScanner
+from lib.error import CompileErrors
+
+
+class PrattParserTest(TestCase):
+    def assertSameParse(self, code):
+        tokens = Scanner(code).scan()
+
+        try:
+            expected = Parser(tokens).parse()
+        except CompileErrors as e:
+            with self.assertRaises(CompileErrors) as actual:
+                PrattParser(tokens).parse()
+
+            self.assertEqual(
+                list(map(str, e.errors)), list(map(str, actual.exception.errors)), code
+            )
+        else:
+            self.assertEqual(expected, PrattParser(tokens).parse(), code)
+
+    def test_it_matches_parser_on_stubs(self):
+        for name, code in read_stubs().items():
+            self.assertSameParse(code)
+
+    def test_it_matches_parser_on_expressions(self):
+        for code in [
+            "1 + 2 * 3 - 4 / 5 - 6;",
+            "1 < 2 == 3 >= 4 != 5 <= 6 > 7;",
+            "a or b and c or d and !e;",
+            "--a - -b * !!c;",
+            "-a.b(1)(2).c * d;",
+            "a ? b : c ? d : e;",
+            "a or b ? c and d : e or f;",
+            "a ? b ? c : d : e;",
+            "a = b = c ? d : e;",
+            "a.b.c = d + e;",
+            "f(a = 1, \\x -> x + 1, fun (y) { return y; });",
+            "(a + b) * (c - (d / e));",
+            "super.method(this.field);",
+            "print 1 + 2, 3 * 4, a ? b : c;",
+        ]:
+            self.assertSameParse(code)
+
+    def test_it_reports_same_errors_as_parser(self):
+        for code in [
+            "1 + ;",
+            "a + b = c;",
+            "a ? b;",
+            "a ? b = c : d;",
+            "f(1, 2;",
+            "a.1;",
+            "(1 + 2;",
+            "super;",
+            "1 +\n* 2;\nvar = 3;\nprint a ? : b;",
+        ]:
+            self.assertSameParse(code)
+
+    def test_it_builds_nodes_by_binding_power(self):
+        self.assertEqual(
+            ast.BinaryExpression(
+                ast.LiteralExpression(1),
+                Scanner("+").scan()[0],
+                ast.BinaryExpression(
+                    ast.UnaryExpression(
+                        Scanner("-").scan()[0], ast.LiteralExpression(2)
+                    ),
+                    Scanner("*").scan()[0],
+                    ast.LiteralExpression(3),
+                ),
+            ),
+            PrattParser(Scanner("1 + -2 * 3;").scan()).parse().statements[0].expression,
+        )
+
+    def test_it_parses_token_buffers(self):
+        for name, code in read_stubs().items():
+            buffer = BufferScanner(code).scan()
+
+            self.assertEqual(
+                BufferParser(buffer).parse(), BufferPrattParser(buffer).parse(), name
+            )
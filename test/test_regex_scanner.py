@@ -0,0 +1,67 @@
+from test import TestCase, read_stubs
+from lib.scanner import Scanner
+from lib.regex_scanner import RegexScanner
+from lib.token import Token, Type
+from lib.error import ScanError, CompileErrors
+
+
+class RegexScannerTest(TestCase):
+    def test_it_matches_scanner_on_stubs(self):
+        for name, code in read_stubs().items():
+            self.assertEqual(Scanner(code).scan(), RegexScanner(code).scan(), name)
+
+    def test_it_matches_scanner_on_edge_cases(self):
+        for code in [
+            "",
+            "( ) { } , . - + ; * / ! = < > ? : \\",
+            "!= == <= >= -> -- -> =! ==",
+            "1. 1.a 1.5.5 .5 007",
+            "and class else false for fun if nil or print return super this true var while",
+            "_foo foo_1 Foo1bar fun1 classy",
+            "'one\ntwo' \"three\n\n\" 'x'",
+            "a\r\n\tb\n\n\nc",
+            "\\x -> x + 1",
+        ]:
+            self.assertEqual(Scanner(code).scan(), RegexScanner(code).scan(), code)
+
+    def test_it_parses_numbers(self):
+        self.assertEqual(
+            [
+                Token(Type.NUMBER, "42", 42, 1),
+                Token(Type.NUMBER, "69.96", 69.96, 1),
+                Token(Type.EOF, "", None, 1),
+            ],
+            RegexScanner("42 69.96").scan(),
+        )
+
+    def test_it_reports_unterminated_string(self):
+        try:
+            RegexScanner("1;\n'hello\n").scan()
+        except CompileErrors as e:
+            self.assertEqual([ScanError(3, "Unterminated string")], e.errors)
+        else:
+            self.fail("Expected exception")
+
+    def test_it_reports_unknown_chars(self):
+        try:
+            RegexScanner("@\n1 # 2").scan()
+        except CompileErrors as e:
+            self.assertEqual(
+                [
+                    ScanError(1, "Unrecognized character [@]"),
+                    ScanError(2, "Unrecognized character [#]"),
+                ],
+                e.errors,
+            )
+        else:
+            self.fail("Expected exception")
+
+    def test_it_reports_same_errors_as_scanner(self):
+        for code in ["@", "1 $ 2 ~", "'a\nb", "print 1;\n\"open\n\nend", "ä"]:
+            with self.assertRaises(CompileErrors) as expected:
+                Scanner(code).scan()
+
+            with self.assertRaises(CompileErrors) as actual:
+                RegexScanner(code).scan()
+
+            self.assertEqual(expected.exception.errors, actual.exception.errors)
@@ -0,0 +1,55 @@
+from test import TestCase
+from lib import ast
+from lib.repl import ReplParser, ReplSession
+from lib.scanner import Scanner
+from lib.interpreter import Interpreter
+from lib.io import FakePrinter
+from lib.error import CompileErrors, RuntimeError
+
+
+def parse(code):
+    return ReplParser(Scanner(code).scan()).parse()
+
+
+class ReplTest(TestCase):
+    def setUp(self):
+        Interpreter.printer = FakePrinter
+        self.session = ReplSession()
+
+    def run_lines(self, *lines):
+        for line in lines:
+            self.session.run(line)
+
+        return self.session.interpreter.printer.get()
+
+    def test_it_prints_lone_expressions(self):
+        self.assertIsInstance(parse("1 + 2").statements[0], ast.PrintStatement)
+        self.assertIsInstance(parse("1 + 2;").statements[0], ast.ExpressionStatement)
+        self.assertEqual(["3"], self.run_lines("1 + 2", "3 + 4;"))
+
+    def test_only_a_whole_line_is_an_expression(self):
+        with self.assertRaises(CompileErrors):
+            parse("1; 2")
+
+        with self.assertRaises(CompileErrors):
+            parse("{ 1 }")
+
+    def test_it_keeps_state_across_lines(self):
+        output = self.run_lines(
+            "var a = 2;",
+            "fun add(x) { return x + a; }",
+            "class A { get() { return add(1); } }",
+            "a = 5",
+            "A().get()",
+        )
+
+        self.assertEqual(["5", "6"], output)
+
+    def test_it_carries_on_after_errors(self):
+        with self.assertRaises(RuntimeError):
+            self.session.run("undefined")
+
+        with self.assertRaises(CompileErrors):
+            self.session.run("var a = ;")
+
+        self.assertEqual(["1"], self.run_lines("var a = 1;", "a"))
@@ -2,7 +2,7 @@ from unittest import skip
 from test import TestCase
 from lib.parser import Parser
 from lib.io import FakePrinter
-from lib.resolver import Resolver
+from lib.resolver import Resolver, UPVALUE
 from lib.interpreter import Interpreter
 from lib.error import CompileErrors
 
@@ -52,7 +52,8 @@ fun f() {
         bindings = Resolver(ast).run()
         bindings = [(node.variable.lexeme, depth) for node, depth in bindings.items()]
 
-        self.assertEqual([("a", 0), ("b", 1), ("x", 0), ("b", 0)], bindings)
+        # the lambda reaches b through the cell it captured
+        self.assertEqual([("a", 0), ("b", UPVALUE), ("x", 0), ("b", 0)], bindings)
 
     def test_double_declarations_error(self):
         ast = Parser.parse_code(
@@ -210,3 +211,94 @@ fun foo() {
             )
         else:
             self.fail("expected exception")
+
+    def test_it_annotates_nodes_with_their_depth(self):
+        ast = Parser.parse_code("var a; fun f(x) { { var y; print x, a; } }")
+        block = ast.statements[1].body.statements[0]
+        x, a = block.statements[1].expressions
+
+        self.assertFalse(hasattr(x, "depth"))
+        Resolver(ast).run()
+
+        self.assertEqual(1, x.depth)
+        self.assertEqual(None, a.depth)
+        self.assertNotIn("depth", vars(x))
+
+    def test_interpreter_needs_no_bindings(self):
+        ast = Parser.parse_code(
+            """
+class A { f() { return "A"; } }
+class B < A { f() { return super.f() + "B"; } }
+fun counter() { var n = 0; return \\ -> n = n + 1; }
+var c = counter();
+c();
+print B().f();
+print c();
+"""
+        )
+        Resolver(ast).run()
+
+        interpreter = Interpreter().interpret(ast)
+
+        self.assertEqual(["AB", "2"], interpreter.printer.get())
+
+    def test_it_numbers_locals_with_frame_slots(self):
+        ast = Parser.parse_code("var g; fun f(x, y) { var z; { var w = z; print w, y; } }")
+        function = ast.statements[1]
+        z, block = function.body.statements
+        w = block.statements[0]
+        read_w, read_y = block.statements[1].expressions
+        Resolver(ast).run()
+
+        self.assertEqual(None, ast.statements[0].slot)
+        self.assertEqual(2, z.slot)
+        self.assertEqual(3, function.body.size)
+        self.assertEqual(0, w.slot)
+        self.assertEqual(1, block.size)
+        self.assertEqual((0, 0), (read_w.depth, read_w.slot))
+        self.assertEqual((1, 1), (read_y.depth, read_y.slot))
+
+    def test_it_gives_blocks_without_declarations_no_frame(self):
+        ast = Parser.parse_code("fun f() { { print 1; } { var a; } }")
+        empty, block = ast.statements[0].body.statements
+        Resolver(ast).run()
+
+        self.assertEqual(0, empty.size)
+        self.assertEqual(1, block.size)
+
+    def test_closures_capture_free_variables_in_cells(self):
+        ast = Parser.parse_code(
+            """
+fun f(n) {
+    var a;
+    var b;
+    fun g() { return \\ -> a + n; }
+    return b;
+}
+"""
+        )
+        f = ast.statements[0]
+        a, b, g, _ = f.body.statements
+        inner = g.body.statements[0].expression
+        read_a, read_n = inner.expression.left, inner.expression.right
+        Resolver(ast).run()
+
+        self.assertEqual((True, False), (a.cell, b.cell))
+        self.assertEqual((0,), f.body.cells)
+        self.assertEqual(((0, 1), (0, 0)), g.upvalues)
+        self.assertEqual(((UPVALUE, 0), (UPVALUE, 1)), inner.upvalues)
+        self.assertEqual((UPVALUE, 0), (read_a.depth, read_a.slot))
+        self.assertEqual((UPVALUE, 1), (read_n.depth, read_n.slot))
+
+    def test_methods_take_the_instance_and_the_superclass_as_cells(self):
+        ast = Parser.parse_code(
+            "class A {} class B < A { m() { return \\ -> super.m(); } }"
+        )
+        method = ast.statements[1].methods[0]
+        inner = method.body.statements[0].expression
+        call = inner.expression.callee
+        Resolver(ast).run()
+
+        self.assertEqual((None, (0, 0)), method.upvalues)
+        self.assertEqual(((UPVALUE, 1), (UPVALUE, 0)), inner.upvalues)
+        self.assertEqual((UPVALUE, 0, 1), (call.depth, call.slot, call.receiver))
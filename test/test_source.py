@@ -0,0 +1,88 @@
+from test import TestCase
+from lib.source import Source
+from lib.parser import Parser
+from lib.scanner import Scanner
+from lib.resolver import Resolver
+from lib.interpreter import Interpreter
+from lib.io import FakePrinter
+from lib.token import Token, Type
+from lib.error import CompileErrors, RuntimeError
+
+
+class SourceTest(TestCase):
+    def test_it_builds_line_index_lazily(self):
+        source = Source("a\nbc\n\nd")
+
+        self.assertIsNone(source.starts)
+        self.assertEqual((1, 1), source.position(0))
+        self.assertEqual([0, 2, 5, 6], list(source.starts))
+
+    def test_it_computes_lines_and_columns(self):
+        source = Source("a\nbc\n\nd")
+
+        self.assertEqual((1, 2), source.position(1))
+        self.assertEqual((2, 1), source.position(2))
+        self.assertEqual((2, 2), source.position(3))
+        self.assertEqual((3, 1), source.position(5))
+        self.assertEqual((4, 1), source.position(6))
+        self.assertEqual((4, 2), source.position(7))
+
+    def test_tokens_carry_offsets(self):
+        tokens = Scanner("var a =\n  'b';").scan()
+
+        self.assertEqual([0, 4, 6, 10, 13, 14], [token.offset for token in tokens])
+        self.assertEqual([1, 1, 1, 2, 2, 2], [token.line for token in tokens])
+        self.assertEqual([1, 5, 7, 3, 6, 7], [token.column for token in tokens])
+
+    def test_tokens_compare_by_line_not_offset(self):
+        self.assertEqual(
+            Token(Type.IDENTIFIER, "b", "b", 2), Scanner("a\n  b").scan()[1]
+        )
+
+
+class ErrorPositionTest(TestCase):
+    def setUp(self):
+        Interpreter.printer = FakePrinter
+
+    def test_scan_errors(self):
+        with self.assertRaises(CompileErrors) as context:
+            Scanner("1;\n  @").scan()
+
+        self.assertEqual(
+            "scan error on line 2, column 3: Unrecognized character [@]",
+            str(context.exception),
+        )
+
+    def test_parse_errors(self):
+        with self.assertRaises(CompileErrors) as context:
+            Parser.parse_code("print 1;\nprint 1 +;")
+
+        self.assertEqual(
+            "parse error on line 2, column 10: Expected expression",
+            str(context.exception),
+        )
+
+    def test_resolver_errors(self):
+        with self.assertRaises(CompileErrors) as context:
+            Resolver(Parser.parse_code("\n  print this;")).run()
+
+        self.assertEqual(
+            "resolver error on line 2, column 9: Cannot use 'this' outside of a class",
+            str(context.exception),
+        )
+
+    def test_runtime_errors(self):
+        with self.assertRaises(RuntimeError) as context:
+            Interpreter.from_code("var a = 1;\nprint a + 'b';")
+
+        self.assertEqual(
+            "runtime error on line 2, column 9: "
+            "Operands of (+) must be of the same type. number and string given",
+            str(context.exception),
+        )
+
+    def test_errors_without_position(self):
+        self.assertEqual(
+            "runtime error on line 1: boom",
+            str(RuntimeError(Token(Type.IDENTIFIER, "a", "a", 1), "boom")),
+        )
@@ -0,0 +1,108 @@
+from test import TestCase, read_stubs
+from lib import ast
+from lib.parser import Parser, BufferParser
+from lib.stack_parser import StackParser, BufferStackParser
+from lib.scanner import Scanner
+from lib.regex_scanner import RegexScanner
+from lib.token_buffer import BufferScanner
+from lib.resolver import Resolver
+from lib.dot_printer import to_dot
+from lib.error import CompileErrors
+
+DEPTH = 10000
+
+
+class StackParserTest(TestCase):
+    def assertSameParse(self, code):
+        tokens = Scanner(code).scan()
+
+        try:
+            expected = Parser(tokens).parse()
+        except CompileErrors as e:
+            with self.assertRaises(CompileErrors) as actual:
+                StackParser(tokens).parse()
+
+            self.assertEqual(
+                list(map(str, e.errors)), list(map(str, actual.exception.errors)), code
+            )
+        else:
+            self.assertEqual(expected, StackParser(tokens).parse(), code)
+
+    def test_it_matches_parser_on_stubs(self):
+        for name, code in read_stubs().items():
+            self.assertSameParse(code)
+
+    def test_it_matches_parser_on_statements(self):
+        for code in [
+            "class A < B { init(a) { this.a = a; } get() { return super.get(); } }",
+            "for (var i = 0; i < 10; i = i + 1) { print i; }",
+            "for (;;) {}",
+            "if (a) if (b) print 1; else print 2;",
+            "while (a) { a = a - 1; }",
+            "fun f(a, b) { return; } fun () {};",
+            "var f = \\a, b -> a ? b : -a.c(1, 2).d = 3;",
+            "print 1 + 2 * 3, a or b and !c, x = y = z;",
+        ]:
+            self.assertSameParse(code)
+
+    def test_it_reports_same_errors_as_parser(self):
+        for code in [
+            "1 + ;",
+            "a + b = c;",
+            "a ? b;",
+            "f(1, 2;",
+            "class { }",
+            "class A { 1 }",
+            "fun f( { }",
+            "{ print 1;",
+            "if (a print 1;\nvar = 2;\nprint 3",
+            "for (var i = 0 i < 1;) {}",
+        ]:
+            self.assertSameParse(code)
+
+    def test_it_parses_token_buffers(self):
+        for name, code in read_stubs().items():
+            buffer = BufferScanner(code).scan()
+
+            self.assertEqual(
+                BufferParser(buffer).parse(), BufferStackParser(buffer).parse(), name
+            )
+
+    def test_it_parses_deeply_nested_expressions(self):
+        for code, kind in [
+            ("(" * DEPTH + "1" + ")" * DEPTH, ast.GroupingExpression),
+            ("-" * DEPTH + "1", ast.UnaryExpression),
+            ("a = " * DEPTH + "1", ast.AssignmentExpression),
+            ("a ? b : " * DEPTH + "c", ast.TernaryExpression),
+            ("f(" * DEPTH + "1" + ")" * DEPTH, ast.CallExpression),
+        ]:
+            program = StackParser(RegexScanner(code + ";").scan()).parse()
+            self.assertIsInstance(program.statements[0].expression, kind)
+
+    def test_it_parses_deeply_nested_statements(self):
+        code = "if (a) {" * DEPTH + "print 1;" + "}" * DEPTH
+
+        program = StackParser(RegexScanner(code).scan()).parse()
+
+        self.assertIsInstance(program.statements[0], ast.IfStatement)
+
+
+class DeepTraversalTest(TestCase):
+    def test_resolver_handles_deeply_nested_blocks(self):
+        # blocks which declare nothing have no scope, so every one declares b
+        code = "{ var a = 1;" + "{ var b;" * DEPTH + "print a;" + "}" * DEPTH + "}"
+        program = StackParser(RegexScanner(code).scan()).parse()
+
+        self.assertEqual([DEPTH], list(Resolver(program).run().values()))
+
+    def test_resolver_handles_long_operator_chains(self):
+        code = "{ var a = 1; print a" + " + a" * DEPTH + "; }"
+        program = StackParser(RegexScanner(code).scan()).parse()
+
+        self.assertEqual({0}, set(Resolver(program).run().values()))
+
+    def test_dot_printer_handles_deep_trees(self):
+        code = "print " + "-" * DEPTH + "1;"
+        program = StackParser(RegexScanner(code).scan()).parse()
+
+        self.assertEqual(3 + 2 * (DEPTH + 1), len(to_dot(program).splitlines()))
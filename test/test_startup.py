@@ -0,0 +1,19 @@
+from os import path
+from test import TestCase
+from bench.startup import imported
+
+SCRIPT = path.join("stubs", "math.lox")
+
+
+class StartupTest(TestCase):
+    def test_running_a_script_defers_heavy_imports(self):
+        self.assertEqual([], imported("--no-cache", SCRIPT))
+
+    def test_other_modes_import_what_they_need(self):
+        self.assertIn("black", imported("--no-cache", "--ast", "raw", SCRIPT))
+        self.assertIn("lib.vm", imported("--no-cache", "--engine", "vm", SCRIPT))
+        self.assertIn("lib.compiler", imported("--no-cache", "--bytecode", SCRIPT))
+
+    def test_dumps_stay_light(self):
+        self.assertEqual([], imported("--no-cache", "--tokens", SCRIPT))
+        self.assertEqual([], imported("--no-cache", "--ast", "json", SCRIPT))
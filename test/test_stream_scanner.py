@@ -0,0 +1,112 @@
+import io
+import mmap
+import tempfile
+from test import TestCase, read_stubs
+from lib.parser import Parser
+from lib.scanner import Scanner
+from lib.stream_scanner import StreamScanner, TokenStream
+from lib.error import ScanError, CompileErrors
+
+
+class StreamScannerTest(TestCase):
+    def test_it_matches_scanner_for_any_chunk_size(self):
+        code = "\n".join(read_stubs().values())
+        code += "\n1.5 1. 'multi\nline' -> != \\x -> x;"
+
+        for chunk_size in [1, 2, 3, 7, 64, 1 << 16]:
+            self.assertEqual(
+                Scanner(code).scan(),
+                list(StreamScanner(io.StringIO(code), chunk_size).scan()),
+                "chunk size %d" % chunk_size,
+            )
+
+    def test_it_decodes_bytes(self):
+        code = "print 'ñandú';\nprint 1.25;"
+
+        self.assertEqual(
+            Scanner(code).scan(),
+            list(StreamScanner(io.BytesIO(code.encode()), 1).scan()),
+        )
+
+    def test_it_scans_mmap(self):
+        code = "var a = 1;\nprint a + 2;"
+
+        with tempfile.TemporaryFile() as file:
+            file.write(code.encode())
+            file.flush()
+
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as source:
+                tokens = list(StreamScanner(source, 4).scan())
+
+        self.assertEqual(Scanner(code).scan(), tokens)
+
+    def test_it_reports_errors(self):
+        try:
+            list(StreamScanner(io.StringIO("@ 1;\n'open\n"), 2).scan())
+        except CompileErrors as e:
+            self.assertEqual(
+                [
+                    ScanError(1, "Unrecognized character [@]"),
+                    ScanError(3, "Unterminated string"),
+                ],
+                e.errors,
+            )
+        else:
+            self.fail("Expected exception")
+
+    def test_it_stops_at_a_bad_character(self):
+        tokens = StreamScanner(io.StringIO("print 1 @ 2;\nprint 3 $;\n"), 4).scan()
+
+        self.assertEqual("1", tokens[1].lexeme)
+
+        with self.assertRaises(CompileErrors) as context:
+            tokens[2]
+
+        self.assertEqual(
+            [
+                ScanError(1, "Unrecognized character [@]"),
+                ScanError(2, "Unrecognized character [$]"),
+            ],
+            context.exception.errors,
+        )
+
+    def test_parser_reports_scan_errors_mid_stream(self):
+        code = "print 1;\nprint (1 @ 2;\nprint 3;"
+
+        with self.assertRaises(CompileErrors) as context:
+            Parser(StreamScanner(io.StringIO(code), 4).scan()).parse()
+
+        self.assertEqual(
+            [ScanError(2, "Unrecognized character [@]")], context.exception.errors
+        )
+
+    def test_parser_consumes_stream(self):
+        code = "fun f(x) { return x * 2; }\nprint f(1) + f(2);"
+
+        self.assertEqual(
+            Parser.parse_code(code),
+            Parser(StreamScanner(io.StringIO(code), 5).scan()).parse(),
+        )
+
+    def test_scan_errors_surface_through_parser(self):
+        with self.assertRaises(CompileErrors) as context:
+            Parser(StreamScanner(io.StringIO("print 1;\n@"), 3).scan()).parse()
+
+        self.assertEqual(["Unrecognized character [@]"], context.exception.messages())
+
+    def test_token_stream_discards_consumed_tokens(self):
+        stream = TokenStream(iter(range(1000)))
+
+        for i in range(1000):
+            self.assertEqual(i, stream[i])
+
+            if i > 0:
+                self.assertEqual(i - 1, stream[i - 1])
+
+            self.assertLessEqual(len(stream.window), 2)
+
+        with self.assertRaises(IndexError):
+            stream[0]
+
+        with self.assertRaises(IndexError):
+            stream[1000]
@@ -0,0 +1,76 @@
+from test import TestCase, read_stubs
+from lib.parser import Parser, BufferParser
+from lib.scanner import Scanner
+from lib.token import Token, Type
+from lib.token_buffer import TokenBuffer, BufferScanner
+from lib.error import ScanError, CompileErrors
+
+
+class TokenBufferTest(TestCase):
+    def test_views_match_scanner_tokens(self):
+        for name, code in read_stubs().items():
+            tokens = Scanner(code).scan()
+            buffer = BufferScanner(code).scan()
+
+            self.assertEqual(len(tokens), len(buffer))
+            self.assertEqual(tokens, buffer[:], name)
+
+    def test_it_stores_offsets_and_integer_types(self):
+        buffer = BufferScanner("var a =\n 'b';").scan()
+
+        self.assertEqual(
+            [Type.VAR, Type.IDENTIFIER, Type.EQUAL, Type.STRING, Type.SEMICOLON, Type.EOF],
+            list(buffer.types),
+        )
+        self.assertEqual([0, 4, 6, 9, 12, 13], list(buffer.starts))
+        self.assertEqual([3, 5, 7, 12, 13, 13], list(buffer.ends))
+        self.assertEqual([1, 1, 1, 2, 2, 2], [token.line for token in buffer[:]])
+        self.assertEqual(Token(Type.STRING, "'b'", "b", 2), buffer[3])
+
+    def test_it_interns_lexemes(self):
+        buffer = BufferScanner("a + a + 1 + 1").scan()
+
+        self.assertEqual(["a", "+", "1", ""], buffer.lexemes)
+        self.assertEqual(["a", None, 1, None], buffer.literals)
+
+    def test_it_reports_same_errors_as_scanner(self):
+        for code in ["@", "1 $\n2 ~", "'a\nb"]:
+            with self.assertRaises(CompileErrors) as expected:
+                Scanner(code).scan()
+
+            with self.assertRaises(CompileErrors) as actual:
+                BufferScanner(code).scan()
+
+            self.assertEqual(expected.exception.errors, actual.exception.errors)
+
+    def test_it_reports_unknown_char(self):
+        with self.assertRaises(CompileErrors) as context:
+            BufferScanner("1 +\n@ 2").scan()
+
+        self.assertEqual(
+            [ScanError(2, "Unrecognized character [@]")], context.exception.errors
+        )
+
+    def test_from_tokens(self):
+        tokens = Scanner("print 1 + 2;").scan()
+
+        self.assertEqual(tokens, TokenBuffer.from_tokens(tokens)[:])
+
+
+class BufferParserTest(TestCase):
+    def test_it_matches_parser_on_stubs(self):
+        for name, code in read_stubs().items():
+            self.assertAstMatches(
+                Parser(Scanner(code).scan()).parse(),
+                BufferParser(BufferScanner(code).scan()).parse(),
+            )
+
+    def test_it_reports_same_errors_as_parser(self):
+        for code in ["( 1; 1;", "1 = 2;", "var 1;", "fun f( {", "print 1"]:
+            with self.assertRaises(CompileErrors) as expected:
+                Parser(Scanner(code).scan()).parse()
+
+            with self.assertRaises(CompileErrors) as actual:
+                BufferParser(BufferScanner(code).scan()).parse()
+
+            self.assertEqual(expected.exception.errors, actual.exception.errors)
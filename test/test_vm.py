@@ -0,0 +1,55 @@
+import io
+from test import TestCase, read_stubs
+from test.test_closures import PROGRAMS, compile, run
+from lib.parser import Parser
+from lib.lazy import LazyParser
+from lib.interpreter import Interpreter
+from lib.compiler import Compiler
+from lib.disassembler import disassemble
+from lib.vm import VM, BytecodeFunction
+from lib.io import FakePrinter
+
+
+class VMTest(TestCase):
+    def setUp(self):
+        Interpreter.printer = FakePrinter
+
+    def test_it_runs_like_the_tree_walker(self):
+        # time.lox sleeps and prints how long it slept
+        stubs = [code for name, code in read_stubs().items() if name != "time.lox"]
+
+        for code in PROGRAMS + stubs:
+            self.assertEqual(run(Interpreter, code), run(VM, code), code)
+
+    def test_it_runs_lazily_parsed_functions(self):
+        for code in PROGRAMS:
+            self.assertEqual(run(Interpreter, code), run(VM, code, LazyParser), code)
+
+    def test_it_keeps_state_across_interpretations(self):
+        vm = VM()
+        vm.interpret(compile("var a = 1; fun f(x) { return x + a; }"))
+        vm.interpret(compile("a = 2; print f(3);"))
+
+        self.assertEqual(["5"], vm.printer.get())
+        self.assertEqual(5, vm.evaluate(Parser.parse_expr("f(3)")))
+        self.assertIsInstance(vm.evaluate(Parser.parse_expr("f")), BytecodeFunction)
+
+    def test_calls_do_not_recurse_in_python(self):
+        vm = VM.from_code(
+            "fun f(n) { if (n == 0) return 0; return f(n - 1) + 1; } print f(5000);"
+        )
+
+        self.assertEqual(["5000"], vm.printer.get())
+
+    def test_it_disassembles_functions_too(self):
+        out = io.StringIO()
+        disassemble(Compiler().compile(compile("fun f(n) { return n + 1; } print f(2);")), out)
+        text = out.getvalue()
+
+        self.assertIn("== <script> ==", text)
+        self.assertIn("CLOSURE", text)
+        self.assertIn("<fun f>", text)
+        self.assertIn("== f ==", text)
+        self.assertIn("GET_LOCAL", text)
+        self.assertIn("ADD", text)
+        self.assertIn("RETURN", text)